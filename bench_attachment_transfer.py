@@ -0,0 +1,168 @@
+"""
+Benchmark: peak memory of moving a Gmail attachment to Drive.
+
+Starts a local fake of the two endpoints involved (Gmail attachments.get and
+Drive's multipart/resumable upload) in a separate process, then runs each
+transfer path in a fresh subprocess and reports its peak RSS above the
+post-import baseline:
+
+- legacy:    attachments.get().execute() -> b64decode -> BytesIO -> non-resumable upload
+- streaming: moth.tools.gmail_ops.transfer_attachment (chunked decode, spooled file, resumable upload)
+
+    python bench_attachment_transfer.py [size_mb]
+"""
+
+import base64
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Process
+from urllib.parse import urlparse, parse_qs
+
+BLOCK = os.urandom(3 * 256 * 1024)  # encodes to whole base64 blocks
+
+class FakeGoogleHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    size = 25 * 1024 * 1024
+    uploads = {}
+
+    def _json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # Gmail attachments.get: {"size": N, "data": "<base64url>"} streamed out in blocks
+        encoded_block = base64.urlsafe_b64encode(BLOCK)
+        blocks, remainder = divmod(self.size, len(BLOCK))
+        tail = base64.urlsafe_b64encode(BLOCK[:remainder])
+        head = f'{{"size": {self.size}, "data": "'.encode()
+        length = len(head) + blocks * len(encoded_block) + len(tail) + 2
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(length))
+        self.end_headers()
+        self.wfile.write(head)
+        for _ in range(blocks):
+            self.wfile.write(encoded_block)
+        self.wfile.write(tail + b'"}')
+
+    def _read_body(self) -> int:
+        remaining = int(self.headers.get('Content-Length') or 0)
+        total = remaining
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, 1024 * 1024)))
+        return total
+
+    def do_POST(self):
+        query = parse_qs(urlparse(self.path).query)
+        self._read_body()
+        if query.get('uploadType') == ['resumable']:
+            upload_id = str(len(self.uploads) + 1)
+            self.uploads[upload_id] = 0
+            self.send_response(200)
+            self.send_header('Location', f"http://{self.headers['Host']}/upload/drive/v3/files?upload_id={upload_id}")
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        else:
+            self._json(200, {'id': 'legacy-file'})
+
+    def do_PUT(self):
+        upload_id = parse_qs(urlparse(self.path).query)['upload_id'][0]
+        received = self._read_body()
+        self.uploads[upload_id] += received
+        content_range = self.headers.get('Content-Range', '')
+        total = content_range.rsplit('/', 1)[-1]
+        if total != '*' and self.uploads[upload_id] >= int(total):
+            self._json(200, {'id': f'resumable-file-{upload_id}'})
+        else:
+            self.send_response(308)
+            self.send_header('Range', f"bytes=0-{self.uploads[upload_id] - 1}")
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(port: int, size: int):
+    FakeGoogleHandler.size = size
+    ThreadingHTTPServer(('127.0.0.1', port), FakeGoogleHandler).serve_forever()
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_transfer(mode: str, port: int):
+    """Runs one transfer in this (fresh) process and prints a JSON result line."""
+    import httplib2
+    from google.auth.credentials import AnonymousCredentials
+    from googleapiclient.discovery import build
+    from googleapiclient.http import MediaIoBaseUpload
+    import moth.tools.gmail_ops as gmail_ops
+
+    endpoint = f"http://127.0.0.1:{port}/"
+
+    class LocalHttp(httplib2.Http):
+        def __init__(self):
+            super().__init__()
+            # As googleapiclient.http.build_http does: 308 means "resume upload", not a redirect
+            self.redirect_codes = self.redirect_codes - {308}
+
+        # Upload URIs keep the https scheme of the real API
+        def request(self, uri, *args, **kwargs):
+            return super().request(uri.replace('https://', 'http://', 1), *args, **kwargs)
+
+    def service(name, version):
+        return build(name, version, http=LocalHttp(), client_options={'api_endpoint': endpoint}, static_discovery=True)
+
+    gmail_ops.GMAIL_API_ROOT = endpoint.rstrip('/')
+    gmail_ops.get_credentials = lambda: AnonymousCredentials()
+    gmail_ops.get_drive_service = lambda: service('drive', 'v3')
+
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    if mode == 'legacy':
+        att = service('gmail', 'v1').users().messages().attachments().get(userId='me', messageId='m', id='a').execute()
+        data = base64.urlsafe_b64decode(att['data'])
+        media = MediaIoBaseUpload(io.BytesIO(data), mimetype='application/octet-stream')
+        result = service('drive', 'v3').files().create(body={'name': 'bench.bin'}, media_body=media).execute()
+        result = f"saved (ID: {result['id']})"
+    else:
+        result = gmail_ops.transfer_attachment('m', 'bench.bin', 'a')
+    elapsed = time.perf_counter() - started
+    print(json.dumps({'mode': mode, 'baseline': baseline, 'peak': peak_rss_mb(), 'seconds': elapsed, 'result': result}))
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == '--run':
+        run_transfer(sys.argv[2], int(sys.argv[3]))
+        sys.exit(0)
+
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 25
+    port = 8799
+    server = Process(target=serve, args=(port, size_mb * 1024 * 1024), daemon=True)
+    server.start()
+    time.sleep(0.5)
+
+    print(f"Gmail -> Drive transfer of a {size_mb} MB attachment (local fake API)\n")
+    print(f"{'path':<10} {'peak RSS above baseline':>24} {'time':>8}")
+    try:
+        for mode in ('legacy', 'streaming'):
+            output = subprocess.run(
+                [sys.executable, __file__, '--run', mode, str(port)],
+                capture_output=True, text=True, check=True
+            ).stdout.strip().splitlines()[-1]
+            r = json.loads(output)
+            print(f"{mode:<10} {r['peak'] - r['baseline']:>21.1f} MB {r['seconds']:>7.2f}s   {r['result']}")
+    finally:
+        server.terminate()
@@ -0,0 +1,90 @@
+"""
+Benchmark: mail-merge to N recipients, per-call sends vs send_bulk_emails' batches.
+
+Runs the real googleapiclient Gmail client against a local fake transport that
+adds a fixed latency per HTTP round trip (no network, no credentials). The
+first two rows turn quota pacing off so they compare transport cost only; the
+paced row is what send_bulk_emails really does at Gmail's default 250 units/s
+(N sends need at least N * 100 / 250 seconds either way).
+The per-call path additionally costs one agent (LLM) iteration per email,
+which is not included here.
+
+    python bench_bulk_email.py [recipients] [latency_ms]
+"""
+
+import json
+import re
+import sys
+import time
+
+import httplib2
+from googleapiclient.discovery import build
+
+import moth.tools.gmail_ops as gmail_ops
+
+class FakeSendHttp:
+    """httplib2.Http stand-in accepting messages.send / drafts.create, singly or batched."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.round_trips = 0
+        self.sent = 0
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        self.round_trips += 1
+        time.sleep(self.latency)
+        if uri.endswith('/batch'):
+            boundary = re.search(r'boundary="([^"]+)"', headers['content-type']).group(1)
+            parts = []
+            for chunk in body.split(f"--{boundary}")[1:-1]:
+                content_id = re.search(r'Content-ID: <([^>]+)>', chunk).group(1)
+                self.sent += 1
+                payload = json.dumps({'id': f"msg{self.sent}", 'labelIds': ['SENT']})
+                parts.append(
+                    f"--resp\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                    f"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n{payload}\r\n"
+                )
+            return (httplib2.Response({'status': '200', 'content-type': 'multipart/mixed; boundary=resp'}),
+                    ("".join(parts) + "--resp--").encode())
+        self.sent += 1
+        return (httplib2.Response({'status': '200', 'content-type': 'application/json'}),
+                json.dumps({'id': f"msg{self.sent}", 'labelIds': ['SENT']}).encode())
+
+SUBJECT = "Quarterly review with {company}"
+BODY = "Hi {name},\n\nCould we find 30 minutes next week to go over {company}'s numbers?\n\nThanks!"
+
+def recipients_csv(count: int) -> str:
+    rows = ["email,name,company"] + [f"person{i}@example.com,Person {i},Company {i % 7}" for i in range(count)]
+    return "\n".join(rows)
+
+def per_call(service, csv_text: str):
+    """What the agent does today: one send_gmail_message-style call per recipient."""
+    for row in gmail_ops.parse_recipients(csv_text):
+        message = gmail_ops.create_message('me', row['email'], SUBJECT.format(**row), BODY.format(**row))
+        service.users().messages().send(userId='me', body=message).execute()
+
+def bulk(service, csv_text: str, mode: str = 'send'):
+    rendered = gmail_ops.render_bulk_messages(SUBJECT, BODY, gmail_ops.parse_recipients(csv_text))
+    results = gmail_ops.submit_bulk(service, {i: m for i, (_, m, _) in enumerate(rendered)}, mode)
+    assert all(status == 'ok' for status, _ in results.values())
+
+def run(label: str, fn, count: int, latency: float):
+    http = FakeSendHttp(latency)
+    service = build('gmail', 'v1', http=http, static_discovery=True)
+    started = time.perf_counter()
+    fn(service, recipients_csv(count))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<22} {http.sent:>5} sent  {http.round_trips:>4} round trips  {elapsed:>6.2f}s")
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    latency = (int(sys.argv[2]) if len(sys.argv) > 2 else 120) / 1000
+    gmail_ops.GMAIL_QUOTA_UNITS = 0
+
+    print(f"Mail-merge to {count} recipients, {latency * 1000:.0f} ms per round trip (local fake API)\n")
+    run("per-call sends", per_call, count, latency)
+    run("send_bulk_emails", bulk, count, latency)
+    gmail_ops.GMAIL_QUOTA_UNITS = 250
+    run("send_bulk_emails paced", bulk, count, latency)
+    run("drafts paced", lambda service, csv_text: bulk(service, csv_text, 'draft'), count, latency)
+    print(f"\nQuota floor at 250 units/s: {count * 100 / 250:.0f}s for sends, {count * 10 / 250:.0f}s for drafts")
@@ -0,0 +1,115 @@
+"""
+Benchmark: trashing N Drive files, per-file calls vs bulk_trash_files.
+
+Runs the real googleapiclient Drive client against a local fake transport
+that adds a fixed latency per HTTP round trip (no network, no credentials):
+
+- per-file:     what the agent does today, delete_file_by_name per file (name query + update)
+- bulk (cold):  bulk_trash_files with an empty metadata mirror (full listing first)
+- bulk (warm):  bulk_trash_files with a populated mirror (one changes call)
+
+The per-file path additionally costs one agent (LLM) iteration per file,
+which is not included here.
+
+    python bench_drive_bulk.py [files] [latency_ms]
+"""
+
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse, parse_qs
+
+import httplib2
+from googleapiclient.discovery import build
+
+import moth.tools.drive as drive_tools
+import moth.tools.drive_mirror as drive_mirror
+
+class FakeDriveHttp:
+    """httplib2.Http stand-in serving files.list / files.update / changes / batch from memory."""
+
+    def __init__(self, names: list, latency: float):
+        self.latency = latency
+        self.round_trips = 0
+        self.files = {
+            f"id{i:04d}": {'id': f"id{i:04d}", 'name': name, 'mimeType': 'application/pdf', 'parents': ['root'],
+                           'modifiedTime': f"2026-10-{1 + i % 28:02d}T09:00:00Z", 'ownedByMe': True, 'trashed': False}
+            for i, name in enumerate(names)
+        }
+
+    def _handle(self, method: str, uri: str, body: str = None) -> dict:
+        url = urlparse(uri)
+        query = parse_qs(url.query)
+        path = url.path
+        if path.endswith('/changes/startPageToken'):
+            return {'startPageToken': '1'}
+        if path.endswith('/changes'):
+            return {'changes': [], 'newStartPageToken': query['pageToken'][0]}
+        if path.endswith('/files') and method == 'GET':
+            files = [f for f in self.files.values() if not f['trashed']]
+            match = re.search(r"name = '((?:[^'\\]|\\.)*)'", query.get('q', [''])[0])
+            if match:
+                files = [f for f in files if f['name'] == match.group(1).replace("\\'", "'")]
+            return {'files': files}
+        file_id = path.rsplit('/', 1)[1]
+        self.files[file_id].update(json.loads(body or '{}'))
+        return {'id': file_id}
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        self.round_trips += 1
+        time.sleep(self.latency)
+        if '/batch/' in uri:
+            boundary = re.search(r'boundary="([^"]+)"', headers['content-type']).group(1)
+            parts = []
+            for chunk in body.split(f"--{boundary}")[1:-1]:
+                content_id = re.search(r'Content-ID: <([^>]+)>', chunk).group(1)
+                request_line = re.search(r'\n(GET|PATCH|POST) (\S+) HTTP', chunk)
+                part_body = chunk.replace('\r\n', '\n').split('\n\n', 2)[-1].strip() or None
+                payload = json.dumps(self._handle(request_line.group(1), request_line.group(2), part_body))
+                parts.append(
+                    f"--resp\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                    f"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n{payload}\r\n"
+                )
+            return (httplib2.Response({'status': '200', 'content-type': 'multipart/mixed; boundary=resp'}),
+                    ("".join(parts) + "--resp--").encode())
+        return (httplib2.Response({'status': '200', 'content-type': 'application/json'}),
+                json.dumps(self._handle(method, uri, body)).encode())
+
+def per_file(names: list):
+    for name in names:
+        result = drive_tools.delete_file_by_name.invoke({'filename': name})
+        assert result.startswith("Successfully"), result
+
+def bulk(names: list):
+    result = drive_tools.bulk_trash_files.invoke({'names': "\n".join(names)})
+    assert result.startswith(f"Trashed {len(names)} of {len(names)}"), result
+
+def run(label: str, fn, count: int, latency: float, warm: bool = False):
+    names = [f"scan_{i:03d}.pdf" for i in range(count)]
+    http = FakeDriveHttp(names + [f"keep_{i:03d}.pdf" for i in range(200)], latency)
+    service = build('drive', 'v3', http=http, static_discovery=True)
+    drive_tools.get_drive_service = lambda: service
+    drive_mirror.MIRROR_DB = os.path.join(tempfile.mkdtemp(), 'drive_mirror.db')
+    drive_mirror.mark_stale()
+    if warm:
+        drive_mirror.sync(service)
+        drive_mirror.mark_stale()
+        http.round_trips = 0
+
+    started = time.perf_counter()
+    fn(names)
+    elapsed = time.perf_counter() - started
+    trashed = sum(f['trashed'] for f in http.files.values())
+    print(f"{label:<14} {trashed:>4} trashed  {http.round_trips:>4} round trips  {elapsed:>6.2f}s")
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = (int(sys.argv[2]) if len(sys.argv) > 2 else 120) / 1000
+
+    print(f"Trashing {count} of {count + 200} Drive files, {latency * 1000:.0f} ms per round trip (local fake API)\n")
+    run("per-file", per_file, count, latency)
+    run("bulk (cold)", bulk, count, latency)
+    run("bulk (warm)", bulk, count, latency, warm=True)
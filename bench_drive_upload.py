@@ -0,0 +1,204 @@
+"""
+Benchmark: uploading several local files to Drive, one-by-one vs moth.tools.drive_upload.
+
+Starts a local stand-in for Drive's resumable upload endpoint in a separate
+process. It adds a fixed latency per request and caps each connection's
+bandwidth, like a real link to Google. Then it compares:
+
+- sequential: what upload_file_to_drive did, one file per call, default chunking
+- parallel:   drive_upload.upload_files (UPLOAD_WORKERS concurrent sessions, tuned chunks)
+- resume:     a large upload killed half-way, then restarted; reports how much was re-sent
+
+    python bench_drive_upload.py [files] [file_mb] [mbit_per_connection] [latency_ms]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Process
+from urllib.parse import urlparse, parse_qs
+from urllib.request import urlopen
+
+class FakeUploadHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.04
+    bytes_per_second = 100 * 1024 * 1024 / 8
+    uploads = {}   # upload id -> bytes received
+    received = 0   # all payload bytes, for the resume scenario
+    lock = threading.Lock()
+
+    def _reply(self, status: int, payload: dict = None, headers: dict = None):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> int:
+        remaining = int(self.headers.get('Content-Length') or 0)
+        total = remaining
+        piece = 64 * 1024
+        while remaining:
+            started = time.perf_counter()
+            got = len(self.rfile.read(min(remaining, piece)))
+            remaining -= got
+            with self.lock:
+                FakeUploadHandler.received += got
+            # Per-connection bandwidth cap
+            delay = got / self.bytes_per_second - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+        return total
+
+    def do_GET(self):
+        self._reply(200, {'received': FakeUploadHandler.received})
+
+    def do_POST(self):
+        time.sleep(self.latency)
+        query = parse_qs(urlparse(self.path).query)
+        self._read_body()
+        if query.get('uploadType') == ['resumable']:
+            with self.lock:
+                upload_id = str(len(self.uploads) + 1)
+                self.uploads[upload_id] = 0
+            self._reply(200, headers={'Location': f"http://{self.headers['Host']}/upload/drive/v3/files?upload_id={upload_id}"})
+        else:
+            self._reply(200, {'id': 'simple-upload', 'name': 'f', 'mimeType': 'application/octet-stream', 'parents': []})
+
+    def do_PUT(self):
+        time.sleep(self.latency)
+        upload_id = parse_qs(urlparse(self.path).query)['upload_id'][0]
+        content_range = self.headers.get('Content-Range', '')
+        received = self._read_body()
+        with self.lock:
+            self.uploads[upload_id] += received
+            done = self.uploads[upload_id]
+        total = content_range.rsplit('/', 1)[-1]
+        if total not in ('*', '') and done >= int(total):
+            self._reply(200, {'id': f"file-{upload_id}", 'name': 'f', 'mimeType': 'application/octet-stream', 'parents': []})
+        else:
+            self._reply(308, headers={'Range': f"bytes=0-{done - 1}"} if done else None)
+
+    def log_message(self, format, *args):
+        pass
+
+class QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        pass  # the resume scenario kills a client mid-upload on purpose
+
+def serve(port: int, latency: float, bytes_per_second: float):
+    FakeUploadHandler.latency = latency
+    FakeUploadHandler.bytes_per_second = bytes_per_second
+    QuietServer(('127.0.0.1', port), FakeUploadHandler).serve_forever()
+
+def run_upload(mode: str, port: int, sessions_db: str, paths: list):
+    """Runs one upload path in this (fresh) process and prints a JSON result line."""
+    import httplib2
+    from googleapiclient.discovery import build
+    from googleapiclient.http import MediaFileUpload
+    import moth.tools.drive_upload as drive_upload
+
+    endpoint = f"http://127.0.0.1:{port}/"
+
+    class LocalHttp(httplib2.Http):
+        def __init__(self):
+            super().__init__()
+            # As googleapiclient.http.build_http does: 308 means "resume upload", not a redirect
+            self.redirect_codes = self.redirect_codes - {308}
+
+        # Upload URIs keep the https scheme of the real API
+        def request(self, uri, *args, **kwargs):
+            return super().request(uri.replace('https://', 'http://', 1), *args, **kwargs)
+
+    def service():
+        return build('drive', 'v3', http=LocalHttp(), client_options={'api_endpoint': endpoint}, static_discovery=True)
+
+    drive_upload.get_drive_service = service
+    drive_upload.SESSIONS_DB = sessions_db
+
+    started = time.perf_counter()
+    if mode == 'sequential':
+        for path in paths:
+            media = MediaFileUpload(path, resumable=True)
+            service().files().create(body={'name': os.path.basename(path)}, media_body=media, fields='id').execute()
+        results = [{'size': os.path.getsize(p), 'resumed_from': 0} for p in paths]
+    else:
+        results = drive_upload.upload_files(paths)
+        errors = [r['error'] for r in results if 'error' in r]
+        assert not errors, errors
+    elapsed = time.perf_counter() - started
+    print(json.dumps({'seconds': elapsed, 'bytes': sum(r['size'] for r in results),
+                      'resumed_from': sum(r['resumed_from'] for r in results)}))
+
+def received(port: int) -> int:
+    return json.load(urlopen(f"http://127.0.0.1:{port}/stats"))['received']
+
+def make_files(directory: str, count: int, size: int) -> list:
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"report_{i:02d}.bin")
+        with open(path, 'wb') as f:
+            for _ in range(size // (1024 * 1024)):
+                f.write(os.urandom(1024 * 1024))
+        paths.append(path)
+    return paths
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == '--run':
+        run_upload(sys.argv[2], int(sys.argv[3]), sys.argv[4], sys.argv[5:])
+        sys.exit(0)
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    file_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    mbit = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    latency_ms = int(sys.argv[4]) if len(sys.argv) > 4 else 40
+    port = 8798
+
+    server = Process(target=serve, args=(port, latency_ms / 1000, mbit * 1024 * 1024 / 8), daemon=True)
+    server.start()
+    time.sleep(0.5)
+    workdir = tempfile.mkdtemp()
+    paths = make_files(workdir, count, file_mb * 1024 * 1024)
+
+    def run(mode: str, files: list, sessions_db: str):
+        output = subprocess.run(
+            [sys.executable, __file__, '--run', mode, str(port), sessions_db, *files],
+            capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        return json.loads(output)
+
+    print(f"Uploading {count} x {file_mb} MB to a local Drive stand-in "
+          f"({mbit} Mbit/s per connection, {latency_ms} ms per request)\n")
+    try:
+        for mode in ('sequential', 'parallel'):
+            r = run(mode, paths, os.path.join(workdir, f"{mode}.db"))
+            print(f"{mode:<11} {r['seconds']:>6.2f}s  {r['bytes'] / 2**20 / r['seconds']:>6.1f} MB/s")
+
+        # Resume: kill an upload of one large file half-way, then start it again
+        big = make_files(tempfile.mkdtemp(), 1, file_mb * 4 * 1024 * 1024)
+        sessions_db = os.path.join(workdir, "resume.db")
+        before = received(port)
+        child = subprocess.Popen([sys.executable, __file__, '--run', 'parallel', str(port), sessions_db, *big],
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        while received(port) - before < file_mb * 2 * 1024 * 1024:
+            time.sleep(0.05)
+        child.kill()
+        child.wait()
+        time.sleep(0.5)  # let the server drain what was already in flight
+        sent_first = received(port) - before
+        before = received(port)
+        r = run('parallel', big, sessions_db)
+        sent_again = received(port) - before
+        print(f"\nresume      {file_mb * 4} MB file killed after {sent_first / 2**20:.0f} MB; restart resumed at "
+              f"{r['resumed_from'] / 2**20:.0f} MB and sent {sent_again / 2**20:.0f} MB more "
+              f"(a restart from scratch would send {file_mb * 4} MB)")
+    finally:
+        server.terminate()
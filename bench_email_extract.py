@@ -0,0 +1,137 @@
+"""
+Microbenchmark: email body extraction, previous implementation vs extract_body_text.
+
+The corpus is generated in memory so it ships without binary fixtures. It is
+shaped like real Gmail API payloads: a short plain/html alternative, a reply
+thread, a 2 MB marketing HTML mail with large <style> blocks, an html-only
+newsletter, a flat plain-text mail and a mail with attachments.
+
+    python bench_email_extract.py [repeats]
+"""
+
+import base64
+import html
+import re
+import sys
+import time
+
+from moth.tools.gmail_ops import extract_body_text, safe_clean_decode
+
+# --- Previous implementation (for comparison) ---
+
+def legacy_clean_html_content(text: str) -> str:
+    if not text: return ""
+    text = html.unescape(text)
+    text = re.sub(r'<style.*?>.*?</style>', '', text, flags=re.DOTALL)
+    text = re.sub(r'<script.*?>.*?</script>', '', text, flags=re.DOTALL)
+    text = re.sub(r'<[^<]+?>', ' ', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+def legacy_extract_all_text(payload):
+    text_candidates = []
+    parts = payload.get('parts', [])
+    body_data = payload.get('body', {}).get('data')
+    mime_type = payload.get('mimeType', '')
+    if body_data and mime_type in ['text/plain', 'text/html']:
+        decoded = safe_clean_decode(body_data)
+        if decoded:
+            if mime_type == 'text/html':
+                decoded = legacy_clean_html_content(decoded)
+            if len(decoded.strip()) > 5:
+                text_candidates.append(decoded)
+    for part in parts:
+        text_candidates.extend(legacy_extract_all_text(part))
+    return text_candidates
+
+def legacy_body_text(payload):
+    candidates = legacy_extract_all_text(payload)
+    if not candidates:
+        data = payload.get('body', {}).get('data')
+        if data:
+            decoded = safe_clean_decode(data)
+            if decoded: candidates.append(decoded)
+    if not candidates:
+        return None
+    candidates.sort(key=len, reverse=True)
+    return candidates[0]
+
+# --- Corpus ---
+
+def _b64(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip('=')
+
+def _part(mime_type: str, text: str, filename: str = '') -> dict:
+    return {'mimeType': mime_type, 'filename': filename, 'body': {'size': len(text), 'data': _b64(text)}}
+
+PARAGRAPH = ("Hi team, following up on the quarterly planning notes. Please review the attached "
+             "numbers before Thursday and let me know if anything looks off. ")
+
+def short_alternative():
+    text = PARAGRAPH * 3
+    return {'mimeType': 'multipart/alternative', 'parts': [
+        _part('text/plain', text),
+        _part('text/html', f"<html><body><p>{text}</p></body></html>"),
+    ]}
+
+def reply_thread():
+    quoted = "\n".join(f"> {PARAGRAPH}" for _ in range(60))
+    text = f"Sounds good, thanks!\n\nOn Mon, Oct 19, 2026 at 9:00 AM Alex wrote:\n{quoted}"
+    html_text = f"<div>Sounds good, thanks!</div><blockquote>{'<p>' + PARAGRAPH + '</p>' * 60}</blockquote>"
+    return {'mimeType': 'multipart/alternative', 'parts': [_part('text/plain', text), _part('text/html', html_text)]}
+
+def marketing_2mb():
+    style = "<style>" + ".c{color:#333;margin:0 auto;padding:4px 8px;font-family:Arial,sans-serif}" * 800 + "</style>"
+    rows = "".join(
+        f"<tr><td class='c'><a href='https://example.com/p/{i}'><img src='https://cdn.example.com/{i}.png' alt=''></a>"
+        f"<span style='font-size:14px'>Deal #{i}: 40% off &amp; free shipping</span></td></tr>"
+        for i in range(11000)
+    )
+    body = f"<html><head>{style}</head><body><table>{rows}</table><script>track()</script></body></html>"
+    short_plain = "View this email in your browser."
+    return {'mimeType': 'multipart/alternative', 'parts': [_part('text/plain', short_plain), _part('text/html', body)]}
+
+def html_only_newsletter():
+    body = "<html><body>" + "".join(f"<h2>Story {i}</h2><p>{PARAGRAPH}</p>" for i in range(200)) + "</body></html>"
+    return _part('text/html', body)
+
+def flat_plain():
+    return {'mimeType': 'text/plain', 'body': {'data': _b64(PARAGRAPH * 10)}}
+
+def with_attachments():
+    text = PARAGRAPH * 4
+    return {'mimeType': 'multipart/mixed', 'parts': [
+        {'mimeType': 'multipart/alternative', 'parts': [
+            _part('text/plain', text),
+            _part('text/html', f"<p>{text}</p>"),
+        ]},
+        _part('text/plain', "col1,col2\n" + "1,2\n" * 50000, filename='export.csv'),
+        {'mimeType': 'application/pdf', 'filename': 'report.pdf', 'body': {'attachmentId': 'ANGjdJ8', 'size': 482113}},
+    ]}
+
+CORPUS = [
+    ('short plain/html', short_alternative()),
+    ('reply thread', reply_thread()),
+    ('2 MB marketing html', marketing_2mb()),
+    ('html-only newsletter', html_only_newsletter()),
+    ('flat plain', flat_plain()),
+    ('with attachments', with_attachments()),
+]
+
+def timed(fn, payload, repeats: int):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        result = fn(payload)
+    return (time.perf_counter() - started) / repeats * 1000, result
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'email':<22} {'legacy ms':>10} {'new ms':>9} {'legacy chars':>13} {'new chars':>10}")
+    total_old = total_new = 0.0
+    for name, payload in CORPUS:
+        old_ms, old_text = timed(legacy_body_text, payload, repeats)
+        new_ms, new_text = timed(extract_body_text, payload, repeats)
+        total_old += old_ms
+        total_new += new_ms
+        print(f"{name:<22} {old_ms:>10.2f} {new_ms:>9.2f} {len(old_text or ''):>13} {len(new_text or ''):>10}")
+    print(f"{'total':<22} {total_old:>10.2f} {total_new:>9.2f}")
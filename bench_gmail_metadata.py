@@ -0,0 +1,118 @@
+"""
+Benchmark: round trips and bytes for read_recent_emails-style header fetches.
+
+Runs the real googleapiclient Gmail client against a local fake transport (no
+network, no credentials) and compares the old path (one sequential
+format='full' get per message) with the batched format='metadata' path.
+
+    python bench_gmail_metadata.py [limit]
+"""
+
+import base64
+import json
+import re
+import sys
+import time
+from urllib.parse import urlparse, parse_qs
+
+import httplib2
+from googleapiclient.discovery import build
+
+from moth.tools.gmail_ops import list_message_ids, batch_get_messages, get_header
+
+class FakeGmailHttp:
+    """httplib2.Http stand-in serving messages.list / messages.get / batch from memory."""
+
+    def __init__(self, count: int = 500, body_size: int = 40_000):
+        self.round_trips = 0
+        self.bytes_received = 0
+        self.ids = [f"{i:016x}" for i in range(count, 0, -1)]
+        html_body = base64.urlsafe_b64encode((b"<p>Hello there, quarterly numbers attached.</p>" * (body_size // 48))).decode()
+        self.body = {
+            'mimeType': 'multipart/alternative',
+            'parts': [
+                {'mimeType': 'text/plain', 'body': {'size': body_size, 'data': html_body}},
+                {'mimeType': 'text/html', 'body': {'size': body_size, 'data': html_body}},
+            ],
+        }
+
+    def _message(self, message_id: str, query: dict) -> dict:
+        headers = [
+            {'name': 'From', 'value': f'Sender {message_id[-4:]} <sender@example.com>'},
+            {'name': 'Subject', 'value': f'Report {message_id[-4:]}'},
+            {'name': 'Date', 'value': 'Mon, 19 Oct 2026 09:00:00 +0000'},
+        ] + [{'name': f'X-Header-{i}', 'value': 'x' * 60} for i in range(20)]
+        message = {'id': message_id, 'threadId': message_id, 'labelIds': ['INBOX'],
+                   'snippet': 'Hello there, quarterly numbers attached.', 'internalDate': '1792400000000'}
+        if query.get('format', ['full'])[0] == 'metadata':
+            wanted = {h.lower() for h in query.get('metadataHeaders', [])}
+            message['payload'] = {'headers': [h for h in headers if h['name'].lower() in wanted]}
+        else:
+            message['payload'] = {'headers': headers, **self.body}
+        return message
+
+    def _handle(self, method: str, uri: str) -> dict:
+        url = urlparse(uri)
+        query = parse_qs(url.query)
+        if url.path.endswith('/messages'):
+            start = int(query.get('pageToken', ['0'])[0])
+            size = int(query.get('maxResults', ['100'])[0])
+            page = self.ids[start:start + size]
+            result = {'messages': [{'id': i, 'threadId': i} for i in page]}
+            if start + size < len(self.ids):
+                result['nextPageToken'] = str(start + size)
+            return result
+        message_id = url.path.rsplit('/', 1)[1]
+        return self._message(message_id, query)
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        self.round_trips += 1
+        if uri.endswith('/batch'):
+            boundary = re.search(r'boundary="([^"]+)"', headers['content-type']).group(1)
+            parts = []
+            for chunk in body.split(f"--{boundary}")[1:-1]:
+                content_id = re.search(r'Content-ID: <([^>]+)>', chunk).group(1)
+                request_line = re.search(r'\n(GET|POST) (\S+) HTTP', chunk)
+                payload = json.dumps(self._handle(request_line.group(1), request_line.group(2)))
+                parts.append(
+                    f"--resp\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                    f"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n{payload}\r\n"
+                )
+            content = ("".join(parts) + "--resp--").encode()
+            response = httplib2.Response({'status': '200', 'content-type': 'multipart/mixed; boundary=resp'})
+        else:
+            content = json.dumps(self._handle(method, uri)).encode()
+            response = httplib2.Response({'status': '200', 'content-type': 'application/json'})
+        self.bytes_received += len(content)
+        return response, content
+
+def old_path(service, limit: int) -> list:
+    """What read_recent_emails did before: list once, then one format='full' get per message."""
+    results = service.users().messages().list(userId='me', q='category:primary', maxResults=limit).execute()
+    summary = []
+    for msg in results.get('messages', []):
+        m = service.users().messages().get(userId='me', id=msg['id'], format='full').execute()
+        summary.append((get_header(m, 'From'), get_header(m, 'Subject')))
+    return summary
+
+def new_path(service, limit: int) -> list:
+    ids = list_message_ids(service, limit, query='category:primary')
+    fetched = batch_get_messages(service, ids)
+    return [(get_header(fetched[i], 'From'), get_header(fetched[i], 'Subject')) for i in ids]
+
+def run(label: str, fn, limit: int):
+    http = FakeGmailHttp()
+    service = build('gmail', 'v1', http=http, static_discovery=True)
+    started = time.perf_counter()
+    rows = fn(service, limit)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {len(rows):>5} msgs  {http.round_trips:>4} round trips  "
+          f"{http.bytes_received / 1024:>9.1f} KiB  {elapsed * 1000:>7.1f} ms (local)")
+    return rows
+
+if __name__ == "__main__":
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print(f"read_recent_emails(limit={limit}) against a local fake Gmail API\n")
+    old = run("sequential format='full'", old_path, limit)
+    new = run("batched format='metadata'", new_path, limit)
+    assert old == new, "paths disagree"
@@ -0,0 +1,139 @@
+"""
+Benchmark: read_pdf_from_drive on a 300-page PDF, previous path vs moth.tools.pdf_text.
+
+Generates a text PDF with a ~100 KB image per page (so the file is shaped like
+a scanned/illustrated report, ~30 MB) and serves it through a fake Drive
+transport that honours Range requests. Each path runs in a fresh subprocess,
+reporting wall time and peak RSS above its post-import baseline:
+
+- legacy: get_media().execute() -> BytesIO -> serial pypdf extraction of every page
+- new:    chunked MediaIoBaseDownload to a temp file -> process-pool extraction
+- range:  the new path reading pages 120-140 only
+- cached: the new path re-reading the whole file (md5 cache hit)
+
+    python bench_pdf_extract.py [pages]
+"""
+
+import hashlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse, parse_qs
+
+LINE = "Quarterly operating review: revenue, margin and headcount by region and product line."
+
+def build_pdf(path: str, pages: int, image_bytes: int = 100_000):
+    """Writes a minimal PDF: per page 45 lines of Helvetica text and one uncompressed grey image."""
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>", 3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    side = int(image_bytes ** 0.5)
+    for p in range(pages):
+        page_id, content_id, image_id = 4 + p * 3, 5 + p * 3, 6 + p * 3
+        kids.append(f"{page_id} 0 R")
+        lines = "".join(f"({LINE} Page {p + 1}, line {i + 1}.) Tj T* " for i in range(45))
+        stream = f"q 200 0 0 200 350 20 cm /Im1 Do Q BT /F1 9 Tf 11 TL 40 800 Td {lines}ET".encode()
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Contents {content_id} 0 R "
+                            f"/Resources << /Font << /F1 3 0 R >> /XObject << /Im1 {image_id} 0 R >> >> >>").encode()
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        pixels = os.urandom(side * side)
+        objects[image_id] = (f"<< /Type /XObject /Subtype /Image /Width {side} /Height {side} /ColorSpace /DeviceGray "
+                             f"/BitsPerComponent 8 /Length {len(pixels)} >>\nstream\n").encode() + pixels + b"\nendstream"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+
+    with open(path, 'wb') as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = {}
+        for number in sorted(objects):
+            offsets[number] = f.tell()
+            f.write(b"%d 0 obj\n" % number + objects[number] + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for number in sorted(objects):
+            f.write(b"%010d 00000 n \n" % offsets[number])
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+class FakeDriveHttp:
+    """httplib2.Http stand-in for files.get (metadata and alt=media, with Range support) from a local file."""
+
+    def __init__(self, path: str, md5: str):
+        self.path = path
+        self.md5 = md5
+        self.size = os.path.getsize(path)
+        self.round_trips = 0
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        import httplib2
+        self.round_trips += 1
+        query = parse_qs(urlparse(uri).query)
+        if query.get('alt') != ['media']:
+            meta = {'id': 'pdf1', 'md5Checksum': self.md5, 'size': str(self.size)}
+            return httplib2.Response({'status': '200', 'content-type': 'application/json'}), json.dumps(meta).encode()
+        with open(self.path, 'rb') as f:
+            byte_range = (headers or {}).get('range')
+            if not byte_range:
+                return httplib2.Response({'status': '200'}), f.read()
+            start, end = (int(x) for x in byte_range.split('=')[1].split('-'))
+            end = min(end, self.size - 1)
+            f.seek(start)
+            data = f.read(end - start + 1)
+        return (httplib2.Response({'status': '206', 'content-range': f"bytes {start}-{end}/{self.size}"}), data)
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_mode(mode: str, path: str, md5: str, cache_db: str):
+    """Runs one read in this (fresh) process and prints a JSON result line."""
+    import pypdf
+    from googleapiclient.discovery import build
+    import moth.tools.pdf_text as pdf_text
+
+    pdf_text.PDF_CACHE_DB = cache_db
+    http = FakeDriveHttp(path, md5)
+    drive = build('drive', 'v3', http=http, static_discovery=True)
+
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    if mode == 'legacy':
+        reader = pypdf.PdfReader(io.BytesIO(drive.files().get_media(fileId='pdf1').execute()))
+        pages = [page.extract_text() for page in reader.pages]
+    elif mode == 'range':
+        _, pages = pdf_text.read_pdf_pages('pdf1', 120, 140, drive)
+    else:
+        _, pages = pdf_text.read_pdf_pages('pdf1', drive=drive)
+    elapsed = time.perf_counter() - started
+    chars = sum(len(p if isinstance(p, str) else p[1]) for p in pages)
+    print(json.dumps({'peak': peak_rss_mb() - baseline, 'seconds': elapsed, 'pages': len(pages),
+                      'chars': chars, 'round_trips': http.round_trips}))
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == '--run':
+        run_mode(*sys.argv[2:6])
+        sys.exit(0)
+
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, 'report.pdf')
+    cache_db = os.path.join(workdir, 'pdf_cache.db')
+    build_pdf(path, pages)
+    with open(path, 'rb') as f:
+        md5 = hashlib.md5(f.read()).hexdigest()
+
+    print(f"read_pdf_from_drive on a {pages}-page, {os.path.getsize(path) / 2**20:.1f} MB PDF "
+          f"(local fake Drive, {os.cpu_count()} CPUs)\n")
+    print(f"{'path':<8} {'pages':>6} {'chars':>9} {'round trips':>12} {'peak RSS':>10} {'time':>8}")
+    for mode in ('legacy', 'new', 'range', 'cached'):
+        output = subprocess.run(
+            # 'range' starts from an empty cache; 'cached' reuses the one 'new' filled
+            [sys.executable, __file__, '--run', mode, path, md5, cache_db + ('.range' if mode == 'range' else '')],
+            capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        r = json.loads(output)
+        print(f"{mode:<8} {r['pages']:>6} {r['chars']:>9} {r['round_trips']:>12} "
+              f"{r['peak']:>7.1f} MB {r['seconds']:>7.2f}s")
@@ -6,7 +6,9 @@ from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.agents import AgentExecutor
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.callbacks import BaseCallbackHandler
 from moth.tools import get_all_tools
+from moth.tools import drive_cache
 from moth.memory_engine import init_db, save_memory, get_recent_memories
 
 # Suppress warnings from langchain_google_genai about schema keys
@@ -192,10 +194,75 @@ def get_agent_executor(model_name=None):
     
     return executor
 
-def run_agent(user_input, chat_history):
+class TokenUsageCallback(BaseCallbackHandler):
+    """Sums the token usage reported by every LLM call of an agent turn."""
+
+    def __init__(self):
+        self.total_tokens = 0
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    self.total_tokens += usage.get("total_tokens", 0)
+
+class TurnCancelled(Exception):
+    """Raised inside the executor to abandon an agent turn that is no longer wanted."""
+
+class CancelTurnCallback(BaseCallbackHandler):
+    """
+    Cooperative cancellation: aborts the agent turn at the next LLM call once
+    `is_cancelled()` returns True, but only until the first tool starts. Tools have
+    side effects (emails sent, documents created), so before the first one runs
+    `commit()` is called: it returns False if the turn was cancelled meanwhile, and
+    otherwise makes the turn uncancellable, so it runs to completion.
+    """
+    raise_error = True
+
+    def __init__(self, is_cancelled, commit):
+        self.is_cancelled = is_cancelled
+        self.commit = commit
+        self.committed = False
+
+    def _check(self):
+        if not self.committed and self.is_cancelled():
+            raise TurnCancelled("Agent turn cancelled.")
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self._check()
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._check()
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        if not self.committed:
+            if not self.commit():
+                raise TurnCancelled("Agent turn cancelled.")
+            self.committed = True
+
+def run_agent(user_input, chat_history, return_details=False, callbacks=None):
     """
     Main function called by app.py to run the chat.
+    With return_details=True, returns a dict with 'output', 'model_used', 'tool_calls'
+    and 'tokens' (plus 'drive_lookups_saved' by the Drive name cache) instead of just
+    the output text (used by the scheduler's run history). When the turn failed, the
+    output is the error message and 'error' holds the exception text.
+    Extra LangChain `callbacks` (e.g. CancelTurnCallback) are attached to the executor run;
+    TurnCancelled is re-raised rather than reported as an error.
     """
+    details = {'model_used': None, 'tool_calls': 0, 'tokens': 0, 'drive_lookups_saved': 0}
+    drive_cache.start_turn()
+
+    def finish(output):
+        lookups = drive_cache.turn_stats()
+        details['drive_lookups_saved'] = lookups['hits']
+        if lookups['hits'] or lookups['api_calls']:
+            print(f"DEBUG: Drive name cache saved {lookups['hits']} of {lookups['hits'] + lookups['api_calls']} lookup calls this turn.")
+        if return_details:
+            return {'output': output, **details}
+        return output
+
     try:
         # Initialize Memory DB
         init_db()
@@ -210,16 +277,20 @@ def run_agent(user_input, chat_history):
         # Dynamic Model Routing
         selected_model = select_best_model(user_input)
         print(f"DEBUG: 🧠 Routing query to [{selected_model}] based on complexity.")
+        details['model_used'] = selected_model
         
         agent_executor = get_agent_executor(model_name=selected_model)
         
         # Pass memory_context to the agent
         print(f"DEBUG: Running agent with input: {user_input}")
+        usage = TokenUsageCallback()
         response = agent_executor.invoke({
             "input": user_input, 
             "chat_history": memory_context  # Use the DB memory instead of ephemeral list
-        })
+        }, config={"callbacks": [usage] + (callbacks or [])})
         output = response.get("output", "")
+        details['tool_calls'] = len(response.get("intermediate_steps", []))
+        details['tokens'] = usage.total_tokens
         
         # Save AI Response
         if output:
@@ -231,12 +302,15 @@ def run_agent(user_input, chat_history):
                  print("DEBUG: Steps keys:", [s[0].tool for s in steps])
                  # Fallback: if we have steps but no output, maybe return the last tool output?
                  last_tool_output = steps[-1][1]
-                 return f"I performed the action, but I'm having trouble summarizing it. Here is the raw result:\n{last_tool_output}"
+                 return finish(f"I performed the action, but I'm having trouble summarizing it. Here is the raw result:\n{last_tool_output}")
 
              print("WARNING: Agent returned empty output!")
-             return "I processed your request, but I have no specific respose to show. (Empty Output)"
-        return output
+             return finish("I processed your request, but I have no specific respose to show. (Empty Output)")
+        return finish(output)
         
+    except TurnCancelled:
+        raise
     except Exception as e:
         print(f"ERROR in run_agent: {e}")
-        return f"⚠️ An error occurred: {str(e)}"
+        details['error'] = str(e)
+        return finish(f"⚠️ An error occurred: {str(e)}")
@@ -14,25 +14,31 @@ if "messages" not in st.session_state:
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = [] # For LangChain
 
-# Initialize Background Scheduler
-# Initialize Background Scheduler
-from scheduler_engine import get_scheduler
-scheduler = get_scheduler()
+# Scheduled tasks live in the standalone scheduler service (`moth scheduler`)
+from datetime import datetime
+from moth import scheduler_client
 
 # Sidebar for Active Schedules
 st.sidebar.title("⏳ Active Schedules")
-scheduler = get_scheduler()
-jobs = scheduler.get_jobs()
+try:
+    jobs = scheduler_client.list_jobs()
+except scheduler_client.SchedulerUnavailable as e:
+    jobs = []
+    st.sidebar.warning(str(e))
+
 if jobs:
     for job in jobs:
         col1, col2 = st.sidebar.columns([0.8, 0.2])
         with col1:
-            st.write(f"**Task:** {job.name}")
-            st.caption(f"Next Run: {job.next_run_time.strftime('%Y-%m-%d %H:%M:%S')}")
+            st.write(f"**Task:** {job['name']}")
+            if job['next_run_time']:
+                next_run = datetime.fromisoformat(job['next_run_time'])
+                st.caption(f"Next Run: {next_run.strftime('%Y-%m-%d %H:%M:%S')}")
+            st.caption(scheduler_client.format_run_stats(job.get('stats')))
         with col2:
-            if st.button("🗑️", key=f"del_{job.id}"):
+            if st.button("🗑️", key=f"del_{job['id']}"):
                 try:
-                    scheduler.remove_job(job.id)
+                    scheduler_client.remove_job(job['id'])
                     st.success("Deleted!")
                     st.rerun()
                 except Exception as e:
@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+class ChatDispatcher:
+    """
+    Per-chat ordered, cross-chat concurrent work queue.
+
+    Every chat gets a serial lane, so one chat's messages are handled in order,
+    while lanes of different chats run concurrently on a bounded worker pool.
+    A global queue limit sheds load (submit returns False) instead of letting
+    the backlog grow without bound.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 50):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="moth-chat")
+        self._lanes = {}        # chat_id -> deque of (enqueued_at, fn, args)
+        self._active = set()    # chats whose lane is scheduled on the pool
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._started = time.time()
+        self._stats = {
+            'processed': 0,
+            'failed': 0,
+            'shed': 0,
+            'max_lane_depth': 0,
+            'total_wait': 0.0,
+            'max_wait': 0.0,
+        }
+
+    def submit(self, chat_id, fn, *args) -> bool:
+        """Queues fn(*args) on the chat's lane. Returns False if the global queue is full."""
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._stats['shed'] += 1
+                return False
+
+            lane = self._lanes.setdefault(chat_id, deque())
+            lane.append((time.time(), fn, args))
+            self._queued += 1
+            self._stats['max_lane_depth'] = max(self._stats['max_lane_depth'], len(lane))
+
+            if chat_id not in self._active:
+                self._active.add(chat_id)
+                self._pool.submit(self._run_next, chat_id)
+        return True
+
+    def _run_next(self, chat_id):
+        """Runs ONE item of a lane, then re-queues the lane so other chats get a turn."""
+        with self._lock:
+            enqueued_at, fn, args = self._lanes[chat_id].popleft()
+            self._queued -= 1
+
+        wait = time.time() - enqueued_at
+        try:
+            fn(*args)
+            failed = False
+        except Exception as e:
+            failed = True
+            print(f"⚠️ Dispatcher: task for chat {chat_id} failed: {e}")
+
+        with self._lock:
+            self._stats['processed'] += 1
+            self._stats['failed'] += failed
+            self._stats['total_wait'] += wait
+            self._stats['max_wait'] = max(self._stats['max_wait'], wait)
+
+            if self._lanes[chat_id]:
+                self._pool.submit(self._run_next, chat_id)
+            else:
+                del self._lanes[chat_id]
+                self._active.discard(chat_id)
+
+    def get_stats(self) -> dict:
+        """Queue depth per lane, totals, average/max queue wait and throughput."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['queued'] = self._queued
+            stats['lane_depths'] = {chat_id: len(lane) for chat_id, lane in self._lanes.items()}
+
+        uptime = time.time() - self._started
+        total_wait = stats.pop('total_wait')
+        stats['avg_wait'] = total_wait / stats['processed'] if stats['processed'] else 0.0
+        stats['throughput_per_min'] = stats['processed'] / uptime * 60 if uptime else 0.0
+        return stats
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
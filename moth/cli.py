@@ -10,6 +10,9 @@ def main():
     # Command: moth start
     start_parser = subparsers.add_parser("start", help="Launch the Web UI")
 
+    # Command: moth scheduler
+    scheduler_parser = subparsers.add_parser("scheduler", help="Run the background task scheduler service")
+
     # Command: moth install <feature>
     install_parser = subparsers.add_parser("install", help="Install a plugin")
     install_parser.add_argument("feature", help="Name of feature (e.g. spotify)")
@@ -21,10 +24,21 @@ def main():
         # Get path to the internal app.py
         package_dir = os.path.dirname(os.path.abspath(__file__))
         app_path = os.path.join(package_dir, "app.py")
+
+        # The UI only talks to the scheduler service; start one if none is running
+        from moth import scheduler_client
+        if not scheduler_client.is_running():
+            print("⏳ Starting scheduler service in the background...")
+            subprocess.Popen([sys.executable, "-m", "moth.scheduler_service"])
+
         # Use sys.executable to ensure we run streamlit from the *current* virtual environment
         # and not the global one found in PATH (which was checking /opt/anaconda3)
         subprocess.run([sys.executable, "-m", "streamlit", "run", app_path])
         
+    elif args.command == "scheduler":
+        from moth.scheduler_service import run_service
+        run_service()
+
     elif args.command == "install":
         print(f"📦 Installing feature: {args.feature}...")
         print("(Plugin system coming in Phase 2)")
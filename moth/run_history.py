@@ -0,0 +1,161 @@
+import atexit
+import math
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# Run history lives next to the jobstore
+DB_FILE = "scheduled_tasks.db"
+
+# Writes are queued and flushed in batches by a background thread, so recording
+# a run adds nothing to the job's critical path.
+FLUSH_INTERVAL = 5  # seconds
+FLUSH_BATCH_SIZE = 50
+
+# How many recent runs per job the aggregate stats look at
+STATS_WINDOW = 100
+
+_pending = queue.Queue()
+_writer = None
+_writer_lock = threading.Lock()
+_flush_lock = threading.Lock()
+
+def init_db():
+    conn = sqlite3.connect(DB_FILE)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS job_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT NOT NULL,
+            started_at DATETIME,
+            ended_at DATETIME,
+            duration REAL,
+            queue_delay REAL,
+            model_used TEXT,
+            tokens INTEGER,
+            tool_calls INTEGER,
+            outcome TEXT NOT NULL,
+            error TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_job_runs_job ON job_runs (job_id, id)")
+    conn.commit()
+    conn.close()
+
+def _to_iso(value):
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value).isoformat()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def record_run(job_id: str, metrics: dict):
+    """Queues one run (the scheduler listener's metrics dict) for the next batched write."""
+    _pending.put((
+        job_id,
+        _to_iso(metrics.get('started_at')),
+        _to_iso(metrics.get('finished_at')),
+        metrics.get('wall_time'),
+        metrics.get('queue_delay'),
+        metrics.get('model_used'),
+        metrics.get('tokens'),
+        metrics.get('tool_calls'),
+        metrics.get('outcome', 'ok'),
+        metrics.get('error'),
+    ))
+    _ensure_writer()
+
+def flush():
+    """Writes all queued runs in one transaction."""
+    with _flush_lock:
+        rows = []
+        while True:
+            try:
+                rows.append(_pending.get_nowait())
+            except queue.Empty:
+                break
+        if not rows:
+            return
+
+        init_db()
+        conn = sqlite3.connect(DB_FILE)
+        conn.executemany("""
+            INSERT INTO job_runs (job_id, started_at, ended_at, duration, queue_delay,
+                                  model_used, tokens, tool_calls, outcome, error)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+        conn.close()
+
+def _writer_loop():
+    while True:
+        # Full batches are flushed early by record_run
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception as e:
+            print(f"⚠️ Run history flush failed: {e}")
+
+def _ensure_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_writer_loop, daemon=True)
+                _writer.start()
+                atexit.register(flush)
+    if _pending.qsize() >= FLUSH_BATCH_SIZE:
+        threading.Thread(target=flush, daemon=True).start()
+
+def _percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+def get_job_stats(job_ids: list = None) -> dict:
+    """
+    Aggregates over each job's last STATS_WINDOW runs:
+    {job_id: {'runs', 'failure_rate', 'p95_duration', 'last_outcome', 'last_duration', 'last_started', 'last_model'}}
+    """
+    flush()
+    init_db()
+    conn = sqlite3.connect(DB_FILE)
+    query = """
+        SELECT job_id, started_at, duration, model_used, outcome FROM (
+            SELECT job_id, started_at, duration, model_used, outcome,
+                   ROW_NUMBER() OVER (PARTITION BY job_id ORDER BY id DESC) AS rn
+            FROM job_runs
+        ) WHERE rn <= ?
+    """
+    params = [STATS_WINDOW]
+    if job_ids:
+        query += f" AND job_id IN ({','.join('?' for _ in job_ids)})"
+        params.extend(job_ids)
+    query += " ORDER BY job_id, rn"
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
+
+    # Rows come out newest first per job
+    stats = {}
+    for job_id, started_at, duration, model_used, outcome in rows:
+        job = stats.get(job_id)
+        if job is None:
+            job = stats[job_id] = {
+                'runs': 0, 'failures': 0, 'durations': [],
+                'last_outcome': outcome, 'last_duration': duration,
+                'last_started': started_at, 'last_model': model_used,
+            }
+        job['runs'] += 1
+        if outcome in ('error', 'missed'):
+            job['failures'] += 1
+        if duration is not None:
+            job['durations'].append(duration)
+
+    for job in stats.values():
+        durations = job.pop('durations')
+        job['failure_rate'] = job.pop('failures') / job['runs']
+        job['p95_duration'] = _percentile(durations, 95) if durations else None
+
+    return stats
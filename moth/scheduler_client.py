@@ -0,0 +1,82 @@
+import os
+import secrets
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Address of the standalone scheduler service (`moth scheduler`).
+# Kept free of apscheduler/streamlit imports so every client process stays light.
+SCHEDULER_URL = os.getenv("MOTH_SCHEDULER_URL", "http://127.0.0.1:8765")
+
+# Shared secret sent with every request, so web pages open in the user's browser
+# can't drive the API (a "simple" cross-site POST carries no custom header)
+TOKEN_FILE = os.getenv("MOTH_SCHEDULER_TOKEN_FILE", ".scheduler_token")
+TOKEN_HEADER = "X-Moth-Token"
+
+_session = requests.Session()
+
+def load_token() -> str:
+    """Reads the shared secret, creating it (mode 0600) on first use by either side."""
+    try:
+        fd = os.open(TOKEN_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(TOKEN_FILE) as f:
+            return f.read().strip()
+    with os.fdopen(fd, 'w') as f:
+        token = secrets.token_urlsafe(32)
+        f.write(token)
+    return token
+
+class SchedulerUnavailable(Exception):
+    """Raised when the scheduler service can't be reached."""
+
+def _request(method: str, path: str, **kwargs) -> dict:
+    try:
+        response = _session.request(method, f"{SCHEDULER_URL}{path}", timeout=10,
+                                    headers={TOKEN_HEADER: load_token()}, **kwargs)
+    except requests.ConnectionError:
+        raise SchedulerUnavailable(
+            f"Scheduler service is not running at {SCHEDULER_URL}. Start it with `moth scheduler`."
+        )
+
+    data = response.json()
+    if response.status_code >= 400:
+        raise ValueError(data.get('error', response.text))
+    return data
+
+def is_running() -> bool:
+    """True if the scheduler service answers its health check."""
+    try:
+        return _request('GET', '/health').get('status') == 'ok'
+    except Exception:
+        return False
+
+def list_jobs() -> list:
+    """Returns the scheduled jobs as dicts (id, name, trigger, next_run_time, last_run, stats)."""
+    return _request('GET', '/jobs')['jobs']
+
+def add_job(task_description: str, trigger_type: str, time_value: str, **options) -> dict:
+    """Schedules an agent job on the service. Extra options are passed to add_agent_job."""
+    payload = {
+        'task_description': task_description,
+        'trigger_type': trigger_type,
+        'time_value': time_value,
+        **options,
+    }
+    return _request('POST', '/jobs', json=payload)['job']
+
+def remove_job(job_id: str) -> None:
+    _request('DELETE', f"/jobs/{job_id}")
+
+def format_run_stats(stats: dict) -> str:
+    """One-line summary of a job's run history, e.g. for the sidebar or list_scheduled_tasks."""
+    if not stats:
+        return "No runs yet"
+    line = f"Last Run: {stats['last_outcome']}"
+    if stats.get('last_duration') is not None:
+        line += f" in {stats['last_duration']:.1f}s"
+    if stats.get('p95_duration') is not None:
+        line += f" | p95 {stats['p95_duration']:.1f}s"
+    line += f" | Failure Rate: {stats['failure_rate']:.0%} of {stats['runs']} runs"
+    return line
@@ -1,85 +1,687 @@
+import hashlib
 import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor as ConcurrentThreadPool
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor, ProcessPoolExecutor
+from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_MISSED
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.cron.fields import DEFAULT_VALUES as CRON_DEFAULTS
+from moth import run_history
 from moth.tools.gmail_ops import send_email
-import streamlit as st
 from tzlocal import get_localzone
 
 # Configure logging
 logging.basicConfig()
 logging.getLogger('apscheduler').setLevel(logging.WARNING)
 
-@st.cache_resource
-def get_scheduler():
-    from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
-    
-    # Persistence config: Save jobs to SQLite database 'scheduled_tasks.db'
-    jobstores = {
-        'default': SQLAlchemyJobStore(url='sqlite:///scheduled_tasks.db')
+# Agent jobs (LLM calls, tools, email) run on their own bounded executor so a burst
+# of cron jobs can't starve the default pool or the UI living in the same process.
+# MOTH_SCHEDULER_EXECUTOR: 'thread' (default) or 'process' for full isolation.
+AGENT_EXECUTOR = os.getenv("MOTH_SCHEDULER_EXECUTOR", "thread")
+AGENT_MAX_WORKERS = int(os.getenv("MOTH_SCHEDULER_MAX_WORKERS", "2"))
+
+# Defaults for agent jobs, overridable per job through `schedule_task`
+DEFAULT_MAX_INSTANCES = 1
+DEFAULT_COALESCE = True
+DEFAULT_MISFIRE_GRACE_TIME = 300  # seconds
+
+DB_FILE = "scheduled_tasks.db"
+
+# Where results are sent, and how long digest jobs wait for siblings firing together
+DELIVERY_CHANNELS = ('email', 'telegram')
+DIGEST_WINDOW = int(os.getenv("MOTH_DIGEST_WINDOW", "60"))  # seconds
+
+# Change detection for recurring jobs: what to do when the result didn't change,
+# and which cheap input checks can skip the LLM call entirely
+NO_CHANGE_ACTIONS = ('suppress', 'heartbeat')
+PRECHECKS = ('gmail', 'drive')
+
+# Load spreading / admission control for recurring jobs:
+# - jitter: random +/- seconds added to every interval/cron fire time (APScheduler `jitter`)
+# - spread window: deterministic per-job start offset so jobs created for the same
+#   minute don't all fire on second 0 (interval: start_date shift, cron: the minute/second
+#   fields the user left unset)
+# - cap: max agent turns running at once across all jobs; excess jobs wait for a slot
+DEFAULT_JITTER = int(os.getenv("MOTH_SCHEDULER_JITTER", "60"))  # seconds
+SPREAD_WINDOW = int(os.getenv("MOTH_SCHEDULER_SPREAD_WINDOW", "300"))  # seconds
+MAX_CONCURRENT_AGENT_JOBS = int(os.getenv("MOTH_MAX_CONCURRENT_AGENT_JOBS", "2"))
+
+# Last observed timings per job id (queue delay, wall time, outcome)
+JOB_METRICS = {}
+
+# Note: with the 'process' executor this cap applies per worker process (the pool size is the global cap)
+_agent_slots = threading.BoundedSemaphore(MAX_CONCURRENT_AGENT_JOBS)
+ADMISSION_STATS = {'running': 0, 'deferred': 0, 'max_wait': 0.0}
+_admission_lock = threading.Lock()
+_recent_start_offsets = deque(maxlen=200)  # seconds past the scheduled minute, for spread stats
+
+# The scheduler is owned by a single process: the standalone service (`moth scheduler`).
+# Clients (tools, app.py, Telegram bot) talk to it through moth.scheduler_client.
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def _build_executors():
+    """Default pool for light jobs + a dedicated, bounded pool for agent jobs."""
+    if AGENT_EXECUTOR == "process":
+        agent_executor = ProcessPoolExecutor(max_workers=AGENT_MAX_WORKERS)
+    else:
+        agent_executor = ThreadPoolExecutor(max_workers=AGENT_MAX_WORKERS)
+    return {
+        'default': ThreadPoolExecutor(max_workers=5),
+        'agent': agent_executor,
     }
-    
-    scheduler = BackgroundScheduler(
-        jobstores=jobstores, 
-        timezone=str(get_localzone())
+
+def _record_job_metrics(event):
+    """
+    Scheduler listener: combines the scheduled run time with the timings returned
+    by `execute_scheduled_task` to get queue delay (scheduled -> started), wall time
+    and start offset (started -> how far past the scheduled minute, i.e. observed spread).
+    """
+    metrics = {
+        'scheduled_at': event.scheduled_run_time,
+        'finished_at': datetime.now(event.scheduled_run_time.tzinfo),
+    }
+
+    if event.code == EVENT_JOB_MISSED:
+        metrics['outcome'] = 'missed'
+    elif event.code == EVENT_JOB_ERROR:
+        metrics['outcome'] = 'error'
+        metrics['error'] = str(event.exception)
+    elif isinstance(event.retval, dict) and 'started_at' in event.retval:
+        metrics.update(event.retval)
+        metrics['queue_delay'] = max(0.0, event.retval['started_at'] - event.scheduled_run_time.timestamp())
+        nominal = event.scheduled_run_time.replace(second=0, microsecond=0)
+        metrics['start_offset'] = event.retval['started_at'] - nominal.timestamp()
+        _recent_start_offsets.append(metrics['start_offset'])
+    else:
+        metrics['outcome'] = 'ok'
+
+    # A digest batch: each member job gets its own run, with the batch's timings
+    members = metrics.pop('members', None)
+    if members:
+        for member in members:
+            member_metrics = {**metrics, **member}
+            job_id = member_metrics.pop('job_id')
+            JOB_METRICS[job_id] = member_metrics
+            run_history.record_run(job_id, member_metrics)
+        print(f"📊 Digest batch: wall time {metrics['wall_time']:.2f}s ({metrics['outcome']}), "
+              f"recorded for {len(members)} jobs")
+        return
+
+    JOB_METRICS[event.job_id] = metrics
+
+    # Digest enqueue jobs don't run the agent; their batch is recorded on its own
+    if 'wall_time' in metrics or metrics['outcome'] != 'ok':
+        run_history.record_run(event.job_id, metrics)
+
+    if 'wall_time' in metrics:
+        print(f"📊 Job {event.job_id}: queue delay {metrics['queue_delay']:.2f}s, "
+              f"admission wait {metrics.get('admission_wait', 0.0):.2f}s, "
+              f"wall time {metrics['wall_time']:.2f}s ({metrics['outcome']})")
+    else:
+        print(f"📊 Job {event.job_id}: {metrics['outcome']}")
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            return _scheduler
+
+        from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+        from apscheduler.jobstores.memory import MemoryJobStore
+        
+        # Persistence config: Save jobs to SQLite database 'scheduled_tasks.db'
+        # 'memory' holds transient internal jobs (digest batches) that shouldn't be persisted
+        jobstores = {
+            'default': SQLAlchemyJobStore(url=f'sqlite:///{DB_FILE}'),
+            'memory': MemoryJobStore()
+        }
+        
+        scheduler = BackgroundScheduler(
+            jobstores=jobstores, 
+            executors=_build_executors(),
+            timezone=str(get_localzone())
+        )
+        scheduler.add_listener(_record_job_metrics, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED)
+        scheduler.start()
+        _scheduler = scheduler
+        return scheduler
+
+@contextmanager
+def agent_slot():
+    """
+    Admission control: holds one of MAX_CONCURRENT_AGENT_JOBS slots while an agent turn runs.
+    When all slots are busy the caller is deferred (waits) instead of failing.
+    Yields a dict whose 'wait' is filled with the seconds spent waiting.
+    """
+    start = time.perf_counter()
+    if not _agent_slots.acquire(blocking=False):
+        with _admission_lock:
+            ADMISSION_STATS['deferred'] += 1
+        print(f"🚦 All {MAX_CONCURRENT_AGENT_JOBS} agent slots busy, deferring job...")
+        _agent_slots.acquire()
+
+    admission = {'wait': time.perf_counter() - start}
+    with _admission_lock:
+        ADMISSION_STATS['max_wait'] = max(ADMISSION_STATS['max_wait'], admission['wait'])
+        ADMISSION_STATS['running'] += 1
+    try:
+        yield admission
+    finally:
+        with _admission_lock:
+            ADMISSION_STATS['running'] -= 1
+        _agent_slots.release()
+
+def get_admission_stats() -> dict:
+    """Current load plus the observed start-time spread of recent runs."""
+    stats = dict(ADMISSION_STATS, cap=MAX_CONCURRENT_AGENT_JOBS)
+    if _recent_start_offsets:
+        stats['start_offset_min'] = min(_recent_start_offsets)
+        stats['start_offset_max'] = max(_recent_start_offsets)
+    return stats
+
+def spread_offset(job_id: str) -> int:
+    """Deterministic start offset (0..SPREAD_WINDOW) derived from the job id."""
+    if SPREAD_WINDOW <= 0:
+        return 0
+    return int(job_id[:8], 16) % SPREAD_WINDOW
+
+def _cron_period(fields: dict):
+    """Time between the next two fire times of a cron trigger (None if it fires less than twice)."""
+    trigger = CronTrigger(timezone=get_localzone(), **fields)
+    first = trigger.get_next_fire_time(None, datetime.now(trigger.timezone))
+    if first is None:
+        return None
+    following = trigger.get_next_fire_time(first, first + timedelta(seconds=1))
+    return following - first if following else None
+
+def spread_cron_fields(fields: dict, offset: int) -> dict:
+    """
+    Applies a spread offset to the cron fields the user left unset.
+    APScheduler turns unset fields above the smallest given one into '*', so every
+    unset field below it is pinned explicitly: minute to offset // 60 (when free),
+    second to offset % 60, the rest to their minimum. "hour=8" becomes
+    hour=8, minute=offset // 60, second=offset % 60 and still fires once a day.
+    Falls back to the user's fields if the result would fire at a different cadence.
+    """
+    if 'second' in fields:
+        return fields
+    given = [name for name in CronTrigger.FIELD_NAMES if name in fields]
+    below = CronTrigger.FIELD_NAMES[CronTrigger.FIELD_NAMES.index(given[-1]) + 1:] if given else CronTrigger.FIELD_NAMES
+    spread = dict(fields)
+    for name in below:
+        spread[name] = CRON_DEFAULTS[name]
+    if 'minute' in below:
+        spread['minute'] = (offset // 60) % 60
+    spread['second'] = offset % 60
+
+    if _cron_period(spread) != _cron_period(fields):
+        print(f"DEBUG: Spread offset would change the cadence of cron {fields}; not spreading.")
+        return fields
+    return spread
+
+def parse_time_value(time_value: str) -> dict:
+    """Parses "hours=2" / "hour=8, minute=30" style strings into trigger kwargs."""
+    kwargs = {}
+    for part in time_value.split(','):
+        unit, val = part.strip().split('=')
+        kwargs[unit.strip()] = int(val)
+    return kwargs
+
+def add_agent_job(scheduler, task_description: str, trigger_type: str, time_value: str,
+                  max_instances: int = DEFAULT_MAX_INSTANCES,
+                  coalesce: bool = DEFAULT_COALESCE,
+                  misfire_grace_time: int = DEFAULT_MISFIRE_GRACE_TIME,
+                  delivery: str = 'email',
+                  digest: bool = False,
+                  notify_on_change: bool = False,
+                  on_no_change: str = 'suppress',
+                  precheck: str = None,
+                  jitter: int = None):
+    """
+    Adds an agent job on the dedicated 'agent' executor.
+    Recurring non-digest jobs get jitter (default DEFAULT_JITTER) and a per-job start offset within SPREAD_WINDOW.
+    Digest jobs only enqueue their prompt (cheap, default executor); the batch runs on 'agent'.
+    Raises ValueError for an unknown trigger_type, delivery channel or change-detection option.
+    """
+    if trigger_type == 'date':
+        trigger_kwargs = {'run_date': datetime.strptime(time_value, "%Y-%m-%d %H:%M:%S")}
+    elif trigger_type in ('interval', 'cron'):
+        # rudimentary parsing for "hours=X" or "hour=X, minute=X"
+        trigger_kwargs = parse_time_value(time_value)
+    else:
+        raise ValueError(f"Unknown trigger_type: {trigger_type}. Use 'date', 'interval', or 'cron'.")
+
+    if delivery not in DELIVERY_CHANNELS:
+        raise ValueError(f"Unknown delivery: {delivery}. Use {' or '.join(repr(c) for c in DELIVERY_CHANNELS)}.")
+
+    if on_no_change not in NO_CHANGE_ACTIONS:
+        raise ValueError(f"Unknown on_no_change: {on_no_change}. Use 'suppress' or 'heartbeat'.")
+
+    if precheck and precheck not in PRECHECKS:
+        raise ValueError(f"Unknown precheck: {precheck}. Use 'gmail' or 'drive'.")
+
+    if digest and (notify_on_change or precheck):
+        raise ValueError("Change detection is not supported for digest jobs.")
+
+    # Generate the ID up front so the job can key its change-detection state on it
+    job_id = uuid.uuid4().hex
+
+    # Spread recurring jobs so they don't all hit the quotas at the same instant.
+    # Not digest jobs: they must fire within DIGEST_WINDOW of each other to be grouped,
+    # and their batch already runs under agent_slot.
+    if trigger_type in ('interval', 'cron') and not digest:
+        offset = spread_offset(job_id)
+        if trigger_type == 'interval':
+            # APScheduler's default first run is now + interval; shift it by the offset
+            interval = timedelta(**{k: v for k, v in trigger_kwargs.items()
+                                    if k in ('weeks', 'days', 'hours', 'minutes', 'seconds')})
+            trigger_kwargs.setdefault('start_date', datetime.now() + interval + timedelta(seconds=offset))
+        else:
+            trigger_kwargs = spread_cron_fields(trigger_kwargs, offset)
+        trigger_kwargs.setdefault('jitter', DEFAULT_JITTER if jitter is None else jitter)
+
+    if digest:
+        job_kwargs = {'delivery': delivery, 'job_id': job_id}
+    else:
+        job_kwargs = {
+            'delivery': delivery,
+            'job_id': job_id,
+            'notify_on_change': notify_on_change,
+            'on_no_change': on_no_change,
+            'precheck': precheck,
+        }
+
+    return scheduler.add_job(
+        enqueue_digest_task if digest else execute_scheduled_task,
+        trigger_type,
+        id=job_id,
+        args=[task_description],
+        kwargs=job_kwargs,
+        # Use task description as the job name for readability
+        name=task_description,
+        executor='default' if digest else 'agent',
+        max_instances=max_instances,
+        coalesce=coalesce,
+        misfire_grace_time=misfire_grace_time,
+        **trigger_kwargs
     )
-    scheduler.start()
-    return scheduler
 
-def execute_scheduled_task(task_prompt: str, model_name: str = "gemini-2.0-flash"):
+# --- Delivery ---
+
+_user_email = None
+
+def get_user_email() -> str:
     """
-    Executes a scheduled task by running the agent and emailing the result.
+    The authenticated user's address (results are sent to themselves).
+    Looked up once per process instead of one getProfile call per task.
     """
-    print(f"⏰ EXECUTING SCHEDULED TASK: {task_prompt}")
+    global _user_email
+    if not _user_email:
+        from moth.tools.utils import get_gmail_service
+        service = get_gmail_service()
+        profile = service.users().getProfile(userId='me').execute()
+        _user_email = profile['emailAddress']
+    return _user_email
+
+def deliver_result(subject: str, body: str, delivery: str = 'email'):
+    """
+    Sends a task result through the chosen channel ('email' or 'telegram').
+    Returns the Gmail id of the sent email (None for Telegram), for advance_precheck_token.
+    """
+    if delivery == 'telegram':
+        from moth.tools.telegram_ops import send_telegram_alert
+        send_telegram_alert.invoke({"message": f"{subject}\n\n{body}"})
+        return
+
+    # FIX: Call the tool using .invoke() with a dictionary, not as a function with kwargs
+    # This resolves the "unexpected keyword argument" TypeError with LangChain tools
+    email_args = {
+        "to": get_user_email(),
+        "subject": subject,
+        "message_text": body
+    }
     
+    # Robustness: Handle potential argument mismatch if tool expects 'to_recipients'
+    # (User requested check for name mismatch, e.g. create_gmail_draft)
+    if "to" in email_args and hasattr(send_email, "args_schema") and "to_recipients" in send_email.args_schema.schema()["properties"]:
+         email_args["to_recipients"] = email_args.pop("to")
+
+    sent = send_email.invoke(email_args)
+    match = re.search(r'\bId: (\S+)', sent or '', re.IGNORECASE)
+    return match.group(1) if match else None
+
+def _run_prompt(task_prompt: str):
+    """
+    Runs one isolated agent turn under admission control.
+    Returns a dict with 'output', 'model_used', 'tokens', 'tool_calls', 'admission_wait'
+    and 'error' (set when run_agent reported a failed turn).
+    """
     # Lazy import to avoid circular dependency
-    from agent import run_agent
-    
-    try:
-        # Run the agent
+    from moth.agent import run_agent
+
+    with agent_slot() as admission:
         # We pass an empty chat history as this is a new, isolated task
-        result = run_agent(task_prompt, chat_history=[])
-        
-        output_text = result['output'] if isinstance(result, dict) else result
-        model_used = result['model_used'] if isinstance(result, dict) else "Unknown"
+        result = run_agent(task_prompt, chat_history=[], return_details=True)
+
+    if not isinstance(result, dict):
+        result = {'output': result}
+    return {
+        'output': result.get('output'),
+        'model_used': result.get('model_used') or "Unknown",
+        'tokens': result.get('tokens', 0),
+        'tool_calls': result.get('tool_calls', 0),
+        'admission_wait': admission['wait'],
+        'error': result.get('error'),
+    }
 
-        # Email the result to the user (assuming 'me' is the user)
-        # In a real multi-user app, we'd need the user's email address passed in
+def execute_scheduled_task(task_prompt: str, model_name: str = "gemini-2.0-flash", delivery: str = 'email',
+                           job_id: str = None, notify_on_change: bool = False,
+                           on_no_change: str = 'suppress', precheck: str = None):
+    """
+    Executes a scheduled task by running the agent and sending the result.
+    With change detection enabled, unchanged inputs (precheck) skip the agent entirely
+    and unchanged results are suppressed or reduced to a heartbeat.
+    Returns timings (start timestamp, wall time, outcome) for the scheduler listener.
+    """
+    print(f"⏰ EXECUTING SCHEDULED TASK: {task_prompt}")
+    started_at = time.time()
+    start = time.perf_counter()
+    outcome = 'ok'
+    error = None
+    run = {}
+    sent_id = None
+    run_started = datetime.now().astimezone()
+    
+    try:
+        state = get_job_state(job_id) if job_id and (notify_on_change or precheck) else {}
         subject = f"Scheduled Task Result: {task_prompt[:30]}..."
-        email_body = f"Task: {task_prompt}\n\nModel Used: {model_used}\n\nResult:\n{output_text}"
-        
-        print(f"📧 Sending email for task: {task_prompt}")
-        
-        # We need to know who to send it to. 
-        # For this personal assistant, we'll assume the user sends it to themselves.
-        # Ideally, we should fetch the user's email address, but 'me' works for the API if we want to send TO me FROM me.
-        # But send_email requires a 'to' address. 
-        # Let's try to get the user's profile or just hardcode a placeholder if we can't find it.
-        # Actually, let's just use the 'get_profile' equivalent or ask user.
-        # For now, to keep it simple and robust for a personal bot, 
-        # let's try to send to the same email we are authenticated with, 
-        # OR just log it if we can't easily find the "to" address.
-        # BETTER YET: The 'send_email' tool requires a 'to' address.
-        # We will attempt to get the user's email from the profile.
-        
-        from tools.utils import get_gmail_service
-        service = get_gmail_service()
-        profile = service.users().getProfile(userId='me').execute()
-        user_email = profile['emailAddress']
-        
-        # FIX: Call the tool using .invoke() with a dictionary, not as a function with kwargs
-        # This resolves the "unexpected keyword argument" TypeError with LangChain tools
-        email_args = {
-            "to": user_email,
-            "subject": subject,
-            "message_text": email_body
-        }
-        
-        # Robustness: Handle potential argument mismatch if tool expects 'to_recipients'
-        # (User requested check for name mismatch, e.g. create_gmail_draft)
-        if "to" in email_args and hasattr(send_email, "args_schema") and "to_recipients" in send_email.args_schema.schema()["properties"]:
-             email_args["to_recipients"] = email_args.pop("to")
 
-        send_email.invoke(email_args)
-        print("✅ Scheduled task executed and email sent.")
+        # 1. Cheap pre-check: skip the LLM call if the inputs haven't moved
+        precheck_token = get_precheck_token(precheck) if precheck else None
+        if precheck_token and precheck_token == state.get('precheck_token'):
+            outcome = 'skipped'
+            print(f"⏭️ Inputs unchanged ({precheck}), skipping agent run.")
+            if on_no_change == 'heartbeat':
+                sent_id = deliver_result(subject, f"Task: {task_prompt}\n\nNo change since the last run.", delivery)
+                if job_id:
+                    # The heartbeat email itself moves the historyId; step past it (and only it)
+                    save_job_state(job_id, None, advance_precheck_token(precheck, precheck_token, run_started, [sent_id]))
+        else:
+            run = _run_prompt(task_prompt)
+            output_text, model_used = run.pop('output'), run['model_used']
+            error = run.pop('error')
+            if error:
+                # run_agent returns failures as text; deliver it, but count the run as failed
+                outcome = 'error'
+
+            # 2. Result fingerprint: don't re-send the same answer
+            result_hash = fingerprint_result(output_text) if notify_on_change and not error else None
+            if result_hash and result_hash == state.get('result_hash'):
+                outcome = 'unchanged'
+                print("⏭️ Result unchanged since last run.")
+                if on_no_change == 'heartbeat':
+                    sent_id = deliver_result(subject, f"Task: {task_prompt}\n\nNo change since the last run.", delivery)
+            else:
+                body = f"Task: {task_prompt}\n\nModel Used: {model_used}\n\nResult:\n{output_text}"
+                print(f"📧 Sending {delivery} for task: {task_prompt}")
+                sent_id = deliver_result(subject, body, delivery)
+                print("✅ Scheduled task executed and result sent.")
+
+            # A failed run keeps the old state, so the next run retries instead of skipping
+            if job_id and (notify_on_change or precheck) and not error:
+                if precheck:
+                    # Our own result email (or what the agent sent or saved) would otherwise look
+                    # like a change next run; changes from anyone else during the run still count
+                    precheck_token = advance_precheck_token(precheck, precheck_token, run_started, [sent_id])
+                save_job_state(job_id, result_hash, precheck_token)
 
     except Exception as e:
+        outcome = 'error'
+        error = str(e)
         print(f"❌ Error executing scheduled task: {e}")
+
+    return {
+        'started_at': started_at,
+        'wall_time': time.perf_counter() - start,
+        **run,
+        'outcome': outcome,
+        'error': error,
+    }
+
+# --- Change detection ---
+# Per-job fingerprint of the last result and the last pre-check token, stored next to the jobs.
+
+# Volatile bits (dates, clock times) that shouldn't count as a change
+_VOLATILE_PATTERNS = [
+    re.compile(r'\b\d{4}-\d{2}-\d{2}(?:[ t]\d{2}:\d{2}(?::\d{2})?)?\b'),
+    re.compile(r'\b\d{1,2}:\d{2}(?::\d{2})?\s*(?:am|pm)?\b'),
+]
+_WHITESPACE = re.compile(r'\s+')
+
+def init_state_db():
+    conn = sqlite3.connect(DB_FILE)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS job_fingerprints (
+            job_id TEXT PRIMARY KEY,
+            result_hash TEXT,
+            precheck_token TEXT,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+def get_job_state(job_id: str) -> dict:
+    """Returns {'result_hash', 'precheck_token'} from the last run (empty if none)."""
+    init_state_db()
+    conn = sqlite3.connect(DB_FILE)
+    row = conn.execute(
+        "SELECT result_hash, precheck_token FROM job_fingerprints WHERE job_id = ?", (job_id,)
+    ).fetchone()
+    conn.close()
+    if not row:
+        return {}
+    return {'result_hash': row[0], 'precheck_token': row[1]}
+
+def save_job_state(job_id: str, result_hash: str, precheck_token: str):
+    init_state_db()
+    conn = sqlite3.connect(DB_FILE)
+    conn.execute("""
+        INSERT INTO job_fingerprints (job_id, result_hash, precheck_token, updated_at)
+        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(job_id) DO UPDATE SET
+            result_hash = COALESCE(excluded.result_hash, result_hash),
+            precheck_token = excluded.precheck_token,
+            updated_at = CURRENT_TIMESTAMP
+    """, (job_id, result_hash, precheck_token))
+    conn.commit()
+    conn.close()
+
+def forget_job_state(job_id: str):
+    """Drops stored fingerprints when a job is removed."""
+    init_state_db()
+    conn = sqlite3.connect(DB_FILE)
+    conn.execute("DELETE FROM job_fingerprints WHERE job_id = ?", (job_id,))
+    conn.commit()
+    conn.close()
+
+def fingerprint_result(text: str) -> str:
+    """Hash of the normalized output (case, whitespace, dates and times ignored)."""
+    normalized = (text or "").lower()
+    for pattern in _VOLATILE_PATTERNS:
+        normalized = pattern.sub('', normalized)
+    normalized = _WHITESPACE.sub(' ', normalized).strip()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+def get_precheck_token(precheck: str) -> str:
+    """
+    A cheap marker that moves whenever the inputs change:
+    - 'gmail': the mailbox historyId (from getProfile)
+    - 'drive': the Drive changes start page token
+    """
+    if precheck == 'gmail':
+        from moth.tools.utils import get_gmail_service
+        profile = get_gmail_service().users().getProfile(userId='me').execute()
+        return str(profile['historyId'])
+    if precheck == 'drive':
+        from moth.tools.utils import get_drive_service
+        return get_drive_service().changes().getStartPageToken().execute()['startPageToken']
+    return None
+
+def advance_precheck_token(precheck: str, token: str, since: datetime, own_message_ids: list = None) -> str:
+    """
+    The token to store after a run that started at `since` with pre-run `token`:
+    moved past the changes we caused ourselves, or `token` itself if anything else
+    changed meanwhile (so the next run doesn't skip it).
+    - 'gmail': history since `token` may only touch `own_message_ids` or mail sent
+      from this account (our delivery, emails the agent sent)
+    - 'drive': changes since `token` must be files last modified by this account
+      after `since` (files the agent created or edited)
+    """
+    own = {message_id for message_id in own_message_ids or [] if message_id}
+    try:
+        if precheck == 'gmail':
+            from moth.tools.utils import get_gmail_service
+            history = get_gmail_service().users().history()
+            page_token, latest = None, token
+            while True:
+                response = history.list(userId='me', startHistoryId=token, pageToken=page_token).execute()
+                for record in response.get('history', []):
+                    for added in record.get('messagesAdded', []):
+                        if 'SENT' in added['message'].get('labelIds', []):
+                            own.add(added['message']['id'])
+                    if any(message['id'] not in own for message in record.get('messages', [])):
+                        return token
+                latest = response.get('historyId', latest)
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    return str(latest)
+        if precheck == 'drive':
+            from moth.tools.utils import get_drive_service
+            changes = get_drive_service().changes()
+            page_token = token
+            while True:
+                response = changes.list(
+                    pageToken=page_token, spaces='drive', includeRemoved=True,
+                    fields="nextPageToken, newStartPageToken, changes(file(modifiedTime, lastModifyingUser(me)))"
+                ).execute()
+                for change in response.get('changes', []):
+                    file = change.get('file') or {}
+                    modified = file.get('modifiedTime')
+                    if not (file.get('lastModifyingUser', {}).get('me') and modified
+                            and datetime.fromisoformat(modified.replace('Z', '+00:00')) >= since):
+                        return token
+                if 'newStartPageToken' in response:
+                    return response['newStartPageToken']
+                page_token = response['nextPageToken']
+    except Exception as e:
+        print(f"DEBUG: Couldn't advance the {precheck} precheck token ({e}); keeping the pre-run one.")
+    return token
+
+# --- Digest mode ---
+# Digest jobs that fire within DIGEST_WINDOW seconds of each other are grouped:
+# their prompts run concurrently and the results go out as ONE email/Telegram message.
+
+_digest_buffer = {}  # delivery -> [(task_prompt, job_id), ...]
+_digest_lock = threading.Lock()
+
+def enqueue_digest_task(task_prompt: str, delivery: str = 'email', job_id: str = None):
+    """Collects a digest job's prompt; the first one in a window arms the flush."""
+    with _digest_lock:
+        pending = _digest_buffer.setdefault(delivery, [])
+        pending.append((task_prompt, job_id))
+        first_in_window = len(pending) == 1
+
+    if first_in_window:
+        print(f"🗂️ Digest window opened ({DIGEST_WINDOW}s) for {delivery}")
+        timer = threading.Timer(DIGEST_WINDOW, _flush_digest, args=[delivery])
+        timer.daemon = True
+        timer.start()
+
+def _flush_digest(delivery: str):
+    with _digest_lock:
+        pending = _digest_buffer.pop(delivery, [])
+    if not pending:
+        return
+
+    # Run the batch on the agent executor; the memory jobstore keeps it out of scheduled_tasks.db
+    # (its run is recorded against the member jobs' ids, see _record_job_metrics)
+    get_scheduler().add_job(
+        execute_digest,
+        args=[[prompt for prompt, _ in pending]],
+        kwargs={'delivery': delivery, 'job_ids': [job_id for _, job_id in pending]},
+        name=f"Digest ({len(pending)} tasks)",
+        executor='agent',
+        jobstore='memory',
+        misfire_grace_time=None
+    )
+
+def execute_digest(task_prompts: list, delivery: str = 'email', job_ids: list = None):
+    """
+    Runs several task prompts concurrently and sends all results in a single message.
+    Returns timings like execute_scheduled_task, plus 'members': one result per
+    member job (job_id, model, tokens, tool calls, outcome, error) for its run history.
+    """
+    print(f"⏰ EXECUTING DIGEST: {len(task_prompts)} tasks")
+    started_at = time.time()
+    start = time.perf_counter()
+    outcome = 'ok'
+    error = None
+    usage = {'model_used': set(), 'tokens': 0, 'tool_calls': 0, 'admission_wait': 0.0}
+
+    sections = []
+    members = []
+    with ConcurrentThreadPool(max_workers=min(len(task_prompts), AGENT_MAX_WORKERS)) as pool:
+        futures = [pool.submit(_run_prompt, prompt) for prompt in task_prompts]
+        for prompt, job_id, future in zip(task_prompts, job_ids or [None] * len(task_prompts), futures):
+            member = {'job_id': job_id, 'model_used': None, 'tokens': 0, 'tool_calls': 0,
+                      'outcome': 'ok', 'error': None}
+            try:
+                run = future.result()
+                usage['model_used'].add(run['model_used'])
+                usage['tokens'] += run['tokens']
+                usage['tool_calls'] += run['tool_calls']
+                usage['admission_wait'] = max(usage['admission_wait'], run['admission_wait'])
+                member.update(model_used=run['model_used'], tokens=run['tokens'], tool_calls=run['tool_calls'])
+                if run['error']:
+                    outcome = 'partial'
+                    member.update(outcome='error', error=run['error'])
+                sections.append(f"## {prompt}\n(Model Used: {run['model_used']})\n\n{run['output']}")
+            except Exception as e:
+                outcome = 'partial'
+                member.update(outcome='error', error=str(e))
+                sections.append(f"## {prompt}\n\n❌ Error: {e}")
+            members.append(member)
+
+    try:
+        subject = f"Scheduled Digest: {len(task_prompts)} tasks"
+        print(f"📧 Sending {delivery} digest for {len(task_prompts)} tasks")
+        deliver_result(subject, "\n\n".join(sections), delivery)
+        print("✅ Digest executed and result sent.")
+    except Exception as e:
+        outcome = 'error'
+        error = str(e)
+        for member in members:
+            member.update(outcome='error', error=error)
+        print(f"❌ Error sending digest: {e}")
+
+    usage['model_used'] = ", ".join(sorted(usage['model_used'])) or None
+    return {
+        'started_at': started_at,
+        'wall_time': time.perf_counter() - start,
+        **usage,
+        'outcome': outcome,
+        'error': error,
+        # Jobs scheduled before job ids were passed to digest tasks have no history
+        'members': [member for member in members if member['job_id']],
+    }
@@ -0,0 +1,169 @@
+"""
+Headless scheduler service (`moth scheduler`).
+
+This process owns the APScheduler instance and its jobstore (scheduled_tasks.db).
+Everything else (tools, app.py, the Telegram bot) talks to it over a small local
+JSON API, see moth.scheduler_client. Every request must carry the shared secret
+from TOKEN_FILE in the X-Moth-Token header, and POST bodies must be
+application/json:
+
+    GET    /health       -> {"status": "ok", "jobs": N, "admission": {...}}
+    GET    /jobs         -> {"jobs": [...]}
+    POST   /jobs         -> {"job": {...}}   (body: task_description, trigger_type, time_value, options)
+    DELETE /jobs/<id>    -> {"removed": "<id>"}
+"""
+
+import hmac
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+from moth import run_history
+from moth.scheduler_client import SCHEDULER_URL, TOKEN_HEADER, load_token
+from moth.scheduler_engine import get_scheduler, add_agent_job, forget_job_state, get_admission_stats, JOB_METRICS
+
+# Options a client may pass through to add_agent_job
+JOB_OPTIONS = (
+    'max_instances', 'coalesce', 'misfire_grace_time', 'delivery', 'digest',
+    'notify_on_change', 'on_no_change', 'precheck', 'jitter'
+)
+
+def _serialize(value):
+    """Makes datetimes (and dicts of them) JSON friendly."""
+    if isinstance(value, dict):
+        return {k: _serialize(v) for k, v in value.items()}
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+def job_to_dict(job, stats: dict = None) -> dict:
+    return {
+        'id': job.id,
+        'name': job.name,
+        'trigger': str(job.trigger),
+        'next_run_time': _serialize(job.next_run_time),
+        'last_run': _serialize(JOB_METRICS.get(job.id)),
+        # Aggregates from the run history (runs, failure_rate, p95_duration, last_*)
+        'stats': (stats or {}).get(job.id),
+    }
+
+class SchedulerRequestHandler(BaseHTTPRequestHandler):
+    """Routes the local JSON API onto the in-process scheduler."""
+    token = None  # set by run_service
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length))
+
+    def _authorized(self) -> bool:
+        """Checks the shared secret; replies 403 and returns False when it's missing or wrong."""
+        sent = self.headers.get(TOKEN_HEADER, '')
+        if self.token and hmac.compare_digest(sent.encode(), self.token.encode()):
+            return True
+        self._send_json(403, {'error': "Missing or invalid scheduler token."})
+        return False
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        path = urlparse(self.path).path.rstrip('/')
+        scheduler = get_scheduler()
+
+        if path == '/health':
+            self._send_json(200, {
+                'status': 'ok',
+                'jobs': len(scheduler.get_jobs()),
+                'admission': get_admission_stats(),
+            })
+        elif path == '/jobs':
+            jobs = scheduler.get_jobs()
+            stats = run_history.get_job_stats([job.id for job in jobs]) if jobs else {}
+            self._send_json(200, {'jobs': [job_to_dict(job, stats) for job in jobs]})
+        else:
+            self._send_json(404, {'error': f"Unknown path: {path}"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        path = urlparse(self.path).path.rstrip('/')
+        if path != '/jobs':
+            self._send_json(404, {'error': f"Unknown path: {path}"})
+            return
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type != 'application/json':
+            self._send_json(415, {'error': "Content-Type must be application/json."})
+            return
+
+        try:
+            data = self._read_json()
+            options = {k: data[k] for k in JOB_OPTIONS if data.get(k) is not None}
+            job = add_agent_job(
+                get_scheduler(),
+                data['task_description'],
+                data['trigger_type'],
+                data['time_value'],
+                **options
+            )
+            self._send_json(201, {'job': job_to_dict(job)})
+        except KeyError as e:
+            self._send_json(400, {'error': f"Missing field: {e}"})
+        except Exception as e:
+            self._send_json(400, {'error': str(e)})
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        path = urlparse(self.path).path.rstrip('/')
+        if not path.startswith('/jobs/'):
+            self._send_json(404, {'error': f"Unknown path: {path}"})
+            return
+
+        job_id = path[len('/jobs/'):]
+        try:
+            get_scheduler().remove_job(job_id)
+            forget_job_state(job_id)
+            self._send_json(200, {'removed': job_id})
+        except Exception as e:
+            self._send_json(404, {'error': str(e)})
+
+    def log_message(self, format, *args):
+        # Keep the console for job output; only log failed requests
+        if args and str(args[1]).startswith(('4', '5')):
+            super().log_message(format, *args)
+
+def run_service(url: str = SCHEDULER_URL):
+    """Starts the scheduler and serves the local API until interrupted."""
+    parsed = urlparse(url)
+    host = parsed.hostname or '127.0.0.1'
+    port = parsed.port or 8765
+
+    # Bind first: the port is the single-instance lock. A second service must fail
+    # here, before its scheduler could fire due jobs from the shared jobstore.
+    try:
+        server = ThreadingHTTPServer((host, port), SchedulerRequestHandler)
+    except OSError as e:
+        print(f"❌ Can't bind http://{host}:{port} ({e}); is the scheduler already running?")
+        return
+    SchedulerRequestHandler.token = load_token()
+    scheduler = get_scheduler()
+    print(f"⏳ Moth scheduler running on http://{host}:{port} ({len(scheduler.get_jobs())} jobs loaded)")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping scheduler...")
+    finally:
+        server.server_close()
+        scheduler.shutdown(wait=False)
+
+if __name__ == "__main__":
+    run_service()
@@ -0,0 +1,375 @@
+"""
+Email supervisor: watches the inbox incrementally and asks the LLM about new mail only.
+
+Gmail's history API is used as a cursor: the last seen `historyId` is persisted,
+each check fetches only messages added since then, and analysed message ids are
+remembered so nothing is alerted twice. A check with no new mail costs one cheap
+history call and no LLM call. New mail is scored locally first (moth.urgency);
+only candidates above the threshold go to the LLM, plus a periodic recall sample
+of filtered-out mail.
+
+`supervise()` watches several inboxes (accounts and/or labels) from one loop.
+Each inbox polls on its own adaptive interval: faster while mail is flowing
+and during working hours, slower when idle and at night.
+
+The Gmail service and the LLM are passed in, so a check can be run against fakes:
+
+    sync = GmailSync(service=FakeGmail())
+    check_inbox(sync, llm=FakeLLM(), notify=print)
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from dotenv import load_dotenv
+from googleapiclient.errors import HttpError
+from moth.tools.gmail_ops import fetch_metadata
+from moth.urgency import select_candidates, select_recall_sample, record_check
+
+load_dotenv()
+
+DB_FILE = "supervisor_state.db"
+
+# First run (or an expired historyId): look at this many recent messages
+BOOTSTRAP_LIMIT = 10
+BOOTSTRAP_QUERY = "category:primary"
+
+# Added messages carrying any of these labels are not worth analysing
+SKIP_LABELS = {'SENT', 'DRAFT', 'SPAM', 'TRASH', 'CATEGORY_PROMOTIONS', 'CATEGORY_SOCIAL'}
+
+# Seen message ids are kept this long for de-duplication
+SEEN_RETENTION = 30 * 24 * 3600
+
+# Inboxes to watch: comma-separated "account:label" (account defaults to 'me', label to INBOX).
+# Accounts other than 'me' need delegated access for the authorised user.
+SUPERVISOR_INBOXES = os.getenv("MOTH_SUPERVISOR_INBOXES", "me:INBOX")
+SUPERVISOR_WORKERS = int(os.getenv("MOTH_SUPERVISOR_WORKERS", "4"))
+
+# Adaptive polling (seconds). Busy inboxes drift towards MIN_INTERVAL, quiet ones
+# back off towards the ceiling for the time of day.
+MIN_INTERVAL = int(os.getenv("MOTH_SUPERVISOR_MIN_INTERVAL", "60"))
+WORK_INTERVAL = int(os.getenv("MOTH_SUPERVISOR_WORK_INTERVAL", "600"))
+NIGHT_INTERVAL = int(os.getenv("MOTH_SUPERVISOR_NIGHT_INTERVAL", "1800"))
+WORK_HOURS = tuple(int(h) for h in os.getenv("MOTH_SUPERVISOR_WORK_HOURS", "8-19").split("-"))
+
+# Per-inbox activity and detection latency (arrival -> seen by the supervisor)
+INBOX_STATS = {}
+_inbox_stats_lock = threading.Lock()
+
+ANALYSIS_PROMPT = (
+    "Analyze these emails. For each one that is URGENT or requires immediate attention, "
+    "write a line 'URGENT <ID>: <short summary>'. If none are, return 'NO_ALERT'."
+)
+_URGENT_LINE_RE = re.compile(r'URGENT\s+(\S+?):')
+
+def init_db():
+    conn = sqlite3.connect(DB_FILE)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sync_state (
+            account TEXT PRIMARY KEY,
+            history_id TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS seen_messages (
+            account TEXT NOT NULL,
+            message_id TEXT NOT NULL,
+            seen_at REAL NOT NULL,
+            PRIMARY KEY (account, message_id)
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+class GmailSync:
+    """
+    Incremental new-mail feed for one Gmail account.
+
+    `fetch_new()` returns (messages, checkpoint); call `commit(checkpoint, ids)` once
+    the messages are handled, so a failed analysis is retried on the next check.
+    """
+
+    def __init__(self, service=None, account: str = 'me', label: str = 'INBOX'):
+        self._service = service
+        self.account = account
+        self.label = label
+        # State key; the plain account for its INBOX keeps older cursors valid
+        self.key = account if label == 'INBOX' else f"{account}:{label}"
+        self.api_calls = 0
+        self.bootstrapped = False
+        init_db()
+
+    @property
+    def service(self):
+        if self._service is None:
+            # Built per inbox: the client's HTTP transport isn't thread-safe,
+            # but the OAuth credentials behind it are shared
+            from moth.tools.utils import get_gmail_service
+            self._service = get_gmail_service()
+        return self._service
+
+    def _execute(self, request) -> dict:
+        self.api_calls += 1
+        return request.execute()
+
+    def get_history_id(self):
+        conn = sqlite3.connect(DB_FILE)
+        row = conn.execute("SELECT history_id FROM sync_state WHERE account = ?", (self.key,)).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def _seen(self, message_ids: list) -> set:
+        if not message_ids:
+            return set()
+        conn = sqlite3.connect(DB_FILE)
+        rows = conn.execute(
+            f"SELECT message_id FROM seen_messages WHERE account = ? AND message_id IN ({','.join('?' for _ in message_ids)})",
+            [self.key, *message_ids]
+        ).fetchall()
+        conn.close()
+        return {row[0] for row in rows}
+
+    def _bootstrap(self):
+        """No usable cursor: start from the mailbox's current historyId and the latest few messages."""
+        print(f"DEBUG: Supervisor bootstrapping sync for {self.key}...")
+        self.bootstrapped = True
+        history_id = self._execute(self.service.users().getProfile(userId=self.account))['historyId']
+        query = BOOTSTRAP_QUERY if self.label == 'INBOX' else None
+        results = self._execute(self.service.users().messages().list(
+            userId=self.account, q=query, labelIds=[self.label], maxResults=BOOTSTRAP_LIMIT
+        ))
+        return [m['id'] for m in results.get('messages', [])], history_id
+
+    def _added_since(self, start_history_id: str):
+        """Message ids added since start_history_id (all pages), plus the newest historyId."""
+        ids = []
+        page_token = None
+        history_id = start_history_id
+        while True:
+            response = self._execute(self.service.users().history().list(
+                userId=self.account, startHistoryId=start_history_id, labelId=self.label,
+                historyTypes=['messageAdded'], pageToken=page_token
+            ))
+            for record in response.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    message = added['message']
+                    labels = set(message.get('labelIds', []))
+                    if self.label in labels and not labels & SKIP_LABELS:
+                        ids.append(message['id'])
+            history_id = response.get('historyId', history_id)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return ids, history_id
+
+    def _get_metadata(self, message_ids: list) -> list:
+        """Header metadata for the messages, from the local message cache or batched round trips."""
+        if not message_ids:
+            return []
+        fetched, round_trips = fetch_metadata(self.service, message_ids, user_id=self.account)
+        self.api_calls += round_trips
+        return [{
+            'id': m['id'],
+            'thread_id': m['thread_id'],
+            'labels': m['labels'],
+            'from': m['headers'].get('From', '(Unknown)'),
+            'subject': m['headers'].get('Subject', '(No Subject)'),
+            'date': m['headers'].get('Date'),
+            'snippet': m['snippet'],
+            'internal_date': m['internal_date'],
+        } for m in (fetched.get(message_id) for message_id in message_ids) if m is not None]
+
+    def fetch_new(self):
+        """Returns (new unseen messages as dicts, checkpoint historyId)."""
+        self.bootstrapped = False
+        start = self.get_history_id()
+        if start is None:
+            ids, history_id = self._bootstrap()
+        else:
+            try:
+                ids, history_id = self._added_since(start)
+            except HttpError as e:
+                # historyIds expire after about a week; start over
+                if e.resp.status != 404:
+                    raise
+                print(f"DEBUG: historyId {start} expired for {self.key}; re-bootstrapping.")
+                ids, history_id = self._bootstrap()
+
+        # The same message can show up in several history records
+        ids = list(dict.fromkeys(ids))
+        seen = self._seen(ids)
+        messages = self._get_metadata([message_id for message_id in ids if message_id not in seen])
+        return messages, history_id
+
+    def commit(self, history_id: str, message_ids: list):
+        """Advances the cursor and records the handled messages as seen."""
+        now = time.time()
+        conn = sqlite3.connect(DB_FILE)
+        conn.execute("""
+            INSERT INTO sync_state (account, history_id, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT(account) DO UPDATE SET history_id = excluded.history_id, updated_at = excluded.updated_at
+        """, (self.key, str(history_id), now))
+        conn.executemany(
+            "INSERT OR IGNORE INTO seen_messages (account, message_id, seen_at) VALUES (?, ?, ?)",
+            [(self.key, message_id, now) for message_id in message_ids]
+        )
+        conn.execute("DELETE FROM seen_messages WHERE seen_at < ?", (now - SEEN_RETENTION,))
+        conn.commit()
+        conn.close()
+
+def format_messages(messages: list) -> str:
+    """Same "ID | From | Subj" lines read_recent_emails produces, plus the snippet."""
+    lines = []
+    for m in messages:
+        sender = m['from']
+        if '<' in sender:
+            sender = sender.split('<')[0].strip().replace('"', '')
+        lines.append(f"ID: {m['id']} | From: {sender} | Subj: {m['subject']} | {m['snippet']}")
+    return "\n".join(lines)
+
+def check_inbox(sync: GmailSync, llm, notify, threshold: float = None) -> dict:
+    """
+    One supervisor cycle: fetch new mail, pre-filter it locally, ask the LLM about
+    the remaining candidates and any recall sample (skipped when there are none),
+    call notify(text) for an alert, then commit the cursor.
+    Returns {'new', 'candidates', 'sampled', 'llm_called', 'alerted', 'urgent_ids', 'latencies'};
+    latencies are arrival -> detection seconds of the new messages (not after a bootstrap).
+    """
+    from langchain_core.messages import SystemMessage, HumanMessage
+
+    messages, checkpoint = sync.fetch_new()
+    detected_at = time.time()
+    candidates, _ = select_candidates(messages, threshold) if messages else ([], [])
+    sample = select_recall_sample(messages, candidates) if messages else []
+    result = {'new': len(messages), 'candidates': len(candidates), 'sampled': len(sample),
+              'llm_called': False, 'alerted': False, 'urgent_ids': [],
+              'latencies': [] if sync.bootstrapped else
+                           [max(0.0, detected_at - m['internal_date'] / 1000) for m in messages if m['internal_date']]}
+
+    if candidates or sample:
+        # Samples are analysed like candidates; an urgent one is a real alert (and a filter miss)
+        response = llm.invoke([
+            SystemMessage(content=ANALYSIS_PROMPT),
+            HumanMessage(content=f"Here are the new emails:\n{format_messages(candidates + sample)}")
+        ])
+        result['llm_called'] = True
+        content = response.content.strip()
+
+        analysed_ids = {m['id'] for m in candidates + sample}
+        result['urgent_ids'] = [i for i in dict.fromkeys(_URGENT_LINE_RE.findall(content)) if i in analysed_ids]
+        if "NO_ALERT" not in content:
+            notify(f"🚨 **Moth Supervisor Alert** 🚨\n\n{content}")
+            result['alerted'] = True
+
+    if messages:
+        sample_ids = {m['id'] for m in sample}
+        missed = sum(i in sample_ids for i in result['urgent_ids'])
+        record_check(len(messages), len(candidates), len(result['urgent_ids']) - missed, len(sample), missed)
+
+    sync.commit(checkpoint, [m['id'] for m in messages])
+    return result
+
+def parse_inboxes(spec: str = None) -> list:
+    """"me:INBOX,me:Label_1,ops@example.com" -> [('me', 'INBOX'), ('me', 'Label_1'), ('ops@example.com', 'INBOX')]"""
+    inboxes = []
+    for entry in (spec or SUPERVISOR_INBOXES).split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        account, _, label = entry.partition(":")
+        inboxes.append((account or 'me', label or 'INBOX'))
+    return inboxes
+
+def ceiling_interval(now: datetime = None) -> int:
+    """Slowest allowed polling interval for the time of day."""
+    hour = (now or datetime.now()).hour
+    start, end = WORK_HOURS
+    return WORK_INTERVAL if start <= hour < end else NIGHT_INTERVAL
+
+def next_interval(previous: float, new_messages: int, now: datetime = None) -> float:
+    """Halves the interval when mail arrived, backs off 1.5x when it didn't."""
+    interval = previous / 2 if new_messages else previous * 1.5
+    return min(max(interval, MIN_INTERVAL), ceiling_interval(now))
+
+def _record_inbox(sync: GmailSync, result: dict, interval: float):
+    with _inbox_stats_lock:
+        stats = INBOX_STATS.setdefault(sync.key, {
+            'checks': 0, 'messages': 0, 'alerts': 0, 'api_calls': 0,
+            'latency_samples': 0, 'latency_total': 0.0, 'max_latency': 0.0,
+        })
+        stats['checks'] += 1
+        stats['messages'] += result.get('new', 0)
+        stats['alerts'] += result.get('alerted', False)
+        stats['api_calls'] = sync.api_calls
+        for latency in result.get('latencies', []):
+            stats['latency_samples'] += 1
+            stats['latency_total'] += latency
+            stats['max_latency'] = max(stats['max_latency'], latency)
+        stats['interval'] = interval
+        stats['last_check'] = time.time()
+
+def get_inbox_stats() -> dict:
+    """Per inbox: checks, messages, alerts, API calls, current interval, avg/max detection latency."""
+    with _inbox_stats_lock:
+        snapshot = {key: dict(stats) for key, stats in INBOX_STATS.items()}
+    for stats in snapshot.values():
+        samples = stats.pop('latency_samples')
+        total = stats.pop('latency_total')
+        stats['avg_latency'] = total / samples if samples else None
+    return snapshot
+
+def supervise(syncs: list, llm, notify, workers: int = SUPERVISOR_WORKERS, stop: threading.Event = None):
+    """
+    Single scheduling loop over several inboxes. Due inboxes are checked on a small
+    worker pool, each then rescheduled on its own adaptive interval.
+    Runs until `stop` is set.
+    """
+    stop = stop or threading.Event()
+    intervals = {sync.key: float(ceiling_interval()) for sync in syncs}
+    next_due = {sync.key: 0.0 for sync in syncs}
+    running = {}
+
+    def alert_for(sync):
+        if len(syncs) == 1:
+            return notify
+        return lambda text: notify(f"📬 {sync.key}\n{text}")
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="moth-supervisor") as pool:
+        while not stop.is_set():
+            now = time.time()
+            for sync in syncs:
+                if sync.key not in running.values() and next_due[sync.key] <= now:
+                    future = pool.submit(check_inbox, sync, llm, alert_for(sync))
+                    running[future] = sync.key
+
+            # Wake for the first finished check or the next due inbox
+            idle = [next_due[key] for key in next_due if key not in running.values()]
+            timeout = min(max(0.0, min(idle) - time.time()), 60) if idle else 60
+            if not running:
+                stop.wait(timeout)
+                continue
+            done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                key = running.pop(future)
+                sync = next(s for s in syncs if s.key == key)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"⚠️ Supervisor Error ({key}): {e}")
+                    result = {}
+                else:
+                    if result['alerted']:
+                        print(f"🚨 Supervisor: Urgent email in {key}! Notified user.")
+                    elif result['new'] and not result['llm_called']:
+                        print(f"✅ Supervisor: {result['new']} new email(s) in {key}, none past the urgency pre-filter.")
+                    elif result['new']:
+                        print(f"✅ Supervisor: {result['new']} new email(s) in {key}, none urgent.")
+
+                intervals[key] = next_interval(intervals[key], result.get('new', 0))
+                next_due[key] = time.time() + intervals[key]
+                _record_inbox(sync, result, intervals[key])
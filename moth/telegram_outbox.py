@@ -0,0 +1,245 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Telegram limits: 4096 chars per message, ~1 msg/s per chat, ~30 msg/s overall
+MAX_MESSAGE_LENGTH = 4096
+PER_CHAT_RATE = 1.0
+GLOBAL_RATE = 30.0
+
+# Messages queued for the same chat within this window go out as one message
+MERGE_WINDOW = int(os.getenv("MOTH_TELEGRAM_MERGE_MS", "300")) / 1000
+
+MAX_RETRIES = 3
+
+class TokenBucket:
+    """Classic token bucket; `delay()` says how long until one token is available."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        now = time.monotonic()
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def consume(self):
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+    def pause(self, seconds: float):
+        """Honours a server-side Retry-After."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+def _fence_state(text: str, state: str = None) -> str:
+    """Returns the opening line of a ``` code fence left open at the end of text (or None)."""
+    for line in text.splitlines():
+        if line.lstrip().startswith("```"):
+            state = None if state is not None else line.strip()
+    return state
+
+def _best_cut(text: str, budget: int) -> int:
+    """Cut position <= budget, preferring paragraph, then line, then word boundaries."""
+    for separator in ("\n\n", "\n", " "):
+        index = text.rfind(separator, 0, budget)
+        if index > budget // 2:
+            return index + len(separator)
+    return budget
+
+def split_message(text: str, limit: int = MAX_MESSAGE_LENGTH) -> list:
+    """
+    Splits long agent output into Telegram-sized chunks at paragraph/line/word
+    boundaries. A ``` code block cut in two is closed at the end of one chunk
+    and reopened (same language tag) at the start of the next.
+    """
+    chunks = []
+    reopen = None
+    while text:
+        prefix = reopen + "\n" if reopen else ""
+        if len(prefix) + len(text) <= limit:
+            chunks.append(prefix + text)
+            break
+
+        # Leave room to close a fence ("\n```") at the end of the chunk
+        cut = _best_cut(text, limit - len(prefix) - 4)
+        chunk = (prefix + text[:cut]).rstrip()
+        text = text[cut:].lstrip("\n")
+
+        reopen = _fence_state(chunk)
+        if reopen:
+            chunk += "\n```"
+        chunks.append(chunk)
+    return chunks
+
+class TelegramOutbox:
+    """
+    Single outbound sender for the bot, the supervisor and `send_telegram_alert`.
+
+    - one pooled HTTP session (no new TCP/TLS connection per message)
+    - token buckets per chat and globally; a 429's retry_after pauses that chat
+    - messages queued for the same chat within MERGE_WINDOW are merged
+    - long texts are split with `split_message`
+
+    `send()` returns a Future resolved with the last Telegram message dict (or an exception).
+    """
+
+    def __init__(self, token: str, merge_window: float = MERGE_WINDOW):
+        self.url = f"https://api.telegram.org/bot{token}/sendMessage"
+        self.merge_window = merge_window
+
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+        self._global_bucket = TokenBucket(GLOBAL_RATE, GLOBAL_RATE)
+        self._chat_buckets = {}
+        self._pending = {}   # chat_id -> [(queued_at, text, reply_to, parse_mode, future)] awaiting merge
+        self._ready = {}     # chat_id -> deque of chunks ready to send
+        self._cond = threading.Condition()
+
+        self._thread = threading.Thread(target=self._run, daemon=True, name="moth-telegram-outbox")
+        self._thread.start()
+
+    def send(self, chat_id, text: str, reply_to_message_id: int = None, parse_mode: str = None) -> Future:
+        future = Future()
+        if not text or not text.strip():
+            # Nothing to send (and split_message yields no chunk that would complete the future)
+            print(f"DEBUG: Outbox dropped an empty message for {chat_id}.")
+            future.set_result(None)
+            return future
+        with self._cond:
+            self._pending.setdefault(chat_id, []).append(
+                (time.monotonic(), text, reply_to_message_id, parse_mode, future)
+            )
+            self._cond.notify()
+        return future
+
+    def _promote(self, chat_id):
+        """Merges a chat's pending messages and splits them into ready chunks (lock held)."""
+        groups = []
+        for _, text, reply_to, parse_mode, future in self._pending.pop(chat_id):
+            # Merge consecutive messages with the same formatting; the merged
+            # message replies to the first message that asked for a reply
+            if groups and groups[-1]['parse_mode'] == parse_mode:
+                groups[-1]['texts'].append(text)
+                groups[-1]['futures'].append(future)
+                groups[-1]['reply_to'] = groups[-1]['reply_to'] or reply_to
+            else:
+                groups.append({'texts': [text], 'reply_to': reply_to, 'parse_mode': parse_mode, 'futures': [future]})
+
+        ready = self._ready.setdefault(chat_id, deque())
+        for group in groups:
+            chunks = split_message("\n\n".join(group['texts']))
+            for i, chunk in enumerate(chunks):
+                ready.append({
+                    'text': chunk,
+                    # Only the first chunk replies to the original message
+                    'reply_to': group['reply_to'] if i == 0 else None,
+                    'parse_mode': group['parse_mode'],
+                    'futures': group['futures'],
+                    'final': i == len(chunks) - 1,
+                    'attempts': 0,
+                })
+
+    def _next_chunk(self):
+        """Picks a chunk whose chat and global buckets allow sending now (lock held)."""
+        now = time.monotonic()
+        wait = None
+
+        for chat_id, items in list(self._pending.items()):
+            remaining = items[0][0] + self.merge_window - now
+            if remaining <= 0:
+                self._promote(chat_id)
+            else:
+                wait = remaining if wait is None else min(wait, remaining)
+
+        global_delay = self._global_bucket.delay()
+        for chat_id, chunks in self._ready.items():
+            if not chunks:
+                continue
+            bucket = self._chat_buckets.setdefault(chat_id, TokenBucket(PER_CHAT_RATE, 1))
+            delay = max(bucket.delay(), global_delay)
+            if delay <= 0:
+                bucket.consume()
+                self._global_bucket.consume()
+                return chat_id, chunks.popleft(), None
+            wait = delay if wait is None else min(wait, delay)
+
+        return None, None, wait
+
+    def _run(self):
+        while True:
+            with self._cond:
+                chat_id, chunk, wait = self._next_chunk()
+                if chunk is None:
+                    self._cond.wait(timeout=wait)
+                    continue
+            self._deliver(chat_id, chunk)
+
+    def _deliver(self, chat_id, chunk: dict):
+        payload = {"chat_id": chat_id, "text": chunk['text']}
+        if chunk['reply_to']:
+            payload["reply_to_message_id"] = chunk['reply_to']
+            payload["allow_sending_without_reply"] = True
+        if chunk['parse_mode']:
+            payload["parse_mode"] = chunk['parse_mode']
+
+        try:
+            response = self._session.post(self.url, json=payload, timeout=10)
+            data = response.json()
+        except Exception as e:
+            data = {'ok': False, 'description': f"Telegram Connection Error: {e}"}
+            response = None
+
+        if data.get('ok'):
+            if chunk['final']:
+                for future in chunk['futures']:
+                    if not future.done():
+                        future.set_result(data.get('result'))
+            return
+
+        chunk['attempts'] += 1
+        retry_after = data.get('parameters', {}).get('retry_after')
+        if (retry_after or response is None) and chunk['attempts'] < MAX_RETRIES:
+            # Rate limited (or network blip): pause this chat and put the chunk back in front
+            print(f"⏳ Telegram outbox: retrying chat {chat_id} in {retry_after or 1}s")
+            with self._cond:
+                self._chat_buckets[chat_id].pause(retry_after or 1)
+                self._ready.setdefault(chat_id, deque()).appendleft(chunk)
+                self._cond.notify()
+            return
+
+        error = RuntimeError(f"Failed to send Telegram: {data.get('description', 'unknown error')}")
+        print(f"⚠️ {error}")
+        for future in chunk['futures']:
+            if not future.done():
+                future.set_exception(error)
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+def get_outbox() -> TelegramOutbox:
+    """Process-wide outbox for TELEGRAM_BOT_TOKEN."""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            token = os.getenv("TELEGRAM_BOT_TOKEN")
+            if not token:
+                raise ValueError("TELEGRAM_BOT_TOKEN not found in .env")
+            _outbox = TelegramOutbox(token)
+        return _outbox
@@ -1,37 +1,148 @@
 import os
-import telebot
+import argparse
 from dotenv import load_dotenv
-from moth.agent import run_agent
+from moth.chat_dispatcher import ChatDispatcher
+from moth.telegram_outbox import get_outbox
 import threading
 import time
-from moth.tools.gmail_ops import read_recent_emails
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import SystemMessage, HumanMessage
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Bot
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+# Importing this module has no side effects: spawned worker processes (e.g. the PDF
+# extraction pool) re-import the __main__ module, so the bot, outbox, dispatcher and
+# the agent stack are only set up in main().
+bot = None
+outbox = None
+dispatcher = None
 
-if not TELEGRAM_BOT_TOKEN:
-    print("Error: TELEGRAM_BOT_TOKEN not found in .env")
-    exit(1)
+# Message timestamp -> agent work starting, to compare polling vs webhook delivery.
+# Telegram's message.date has 1s resolution, so read averages over many messages.
+LATENCY_STATS = {'mode': 'polling', 'samples': 0, 'total': 0.0, 'max': 0.0}
+_latency_lock = threading.Lock()
 
-bot = telebot.TeleBot(TELEGRAM_BOT_TOKEN)
+# Debounce: messages of one chat arriving within this window are merged into one
+# agent turn. A new message also cancels that chat's in-flight turn, which is then
+# restarted with all of the text, as long as the turn hasn't started a tool yet;
+# after that it finishes and the new text becomes a follow-up turn. 0 disables it.
+DEBOUNCE_MS = int(os.getenv("MOTH_TELEGRAM_DEBOUNCE_MS", "0"))
 
-print("Moth AI Telegram Bot is running...")
+_pending_texts = {}   # chat_id -> {'texts': [...], 'message': last message, 'timer': Timer}
+_in_flight = {}       # chat_id -> {'texts': [...], 'cancelled': bool, 'committed': bool}
+_debounce_lock = threading.Lock()
+
+def handle_stats(message):
+    """Replies with dispatcher queue depth and throughput, and the supervisor's pre-filter stats."""
+    from moth.supervisor import get_inbox_stats
+    from moth.urgency import get_filter_stats
+    from moth.tools.gmail_ops import get_cache_stats
+
+    stats = dispatcher.get_stats()
+    avg_latency = LATENCY_STATS['total'] / LATENCY_STATS['samples'] if LATENCY_STATS['samples'] else 0.0
+    urgency = get_filter_stats()
+    cache = get_cache_stats()
+    hit_rate = f"{cache['hit_rate']:.0%}" if cache['hit_rate'] is not None else "n/a"
+    precision = f"{urgency['precision']:.0%}" if urgency['precision'] is not None else "n/a"
+    miss_rate = f"{urgency['miss_rate']:.0%}" if urgency['miss_rate'] is not None else "n/a"
+    outbox.send(message.chat.id, (
+        f"📊 Queued: {stats['queued']} (lanes: {len(stats['lane_depths'])}, max lane depth: {stats['max_lane_depth']})\n"
+        f"Processed: {stats['processed']} ({stats['throughput_per_min']:.1f}/min), failed: {stats['failed']}, shed: {stats['shed']}\n"
+        f"Queue wait: avg {stats['avg_wait']:.1f}s, max {stats['max_wait']:.1f}s\n"
+        f"Message → agent start ({LATENCY_STATS['mode']}): avg {avg_latency:.1f}s, max {LATENCY_STATS['max']:.1f}s\n"
+        f"Supervisor: {urgency['messages']} emails scored, {urgency['candidates']} sent to LLM, "
+        f"{urgency['llm_calls_avoided']} LLM calls avoided, pre-filter precision {precision}, "
+        f"misses in recall sample {miss_rate} ({urgency['sampled_urgent']}/{urgency['sampled']})"
+        + "".join(
+            f"\n📬 {key}: every {inbox['interval']:.0f}s, {inbox['checks']} checks / {inbox['api_calls']} API calls, "
+            f"detection latency avg {inbox['avg_latency'] or 0:.0f}s, max {inbox['max_latency']:.0f}s"
+            for key, inbox in get_inbox_stats().items()
+        )
+        + f"\nGmail cache: {cache['entries']} messages ({cache['size'] / 1024:.0f} KiB), hit rate {hit_rate}, "
+        f"{cache['bytes_saved'] / 1024:.0f} KiB of API traffic saved"
+    ), reply_to_message_id=message.message_id)
 
-@bot.message_handler(func=lambda message: True)
 def handle_message(message):
     """
-    Listens for ANY text message, sends it to Moth AI agent, 
-    and replies with the response.
+    Listens for ANY text message and queues it on the chat's lane.
+    Sheds load politely when the global queue is full.
     """
+    print(f"Received from {message.chat.id}: {message.text}")
+
+    if DEBOUNCE_MS > 0:
+        debounce_message(message)
+    else:
+        submit_turn(message, [message.text])
+
+def submit_turn(message, texts: list):
+    """Queues one agent turn for the chat's lane (or sheds it)."""
+    if not dispatcher.submit(message.chat.id, process_message, message, texts):
+        print(f"🐢 Queue full, shedding message from {message.chat.id}")
+        outbox.send(message.chat.id, "🐢 I'm handling a lot of requests right now. Please try again in a minute.",
+                    reply_to_message_id=message.message_id)
+
+def debounce_message(message):
+    """Buffers a message and (re)arms the chat's debounce timer."""
+    chat_id = message.chat.id
+    with _debounce_lock:
+        pending = _pending_texts.get(chat_id)
+        if pending is None:
+            pending = _pending_texts[chat_id] = {'texts': [], 'message': message, 'timer': None}
+
+            # The user is still typing: drop the in-flight turn and redo it with everything,
+            # unless it already ran a tool (redoing it would repeat the side effects)
+            flight = _in_flight.get(chat_id)
+            if flight and not flight['cancelled']:
+                if flight['committed']:
+                    print(f"➡️ In-flight turn for {chat_id} already ran a tool; queueing new input as a follow-up")
+                else:
+                    flight['cancelled'] = True
+                    pending['texts'].extend(flight['texts'])
+                    print(f"✂️ Cancelling in-flight turn for {chat_id}; restarting with new input")
+
+        pending['texts'].append(message.text)
+        pending['message'] = message
+        if pending['timer']:
+            pending['timer'].cancel()
+        pending['timer'] = threading.Timer(DEBOUNCE_MS / 1000, flush_debounced, args=[chat_id])
+        pending['timer'].daemon = True
+        pending['timer'].start()
+
+def flush_debounced(chat_id):
+    with _debounce_lock:
+        pending = _pending_texts.pop(chat_id, None)
+    if pending:
+        submit_turn(pending['message'], pending['texts'])
+
+class AgentTurnFailed(Exception):
+    """The agent reported a failed turn (the user already got its error reply)."""
+
+def process_message(message, texts: list):
+    """
+    Sends the (possibly coalesced) text to Moth AI agent and replies with the response.
+    Runs on the dispatcher's worker pool.
+    """
+    from moth.agent import run_agent, CancelTurnCallback, TurnCancelled
+
     user_id = message.chat.id
-    user_input = message.text
-    
-    print(f"Received from {user_id}: {user_input}")
+    user_input = "\n".join(texts)
+
+    latency = max(0.0, time.time() - message.date)
+    with _latency_lock:
+        LATENCY_STATS['samples'] += 1
+        LATENCY_STATS['total'] += latency
+        LATENCY_STATS['max'] = max(LATENCY_STATS['max'], latency)
+
+    turn = {'texts': texts, 'cancelled': False, 'committed': False}
+    with _debounce_lock:
+        _in_flight[user_id] = turn
+
+    def commit_turn():
+        # Before the first tool: from here on, the turn can't be cancelled
+        with _debounce_lock:
+            if turn['cancelled']:
+                return False
+            turn['committed'] = True
+            return True
 
     try:
         # Show "Typing..." status
@@ -39,21 +150,43 @@ def handle_message(message):
         
         # Run Agent
         # Pass empty list for chat_history as it's now handled by the persistent DB
-        response = run_agent(user_input, chat_history=[])
+        response = run_agent(user_input, chat_history=[], return_details=True,
+                             callbacks=[CancelTurnCallback(lambda: turn['cancelled'], commit_turn)])
         
-        # Send Reply
-        bot.reply_to(message, response)
+        # Send Reply (unless a newer message superseded this turn)
+        if turn['cancelled']:
+            print(f"✂️ Discarding cancelled turn for {user_id}")
+        else:
+            outbox.send(user_id, response['output'], reply_to_message_id=message.message_id)
+
+        # run_agent already replied with the error text; count the turn as failed
+        if response.get('error'):
+            raise AgentTurnFailed(response['error'])
         
+    except TurnCancelled:
+        print(f"✂️ Discarding cancelled turn for {user_id}")
+    except AgentTurnFailed:
+        raise
     except Exception as e:
         error_msg = f"⚠️ Error processing message: {str(e)}"
         print(error_msg)
-        bot.send_message(user_id, error_msg)
+        outbox.send(user_id, error_msg)
+        # Re-raised so the dispatcher counts the failure
+        raise
+    finally:
+        with _debounce_lock:
+            if _in_flight.get(user_id) is turn:
+                del _in_flight[user_id]
 
 def run_supervisor():
     """
-    Background thread that checks for urgent emails every 15 minutes.
+    Background thread that checks the configured inboxes for urgent emails.
+    Only mail that arrived since the last check is analysed, and each inbox polls
+    on an adaptive interval (see moth.supervisor).
     """
-    print("👀 Supervisor started: Monitoring emails every 15 minutes...")
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from moth.supervisor import GmailSync, parse_inboxes, supervise
+
     chat_id = os.getenv("TELEGRAM_CHAT_ID")
     if not chat_id:
         print("⚠️ Supervisor Warning: TELEGRAM_CHAT_ID not found. Notifications disabled.")
@@ -68,34 +201,43 @@ def run_supervisor():
     # Use the same model logic as agent, maybe simpler
     llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", google_api_key=api_key)
 
-    while True:
-        try:
-            print("👀 Supervisor: Checking for urgent emails...")
-            # 1. Get recent emails (invoke tool)
-            email_summary = read_recent_emails.invoke({"limit": 3})
-            
-            # 2. Analyze
-            system_prompt = "Analyze these emails. If any are URGENT or require immediate attention, return a short summary. Otherwise, return 'NO_ALERT'."
-            messages = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=f"Here are the recent emails:\n{email_summary}")
-            ]
-            response = llm.invoke(messages)
-            content = response.content.strip()
-            
-            if "NO_ALERT" not in content:
-                print("🚨 Supervisor: Urgent email detected! Notifying user.")
-                bot.send_message(chat_id, f"🚨 **Moth Supervisor Alert** 🚨\n\n{content}")
-            else:
-                print("✅ Supervisor: No urgent emails found.")
-                
-        except Exception as e:
-            print(f"⚠️ Supervisor Error: {e}")
-            
-        # Sleep 15 mins (900 seconds)
-        time.sleep(900)
+    syncs = [GmailSync(account=account, label=label) for account, label in parse_inboxes()]
+    print(f"👀 Supervisor started: Monitoring {', '.join(sync.key for sync in syncs)}...")
+
+    supervise(syncs, llm, notify=lambda text: outbox.send(chat_id, text))
+
+def main():
+    global bot, outbox, dispatcher
+    import telebot
+    from moth.telegram_webhook import run_webhook
+
+    parser = argparse.ArgumentParser(description="Moth AI Telegram Bot")
+    parser.add_argument("--webhook", action="store_true",
+                        help="Receive updates via webhook (TELEGRAM_WEBHOOK_URL) instead of long polling")
+    args = parser.parse_args()
+
+    # Initialize Bot
+    token = os.getenv("TELEGRAM_BOT_TOKEN")
+    if not token:
+        print("Error: TELEGRAM_BOT_TOKEN not found in .env")
+        exit(1)
+
+    # Handlers only enqueue work, so run them on the polling thread (keeps arrival order)
+    bot = telebot.TeleBot(token, threaded=False)
+    bot.register_message_handler(handle_stats, commands=['stats'])
+    bot.register_message_handler(handle_message, func=lambda message: True)
+
+    # All outgoing messages go through one rate-limited, pooled sender
+    outbox = get_outbox()
+
+    # Agent turns run on per-chat serial lanes over a bounded worker pool
+    dispatcher = ChatDispatcher(
+        max_workers=int(os.getenv("MOTH_TELEGRAM_WORKERS", "4")),
+        max_queue=int(os.getenv("MOTH_TELEGRAM_MAX_QUEUE", "50"))
+    )
+
+    print("Moth AI Telegram Bot is running...")
 
-if __name__ == "__main__":
     # Start Supervisor Thread
     if os.getenv("TELEGRAM_CHAT_ID"):
         supervisor_thread = threading.Thread(target=run_supervisor, daemon=True)
@@ -104,6 +246,22 @@ if __name__ == "__main__":
         print("Skipping Supervisor: No TELEGRAM_CHAT_ID env var found.")
 
     try:
-        bot.infinity_polling()
+        if args.webhook:
+            webhook_url = os.getenv("TELEGRAM_WEBHOOK_URL")
+            webhook_secret = os.getenv("TELEGRAM_WEBHOOK_SECRET")
+            if not webhook_url or not webhook_secret:
+                print("Error: --webhook needs TELEGRAM_WEBHOOK_URL and TELEGRAM_WEBHOOK_SECRET in .env")
+                exit(1)
+            LATENCY_STATS['mode'] = 'webhook'
+            run_webhook(
+                bot, webhook_url, webhook_secret,
+                listen=os.getenv("MOTH_WEBHOOK_LISTEN", "127.0.0.1"),
+                port=int(os.getenv("MOTH_WEBHOOK_PORT", "8443"))
+            )
+        else:
+            bot.infinity_polling()
     except KeyboardInterrupt:
         print("\nStopping Telegram Bot...")
+
+if __name__ == "__main__":
+    main()
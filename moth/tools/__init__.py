@@ -1,11 +1,11 @@
-from moth.tools.gmail_ops import create_gmail_draft, read_recent_emails, read_email_content, save_email_attachment, send_gmail_message
+from moth.tools.gmail_ops import create_gmail_draft, read_recent_emails, read_email_content, save_email_attachment, send_gmail_message, send_bulk_emails
 from moth.tools.doc_ops import (
-    create_document, read_document, append_to_document, overwrite_document, 
+    create_document, read_document, append_to_document, overwrite_document, batch_edit_document,
     delete_document, restore_document, create_folder, move_file,
     search_drive, list_recent_files, read_pdf_from_drive, upload_file_to_drive, 
     empty_trash, list_shared_files
 )
-from moth.tools.drive import list_drive_files, delete_file_by_name
+from moth.tools.drive import list_drive_files, delete_file_by_name, bulk_trash_files, bulk_restore_files, bulk_move_files
 from moth.tools.calendar import list_upcoming_events, create_calendar_event, delete_event, update_event
 from moth.tools.youtube import search_videos
 from moth.tools.search import google_search
@@ -22,10 +22,12 @@ def get_all_tools():
         read_email_content,
         save_email_attachment,
         send_gmail_message,
+        send_bulk_emails,
         create_document,
         read_document,
         append_to_document,
         overwrite_document,
+        batch_edit_document,
         restore_document,
         create_folder,
         move_file,
@@ -37,6 +39,9 @@ def get_all_tools():
         list_shared_files,
         list_drive_files,
         delete_file_by_name,
+        bulk_trash_files,
+        bulk_restore_files,
+        bulk_move_files,
         list_upcoming_events,
         create_calendar_event,
         delete_event,
@@ -1,59 +1,182 @@
-import io
-import pypdf
-from googleapiclient.http import MediaFileUpload
+import json
+import threading
+from collections import OrderedDict
+from googleapiclient.errors import HttpError
 from langchain.tools import tool
 from moth.tools.utils import get_docs_service, get_drive_service
+from moth.tools import drive_cache, drive_mirror, drive_upload, pdf_text
+from moth.tools.drive_cache import DOC_MIME, FOLDER_MIME
 
 def get_doc_id(doc_name: str):
-    """Helper: Finds a Google Doc ID by name."""
-    drive_service = get_drive_service()
-    query = f"name = '{doc_name}' and mimeType = 'application/vnd.google-apps.document' and trashed = false"
-    
-    results = drive_service.files().list(
-        q=query, spaces='drive', fields='files(id, name)'
-    ).execute()
-    files = results.get('files', [])
-    
-    if not files:
-        return None
-    return files[0]['id']
+    """Helper: Finds a Google Doc ID by name (or "Folder/Sub/Doc" path), via the resolution cache."""
+    entry = drive_cache.resolve_path(doc_name, DOC_MIME)
+    return entry['id'] if entry else None
 
 def get_folder_id(folder_name: str):
-    """Helper: Finds a Google Drive Folder ID by name."""
-    drive_service = get_drive_service()
-    query = f"name = '{folder_name}' and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
-    
-    results = drive_service.files().list(
-        q=query, spaces='drive', fields='files(id, name)'
-    ).execute()
-    files = results.get('files', [])
-    
-    if not files:
+    """Helper: Finds a Google Drive Folder ID by name (or "Folder/Sub" path), via the resolution cache."""
+    entry = drive_cache.resolve_path(folder_name, FOLDER_MIME)
+    return entry['id'] if entry else None
+
+# Parsed docs keyed by docId, valid for one revisionId. A read of a cached doc first
+# asks the Docs API for just the revisionId and only refetches the body when it
+# changed; an uncached doc is fetched in one call.
+MAX_CACHED_DOCS = 32
+MAX_READ_CHARS = 20000
+
+_doc_cache = OrderedDict()  # doc_id -> (revision_id, paragraphs, body_end_index)
+_doc_cache_lock = threading.Lock()
+
+def parse_paragraphs(doc: dict) -> list:
+    """[{'text', 'style'}] for the body's paragraphs, style being e.g. NORMAL_TEXT or HEADING_2."""
+    paragraphs = []
+    for elem in doc.get('body', {}).get('content', []):
+        if 'paragraph' in elem:
+            paragraph = elem['paragraph']
+            text = "".join(e['textRun'].get('content', '') for e in paragraph.get('elements', []) if 'textRun' in e)
+            style = paragraph.get('paragraphStyle', {}).get('namedStyleType', 'NORMAL_TEXT')
+            paragraphs.append({'text': text, 'style': style})
+    return paragraphs
+
+def get_doc_paragraphs(doc_id: str) -> list:
+    """Parsed paragraphs of a doc, served from cache while its revisionId is unchanged."""
+    docs_service = get_docs_service()
+    with _doc_cache_lock:
+        cached = _doc_cache.get(doc_id)
+
+    revision_id = None
+    if cached:
+        revision_id = docs_service.documents().get(documentId=doc_id, fields='revisionId').execute().get('revisionId')
+        if revision_id and cached[0] == revision_id:
+            with _doc_cache_lock:
+                if doc_id in _doc_cache:
+                    _doc_cache.move_to_end(doc_id)
+            print(f"DEBUG: Document {doc_id} unchanged (revision {revision_id}); using cached text.")
+            return cached[1]
+
+    doc = docs_service.documents().get(documentId=doc_id).execute()
+    paragraphs = parse_paragraphs(doc)
+    content = doc.get('body', {}).get('content', [])
+    end_index = content[-1].get('endIndex') if content else None
+    with _doc_cache_lock:
+        _doc_cache[doc_id] = (doc.get('revisionId', revision_id), paragraphs, end_index)
+        _doc_cache.move_to_end(doc_id)
+        while len(_doc_cache) > MAX_CACHED_DOCS:
+            _doc_cache.popitem(last=False)
+    return paragraphs
+
+def _heading_level(style: str):
+    """TITLE -> 0, HEADING_n -> n, anything else -> None."""
+    if style == 'TITLE':
+        return 0
+    if style.startswith('HEADING_'):
+        return int(style.split('_')[1])
+    return None
+
+def select_section(paragraphs: list, heading: str):
+    """Paragraphs from the heading matching `heading` up to the next heading of the same or higher level."""
+    wanted = heading.strip().lower()
+    for i, p in enumerate(paragraphs):
+        level = _heading_level(p['style'])
+        if level is not None and wanted in p['text'].strip().lower():
+            end = i + 1
+            while end < len(paragraphs):
+                other = _heading_level(paragraphs[end]['style'])
+                if other is not None and other <= level:
+                    break
+                end += 1
+            return paragraphs[i:end]
+    return None
+
+def forget_doc(doc_id: str):
+    """Drops a doc from the read cache after we edited it (its cached revision is now stale)."""
+    with _doc_cache_lock:
+        _doc_cache.pop(doc_id, None)
+
+def text_length(text: str) -> int:
+    """Length in Docs index units (UTF-16 code units)."""
+    return len(text.encode('utf-16-le')) // 2
+
+def _fetch_body_end(docs_service, doc_id: str):
+    """(body endIndex, revisionId) via a fields-limited get (no text content)."""
+    doc = docs_service.documents().get(documentId=doc_id, fields='revisionId,body.content(endIndex)').execute()
+    return doc['body']['content'][-1]['endIndex'], doc.get('revisionId')
+
+def update_at_body_end(docs_service, doc_id: str, build_requests):
+    """
+    Runs a batchUpdate whose requests depend on the body's endIndex.
+    build_requests(end_index) -> list of requests (or an error string).
+
+    If read_document cached the doc, its endIndex is used without a read and
+    the update is pinned to the cached revision (writeControl), so a stale
+    cache makes the API reject it; only then is the endIndex fetched.
+    """
+    with _doc_cache_lock:
+        cached = _doc_cache.get(doc_id)
+    if cached and cached[0] and cached[2]:
+        requests = build_requests(cached[2])
+        if not isinstance(requests, list):
+            return requests
+        if not requests:
+            return None
+        try:
+            result = docs_service.documents().batchUpdate(
+                documentId=doc_id, body={'requests': requests, 'writeControl': {'requiredRevisionId': cached[0]}}
+            ).execute()
+            forget_doc(doc_id)
+            return result
+        except HttpError as e:
+            if e.resp.status != 400:
+                raise
+            print(f"DEBUG: Cached revision of {doc_id} is stale; fetching endIndex.")
+            forget_doc(doc_id)
+
+    end_index, revision_id = _fetch_body_end(docs_service, doc_id)
+    requests = build_requests(end_index)
+    if not isinstance(requests, list):
+        return requests
+    if not requests:
         return None
-    return files[0]['id']
+    body = {'requests': requests}
+    if revision_id:
+        body['writeControl'] = {'requiredRevisionId': revision_id}
+    result = docs_service.documents().batchUpdate(documentId=doc_id, body=body).execute()
+    forget_doc(doc_id)
+    return result
 
 @tool
-def read_document(doc_name: str) -> str:
-    """Reads a Google Doc by name and returns its plain text content."""
+def read_document(doc_name: str, section: str = None, start_paragraph: int = None, end_paragraph: int = None,
+                  start_char: int = None, end_char: int = None) -> str:
+    """
+    Reads a Google Doc by name and returns its plain text content.
+    Long docs can be read in parts:
+    - section: text under the heading containing this text (until the next heading of the same level)
+    - start_paragraph / end_paragraph: paragraph range (0-based, end exclusive)
+    - start_char / end_char: character range of the (selected) text
+    Without a range, at most 20000 characters are returned, with a hint how to continue.
+    """
     doc_id = get_doc_id(doc_name)
     if not doc_id:
         return f"Error: Document '{doc_name}' not found."
     
     try:
-        docs_service = get_docs_service()
-        doc = docs_service.documents().get(documentId=doc_id).execute()
-        
-        # Parse content
-        full_text = []
-        content = doc.get('body').get('content')
-        for elem in content:
-            if 'paragraph' in elem:
-                elements = elem.get('paragraph').get('elements')
-                for e in elements:
-                    if 'textRun' in e:
-                        full_text.append(e.get('textRun').get('content'))
-        
-        return "".join(full_text)
+        paragraphs = get_doc_paragraphs(doc_id)
+
+        if section:
+            paragraphs = select_section(paragraphs, section)
+            if paragraphs is None:
+                return f"Error: No heading matching '{section}' in '{doc_name}'."
+        if start_paragraph is not None or end_paragraph is not None:
+            paragraphs = paragraphs[start_paragraph:end_paragraph]
+
+        text = "".join(p['text'] for p in paragraphs)
+        if start_char is not None or end_char is not None:
+            return text[start_char:end_char]
+
+        if len(text) > MAX_READ_CHARS:
+            return (text[:MAX_READ_CHARS] +
+                    f"\n\n[Showing characters 0-{MAX_READ_CHARS} of {len(text)}. "
+                    f"Call read_document again with start_char={MAX_READ_CHARS} to continue.]")
+        return text
     except Exception as e:
         return f"Error reading document: {e}"
 
@@ -67,19 +190,16 @@ def append_to_document(doc_name: str, new_text: str) -> str:
     try:
         docs_service = get_docs_service()
         
-        # Get current document end index
-        doc = docs_service.documents().get(documentId=doc_id).execute()
-        content = doc.get('body').get('content')
-        end_index = content[-1].get('endIndex') - 1
-        
+        # Insert at the end of the body segment (no read needed for the end index)
         requests = [{
             'insertText': {
-                'location': {'index': end_index}, 
+                'endOfSegmentLocation': {}, 
                 'text': "\n" + new_text
             }
         }]
         
         docs_service.documents().batchUpdate(documentId=doc_id, body={'requests': requests}).execute()
+        forget_doc(doc_id)
         return f"Successfully appended text to '{doc_name}'."
     except Exception as e:
         return f"Error appending to document: {e}"
@@ -91,28 +211,21 @@ def create_document(doc_name: str, initial_text: str = "", folder_name: str = No
         docs_service = get_docs_service()
         drive_service = get_drive_service()
         
-        # Create doc (always in root first)
-        doc = docs_service.documents().create(body={'title': doc_name}).execute()
-        doc_id = doc.get('documentId')
-        
-        # Handle folder (Move logic)
+        # Handle folder: create the doc directly inside it (no create-then-move)
+        file_metadata = {'name': doc_name, 'mimeType': DOC_MIME}
         folder_msg = ""
         if folder_name:
             folder_id = get_folder_id(folder_name)
             if folder_id:
-                # Move logic: Add new parent, remove existing parents (usually root)
-                file = drive_service.files().get(fileId=doc_id, fields='parents').execute()
-                previous_parents = ",".join(file.get('parents', []))
-                
-                drive_service.files().update(
-                    fileId=doc_id,
-                    addParents=folder_id,
-                    removeParents=previous_parents,
-                    fields='id, parents'
-                ).execute()
+                file_metadata['parents'] = [folder_id]
                 folder_msg = f" in folder '{folder_name}'"
             else:
                 folder_msg = f" (Warning: Folder '{folder_name}' not found, created in root)"
+
+        doc = drive_service.files().create(body=file_metadata, fields='id, name, parents').execute()
+        doc_id = doc.get('id')
+        drive_cache.remember(doc, DOC_MIME)
+        drive_mirror.mark_stale()
         
         # Insert initial text if provided
         if initial_text:
@@ -138,42 +251,156 @@ def overwrite_document(doc_name: str, new_content: str) -> str:
     try:
         docs_service = get_docs_service()
         
-        # Get current document metadata to find bounds
-        doc = docs_service.documents().get(documentId=doc_id).execute()
-        content = doc.get('body').get('content')
-        current_end_index = content[-1].get('endIndex')
-        
-        requests = []
-        
-        # Step 1: Delete existing content if not empty
-        # The document must contain at least one character (the final newline)
-        # So if endIndex is 2 (start index 1 + newline), it's effectively empty for our purpose
-        if current_end_index > 2:
-            requests.append({
-                'deleteContentRange': {
-                    'range': {
-                        'startIndex': 1,
-                        'endIndex': current_end_index - 1
-                    }
-                }
-            })
+        def build_requests(current_end_index):
+            requests = []
             
-        # Step 2: Insert new content at the start
-        if new_content:
-            requests.append({
-                'insertText': {
-                    'location': {'index': 1},
-                    'text': new_content
-                }
-            })
+            # Step 1: Delete existing content if not empty
+            # The document must contain at least one character (the final newline)
+            # So if endIndex is 2 (start index 1 + newline), it's effectively empty for our purpose
+            if current_end_index > 2:
+                requests.append({
+                    'deleteContentRange': {
+                        'range': {
+                            'startIndex': 1,
+                            'endIndex': current_end_index - 1
+                        }
+                    }
+                })
+                
+            # Step 2: Insert new content at the start
+            if new_content:
+                requests.append({
+                    'insertText': {
+                        'location': {'index': 1},
+                        'text': new_content
+                    }
+                })
+            return requests
         
-        if requests:
-            docs_service.documents().batchUpdate(documentId=doc_id, body={'requests': requests}).execute()
+        # Uses read_document's cached endIndex when available, otherwise a fields-limited get
+        update_at_body_end(docs_service, doc_id, build_requests)
             
         return f"Success: Overwrote content of '{doc_name}'."
     except Exception as e:
         return f"Error overwriting document: {e}"
 
+def build_edit_requests(operations: list, end_index=None):
+    """
+    Translates batch_edit_document operations into Docs API requests.
+    `end_index` is the body's endIndex before the edits; it is only needed for
+    headings appended at the end, and is tracked through the operations.
+    Returns the request list, or an error string.
+    """
+    requests = []
+    after_heading = False
+    for n, op in enumerate(operations, 1):
+        kind = str(op.get('op', '')).lower()
+        if kind == 'append':
+            text = "\n" + op.get('text', '')
+            requests.append({'insertText': {'endOfSegmentLocation': {}, 'text': text}})
+            if end_index is not None:
+                if after_heading:
+                    # The new paragraph would inherit the heading style
+                    start = end_index
+                    requests.append({'updateParagraphStyle': {
+                        'range': {'startIndex': start, 'endIndex': start + text_length(text) - 1},
+                        'paragraphStyle': {'namedStyleType': 'NORMAL_TEXT'},
+                        'fields': 'namedStyleType'
+                    }})
+                end_index += text_length(text)
+            after_heading = False
+        elif kind == 'replace':
+            if not op.get('find'):
+                return f"Error: Operation {n} (replace) needs 'find'."
+            requests.append({'replaceAllText': {
+                'containsText': {'text': op['find'], 'matchCase': bool(op.get('match_case', False))},
+                'replaceText': op.get('replace', '')
+            }})
+            end_index = None  # number of matches unknown
+            after_heading = False
+        elif kind == 'heading':
+            text = op.get('text', '')
+            level = int(op.get('level', 1))
+            style = 'TITLE' if level == 0 else f"HEADING_{min(max(level, 1), 6)}"
+            if op.get('index') is not None:
+                start = int(op['index'])
+                requests.append({'insertText': {'location': {'index': start}, 'text': text + "\n"}})
+                if end_index is not None:
+                    end_index += text_length(text) + 1
+                after_heading = False
+            else:
+                if end_index is None:
+                    return (f"Error: Operation {n} (heading at end) cannot follow a replace; "
+                            "put it before the replace or give it an 'index'.")
+                start = end_index
+                requests.append({'insertText': {'endOfSegmentLocation': {}, 'text': "\n" + text}})
+                end_index += text_length(text) + 1
+                after_heading = True
+            requests.append({'updateParagraphStyle': {
+                'range': {'startIndex': start, 'endIndex': start + text_length(text)},
+                'paragraphStyle': {'namedStyleType': style},
+                'fields': 'namedStyleType'
+            }})
+        elif kind == 'delete':
+            try:
+                start, end = int(op['start']), int(op['end'])
+            except (KeyError, TypeError, ValueError):
+                return f"Error: Operation {n} (delete) needs integer 'start' and 'end'."
+            requests.append({'deleteContentRange': {'range': {'startIndex': start, 'endIndex': end}}})
+            if end_index is not None:
+                end_index -= end - start
+            after_heading = False
+        else:
+            return f"Error: Operation {n} has unknown op '{op.get('op')}' (use append, replace, heading or delete)."
+    return requests
+
+@tool
+def batch_edit_document(doc_name: str, operations: str) -> str:
+    """
+    Applies several edits to one Google Doc in a single update (all or nothing).
+    operations is a JSON array of objects, applied in order:
+    - {"op": "append", "text": "..."}                      new paragraph at the end
+    - {"op": "replace", "find": "...", "replace": "...", "match_case": false}
+    - {"op": "heading", "text": "...", "level": 1}         heading at the end, or at "index"
+    - {"op": "delete", "start": 10, "end": 42}             character index range
+    """
+    doc_id = get_doc_id(doc_name)
+    if not doc_id:
+        return f"Error: Document '{doc_name}' not found."
+    try:
+        operations = json.loads(operations)
+    except json.JSONDecodeError as e:
+        return f"Error: operations is not valid JSON: {e}"
+    if not isinstance(operations, list) or not operations or not all(isinstance(op, dict) for op in operations):
+        return "Error: operations must be a non-empty JSON array of objects."
+
+    try:
+        # Validate before any API call (the placeholder end index only affects ranges)
+        checked = build_edit_requests(operations, 1)
+        if not isinstance(checked, list):
+            return checked
+
+        docs_service = get_docs_service()
+        needs_end = any(str(op.get('op', '')).lower() == 'heading' and op.get('index') is None for op in operations)
+        if needs_end:
+            result = update_at_body_end(docs_service, doc_id, lambda end: build_edit_requests(operations, end))
+        else:
+            requests = build_edit_requests(operations)
+            if not isinstance(requests, list):
+                return requests
+            result = docs_service.documents().batchUpdate(documentId=doc_id, body={'requests': requests}).execute()
+            forget_doc(doc_id)
+        if isinstance(result, str):
+            return result
+
+        replaced = sum(r.get('replaceAllText', {}).get('occurrencesChanged', 0) for r in (result or {}).get('replies', []))
+        summary = f"Success: Applied {len(operations)} edits to '{doc_name}' in one update."
+        if any(str(op.get('op', '')).lower() == 'replace' for op in operations):
+            summary += f" Replaced {replaced} occurrences."
+        return summary
+    except Exception as e:
+        return f"Error editing document: {e}"
+
 @tool
 def delete_document(doc_name: str) -> str:
     """Deletes a Google Doc by name."""
@@ -185,6 +412,8 @@ def delete_document(doc_name: str) -> str:
         drive_service = get_drive_service()
         # Soft delete (move to trash) so it can be restored
         drive_service.files().update(fileId=doc_id, body={'trashed': True}).execute()
+        drive_cache.invalidate(file_id=doc_id)
+        drive_mirror.mark_stale()
         return "Success: Deleted document (moved to trash)."
     except Exception as e:
         return f"Error deleting document: {e}"
@@ -217,6 +446,8 @@ def restore_document(doc_name: str) -> str:
     try:
         # Untrash
         drive_service.files().update(fileId=doc_id, body={'trashed': False}).execute()
+        drive_cache.invalidate(name=doc_name)
+        drive_mirror.mark_stale()
         
         # Verify
         file_metadata = drive_service.files().get(fileId=doc_id, fields='trashed').execute()
@@ -230,18 +461,26 @@ def restore_document(doc_name: str) -> str:
 
 @tool
 def create_folder(folder_name: str) -> str:
-    """Creates a new folder in Google Drive."""
+    """Creates a new folder in Google Drive. A path like "Projects/2025" creates it inside an existing parent folder."""
     folder_id = get_folder_id(folder_name)
     if folder_id:
         return f"Folder '{folder_name}' already exists (ID: {folder_id})."
         
     try:
         drive_service = get_drive_service()
+        parent_path, _, name = folder_name.strip('/').rpartition('/')
         file_metadata = {
-            'name': folder_name,
-            'mimeType': 'application/vnd.google-apps.folder'
+            'name': name,
+            'mimeType': FOLDER_MIME
         }
-        folder = drive_service.files().create(body=file_metadata, fields='id').execute()
+        if parent_path:
+            parent_id = get_folder_id(parent_path)
+            if not parent_id:
+                return f"Error: Parent folder '{parent_path}' not found."
+            file_metadata['parents'] = [parent_id]
+        folder = drive_service.files().create(body=file_metadata, fields='id, name, parents').execute()
+        drive_cache.remember(folder, FOLDER_MIME)
+        drive_mirror.mark_stale()
         return f"Success: Created folder '{folder_name}' (ID: {folder.get('id')})."
     except Exception as e:
         return f"Error creating folder: {e}"
@@ -252,8 +491,8 @@ def move_file(file_name: str, folder_name: str) -> str:
     # Note: We use get_doc_id assumes it's a doc we are moving, consistent with other ops
     # If we wanted to move ANY file, we'd need a generic get_file_id. 
     # For now, following user spec which references get_doc_id.
-    doc_id = get_doc_id(file_name) 
-    if not doc_id:
+    doc = drive_cache.resolve_path(file_name, DOC_MIME)
+    if not doc:
         return f"Error: File '{file_name}' not found."
         
     folder_id = get_folder_id(folder_name)
@@ -262,49 +501,70 @@ def move_file(file_name: str, folder_name: str) -> str:
         
     try:
         drive_service = get_drive_service()
-        # 1. Get current parents
-        file = drive_service.files().get(fileId=doc_id, fields='parents').execute()
-        previous_parents = ",".join(file.get('parents'))
+        # 1. Current parents come with the resolved entry (no extra files().get)
+        previous_parents = ",".join(doc['parents'])
         
         # 2. Update (Add new folder, remove old ones)
-        drive_service.files().update(
-            fileId=doc_id,
+        moved = drive_service.files().update(
+            fileId=doc['id'],
             addParents=folder_id,
             removeParents=previous_parents,
-            fields='id, parents'
+            fields='id, name, parents'
         ).execute()
+        drive_cache.invalidate(file_id=doc['id'])
+        drive_cache.remember(moved, DOC_MIME)
+        drive_mirror.mark_stale()
         return f"Success: Moved '{file_name}' into '{folder_name}'."
     except Exception as e:
         return f"Error moving file: {e}"
 
+FILE_TYPES = {'pdf': 'application/pdf', 'folder': FOLDER_MIME, 'doc': DOC_MIME}
+
 @tool
-def search_drive(query_text: str, search_type: str = 'name', file_type: str = None) -> str:
+def search_drive(query_text: str, search_type: str = 'name', file_type: str = None, page: int = 1) -> str:
     """Searches Google Drive for files.
     Args:
         query_text: Text to search for.
         search_type: 'name' (default) or 'content'.
-        file_type: Optional 'pdf' or 'folder' to filter by type.
+        file_type: Optional 'pdf', 'folder' or 'doc' to filter by type.
+        page: Result page (10 per page).
     """
+    limit = 10
+    mime_type = FILE_TYPES.get(file_type)
+
+    if search_type != 'content':
+        # Name search answers from the local metadata mirror (complete, paginated)
+        try:
+            files, total = drive_mirror.search(name=query_text, mime_type=mime_type, limit=limit, offset=(page - 1) * limit)
+        except Exception as e:
+            return f"Error searching drive: {e}"
+        if not files:
+            return "No files found matching query."
+        output = [f"Found {total} files:"]
+        for f in files:
+            output.append(f"- {f['name']} (ID: {f['id']}, Type: {f['mimeType']})")
+        output.append(drive_mirror.page_footer(total, page, limit))
+        return "\n".join(output)
+
+    # Full-text search needs Drive itself
     drive_service = get_drive_service()
     
     # Build query
-    q_parts = ["trashed = false"]
-    
-    if search_type == 'content':
-        q_parts.append(f"fullText contains '{query_text}'")
-    else:
-        q_parts.append(f"name contains '{query_text}'")
-        
-    if file_type == 'pdf':
-        q_parts.append("mimeType = 'application/pdf'")
-    elif file_type == 'folder':
-        q_parts.append("mimeType = 'application/vnd.google-apps.folder'")
-        
+    q_parts = ["trashed = false", f"fullText contains '{query_text}'"]
+    if mime_type:
+        q_parts.append(f"mimeType = '{mime_type}'")
     query = " and ".join(q_parts)
     
     try:
+        page_token = None
+        for _ in range(page - 1):
+            page_token = drive_service.files().list(
+                q=query, spaces='drive', fields='nextPageToken', pageSize=limit, pageToken=page_token
+            ).execute().get('nextPageToken')
+            if not page_token:
+                return "No more files matching query."
         results = drive_service.files().list(
-            q=query, spaces='drive', fields='files(id, name, mimeType)', pageSize=10
+            q=query, spaces='drive', fields='nextPageToken, files(id, name, mimeType)', pageSize=limit, pageToken=page_token
         ).execute()
         files = results.get('files', [])
         
@@ -314,22 +574,17 @@ def search_drive(query_text: str, search_type: str = 'name', file_type: str = No
         output = [f"Found {len(files)} files:"]
         for f in files:
             output.append(f"- {f['name']} (ID: {f['id']}, Type: {f['mimeType']})")
+        if results.get('nextPageToken'):
+            output.append(f"More results: use page={page + 1}.")
         return "\n".join(output)
     except Exception as e:
         return f"Error searching drive: {e}"
 
 @tool
-def list_recent_files(limit: int = 5) -> str:
-    """Lists the most recently modified files (excluding trash)."""
-    drive_service = get_drive_service()
+def list_recent_files(limit: int = 5, page: int = 1) -> str:
+    """Lists the most recently modified files (excluding trash). Use page for older files."""
     try:
-        results = drive_service.files().list(
-            q="trashed = false",
-            orderBy="modifiedTime desc",
-            pageSize=limit,
-            fields="files(id, name, mimeType, modifiedTime)"
-        ).execute()
-        files = results.get('files', [])
+        files, total = drive_mirror.search(limit=limit, offset=(page - 1) * limit)
         
         if not files:
             return "No recent files found."
@@ -337,60 +592,91 @@ def list_recent_files(limit: int = 5) -> str:
         output = [f"Recent {len(files)} files:"]
         for f in files:
             output.append(f"- {f['name']} (Type: {f['mimeType']})")
+        output.append(drive_mirror.page_footer(total, page, limit))
         return "\n".join(output)
     except Exception as e:
         return f"Error listing recent files: {e}"
 
 @tool
-def read_pdf_from_drive(pdf_name: str) -> str:
-    """Reads text content from a PDF file in Google Drive."""
+def read_pdf_from_drive(pdf_name: str, start_page: int = None, end_page: int = None) -> str:
+    """
+    Reads text content from a PDF file in Google Drive.
+    start_page / end_page (1-based, inclusive) read only that page range.
+    Without a range, long PDFs return the first ~20000 characters with a hint how to continue.
+    """
     drive_service = get_drive_service()
     
     # Find file ID
-    query = f"name = '{pdf_name}' and mimeType = 'application/pdf' and trashed = false"
     try:
-        results = drive_service.files().list(q=query, fields='files(id)').execute()
-        files = results.get('files', [])
-        if not files:
+        pdf = drive_cache.resolve_path(pdf_name, 'application/pdf')
+        if not pdf:
             return f"Error: PDF '{pdf_name}' not found."
             
-        file_id = files[0]['id']
-        
-        # Download bytes
-        request = drive_service.files().get_media(fileId=file_id)
-        file_content = io.BytesIO(request.execute())
-        
-        # Extract text
-        reader = pypdf.PdfReader(file_content)
+        # Streamed download + page extraction, cached by md5Checksum
+        page_count, pages = pdf_text.read_pdf_pages(pdf['id'], start_page, end_page, drive_service)
+        if not pages:
+            return f"Error: '{pdf_name}' has {page_count} pages; page range {start_page or 1}-{end_page or page_count} is empty."
+
+        if start_page is not None or end_page is not None:
+            header = f"[Pages {pages[0][0]}-{pages[-1][0]} of {page_count}]\n"
+            return header + "\n".join(text for _, text in pages)
+
         text = []
-        for page in reader.pages:
-            text.append(page.extract_text())
-            
+        length = 0
+        for number, page_text in pages:
+            if text and length + len(page_text) > MAX_READ_CHARS:
+                return ("\n".join(text) +
+                        f"\n\n[Showing pages 1-{number - 1} of {page_count}. "
+                        f"Call read_pdf_from_drive again with start_page={number} to continue.]")
+            text.append(page_text)
+            length += len(page_text) + 1
         return "\n".join(text)
     except Exception as e:
         return f"Error reading PDF: {e}"
 
 @tool
 def upload_file_to_drive(local_path: str, folder_name: str = None) -> str:
-    """Uploads a local file to Google Drive."""
-    drive_service = get_drive_service()
-    
-    filename = local_path.split('/')[-1]
-    file_metadata = {'name': filename}
-    
+    """
+    Uploads local files to Google Drive.
+    local_path: a file, a directory (uploads its files) or a glob like "~/reports/*.pdf";
+    put several on separate lines. Files upload in parallel, and an interrupted
+    upload of the same file resumes where it stopped on the next call.
+    """
+    paths = drive_upload.expand_paths(local_path)
+    if not paths:
+        return f"Error: No files match '{local_path}'."
+
+    folder_id = None
     if folder_name:
         folder_id = get_folder_id(folder_name)
-        if folder_id:
-            file_metadata['parents'] = [folder_id]
-        else:
+        if not folder_id:
             return f"Error: Destination folder '{folder_name}' not found."
             
     try:
-        media = MediaFileUpload(local_path, resumable=True)
-        file = drive_service.files().create(body=file_metadata, media_body=media, fields='id').execute()
-        return f"Success: Uploaded '{filename}' to Drive (ID: {file.get('id')})."
+        results = drive_upload.upload_files(paths, folder_id)
     except Exception as e:
         return f"Error uploading file: {e}"
+    drive_mirror.mark_stale()
+
+    lines = []
+    for r in results:
+        if 'error' in r:
+            lines.append(f"- {r['name']}: Error: {r['error']}")
+            continue
+        drive_cache.remember(r['file'])
+        size = f"{r['size'] / (1024 * 1024):.1f} MB" if r['size'] >= 1024 * 1024 else f"{r['size'] / 1024:.0f} KB"
+        line = f"- {r['name']}: uploaded (ID: {r['file'].get('id')}, {size} in {r['seconds']:.1f}s"
+        if r['resumed_from']:
+            line += f", resumed at {r['resumed_from'] * 100 // max(r['size'], 1)}%"
+        lines.append(line + ")")
+
+    uploaded = sum('error' not in r for r in results)
+    if len(results) == 1:
+        r = results[0]
+        if 'error' in r:
+            return f"Error uploading file: {r['error']}"
+        return f"Success: Uploaded '{r['name']}' to Drive (ID: {r['file'].get('id')})."
+    return f"Uploaded {uploaded} of {len(results)} files:\n" + "\n".join(lines)
 
 @tool
 def empty_trash() -> str:
@@ -398,29 +684,25 @@ def empty_trash() -> str:
     try:
         drive_service = get_drive_service()
         drive_service.files().emptyTrash().execute()
+        drive_mirror.mark_stale()
         return "Success: Trash has been permanently emptied."
     except Exception as e:
         return f"Error emptying trash: {e}"
 
 @tool
-def list_shared_files() -> str:
+def list_shared_files(limit: int = 10, page: int = 1) -> str:
     """Lists files shared with you."""
-    drive_service = get_drive_service()
     try:
-        results = drive_service.files().list(
-            q="sharedWithMe = true and trashed = false",
-            pageSize=10,
-            fields="files(id, name, owners)"
-        ).execute()
-        files = results.get('files', [])
+        files, total = drive_mirror.search(shared_with_me=True, limit=limit, offset=(page - 1) * limit)
         
         if not files:
             return "No shared files found."
             
         output = ["Files shared with you:"]
         for f in files:
-            owner = f.get('owners', [{}])[0].get('displayName', 'Unknown')
+            owner = (f['owners'] or [{}])[0].get('displayName', 'Unknown')
             output.append(f"- {f['name']} (Owner: {owner})")
+        output.append(drive_mirror.page_footer(total, page, limit))
         return "\n".join(output)
     except Exception as e:
         return f"Error listing shared files: {e}"
@@ -1,14 +1,12 @@
+import time
 from langchain.tools import tool
 from moth.tools.utils import get_drive_service
+from moth.tools import drive_cache, drive_mirror
 
 @tool
-def list_drive_files(limit: int = 10) -> str:
+def list_drive_files(limit: int = 10, page: int = 1) -> str:
     """Lists the most recently modified files in Google Drive."""
-    service = get_drive_service()
-    results = service.files().list(
-        pageSize=limit, fields="nextPageToken, files(id, name, mimeType, modifiedTime)"
-    ).execute()
-    files = results.get('files', [])
+    files, total = drive_mirror.search(limit=limit, offset=(page - 1) * limit)
 
     if not files:
         return "No files found."
@@ -16,6 +14,7 @@ def list_drive_files(limit: int = 10) -> str:
     output = []
     for item in files:
         output.append(f"{item['name']} ({item['mimeType']}) - ID: {item['id']}")
+    output.append(drive_mirror.page_footer(total, page, limit))
     
     return "\n".join(output)
 
@@ -45,6 +44,198 @@ def delete_file_by_name(filename: str) -> str:
     file_id = files[0]['id']
     try:
         service.files().update(fileId=file_id, body={'trashed': True}).execute()
+        drive_cache.invalidate(file_id=file_id)
+        drive_mirror.mark_stale()
         return f"Successfully moved '{filename}' (ID: {file_id}) to trash."
     except Exception as e:
         return f"Error deleting file: {e}"
+
+# --- Bulk Operations ---
+# Targets are resolved from the metadata mirror (no per-file lookups) and the
+# updates go out as batch requests, DRIVE_BATCH_SIZE calls per HTTP round trip.
+
+DRIVE_BATCH_SIZE = 50  # Drive accepts up to 100 calls per batch
+BULK_MAX_FILES = 500
+BULK_MAX_ATTEMPTS = 3
+
+def resolve_targets(names: str = "", query: str = None, folder_id: str = None, trashed: bool = False, drive=None):
+    """
+    Files listed in `names` (one name or file ID per line) and/or whose name contains `query`,
+    optionally only inside folder_id. Returns ({id: file}, [problems]).
+    """
+    targets, problems = {}, []
+    entries = [line.strip() for line in (names or "").splitlines() if line.strip()]
+    by_id = drive_mirror.get_files(entries, drive)
+    for entry in entries:
+        if entry in by_id:
+            if by_id[entry]['trashed'] == trashed:
+                targets[entry] = by_id[entry]
+            else:
+                problems.append(f"'{entry}' is {'not ' if trashed else ''}in the trash")
+            continue
+        matches, total = drive_mirror.search(name=entry, exact=True, trashed=trashed, parent_id=folder_id,
+                                             limit=10, drive=drive)
+        if total == 0:
+            problems.append(f"'{entry}' not found")
+        elif total > 1:
+            ids = ", ".join(f['id'] for f in matches)
+            problems.append(f"'{entry}' matches {total} files ({ids}); give the ID instead")
+        else:
+            targets[matches[0]['id']] = matches[0]
+
+    if query:
+        matches, total = drive_mirror.search(name=query, trashed=trashed, parent_id=folder_id,
+                                             limit=BULK_MAX_FILES, drive=drive)
+        for f in matches:
+            targets[f['id']] = f
+        if total > BULK_MAX_FILES:
+            problems.append(f"query matched {total} files; only the newest {BULK_MAX_FILES} were included")
+    return targets, problems
+
+def run_batch(service, requests: dict) -> dict:
+    """
+    Executes {file_id: (build_request, label)} in batch requests, retrying rate-limited and server errors.
+    Returns {file_id: ('ok', response) | ('error', reason)}.
+    """
+    results = {}
+    pending = list(requests.items())
+    attempt = 0
+    while pending and attempt < BULK_MAX_ATTEMPTS:
+        attempt += 1
+        retry = []
+        for start in range(0, len(pending), DRIVE_BATCH_SIZE):
+            chunk = pending[start:start + DRIVE_BATCH_SIZE]
+
+            def on_response(request_id, response, exception):
+                if exception is None:
+                    results[request_id] = ('ok', response)
+                    return
+                status = getattr(getattr(exception, 'resp', None), 'status', None)
+                if status in (429, 500, 503) or (status == 403 and 'ateLimitExceeded' in str(exception)):
+                    retry.append((request_id, requests[request_id]))
+                reason = getattr(exception, 'reason', None) or str(exception).splitlines()[0]
+                results[request_id] = ('error', f"{status} {reason}"[:120] if status else reason[:120])
+
+            batch = service.new_batch_http_request(callback=on_response)
+            for file_id, build_request in chunk:
+                batch.add(build_request(), request_id=file_id)
+            batch.execute()
+
+        if retry:
+            print(f"DEBUG: {len(retry)} Drive batch calls rate limited; retrying (attempt {attempt + 1})...")
+            time.sleep(2 ** attempt)
+        pending = retry
+    return results
+
+def _bulk_report(verb: str, targets: dict, results: dict, problems: list, changed: dict) -> str:
+    """Summary with per-file failures; successful files get the `changed` fields in the mirror."""
+    done = [file_id for file_id, (status, _) in results.items() if status == 'ok']
+    for file_id in done:
+        drive_cache.invalidate(file_id=file_id)
+    if done:
+        drive_mirror.apply_local([{**targets[file_id], **changed} for file_id in done])
+        drive_mirror.mark_stale()
+
+    output = [f"{verb} {len(done)} of {len(targets)} files."]
+    for file_id, (status, reason) in results.items():
+        if status == 'error':
+            output.append(f"- {targets[file_id]['name']} (ID: {file_id}): Error: {reason}")
+    for problem in problems:
+        output.append(f"- Skipped: {problem}")
+    return "\n".join(output)
+
+def _folder_id(folder_name: str, service):
+    folder = drive_cache.resolve_path(folder_name, drive_cache.FOLDER_MIME, service)
+    return folder['id'] if folder else None
+
+@tool
+def bulk_trash_files(names: str = "", query: str = None, folder_name: str = None) -> str:
+    """
+    Moves MANY files to the trash in one call (use instead of repeated delete_file_by_name).
+    names: file names or IDs, one per line. query: trash every file whose name contains this text.
+    folder_name: only consider files directly inside this folder.
+    """
+    if not (names or "").strip() and not query:
+        return "Error: Give names/IDs or a query."
+    try:
+        service = get_drive_service()
+        folder_id = None
+        if folder_name:
+            folder_id = _folder_id(folder_name, service)
+            if not folder_id:
+                return f"Error: Folder '{folder_name}' not found."
+        targets, problems = resolve_targets(names, query, folder_id, trashed=False, drive=service)
+        if not targets:
+            return "No matching files to trash." + "".join(f"\n- {p}" for p in problems)
+
+        results = run_batch(service, {
+            file_id: (lambda file_id=file_id: service.files().update(fileId=file_id, body={'trashed': True}, fields='id'))
+            for file_id in targets
+        })
+        return _bulk_report("Trashed", targets, results, problems, {'trashed': True})
+    except Exception as e:
+        return f"Error trashing files: {e}"
+
+@tool
+def bulk_restore_files(names: str = "", query: str = None, folder_name: str = None) -> str:
+    """
+    Restores MANY trashed files in one call.
+    names: file names or IDs, one per line. query: restore every trashed file whose name contains this text.
+    folder_name: only consider files that were directly inside this folder.
+    """
+    if not (names or "").strip() and not query:
+        return "Error: Give names/IDs or a query."
+    try:
+        service = get_drive_service()
+        folder_id = None
+        if folder_name:
+            folder_id = _folder_id(folder_name, service)
+            if not folder_id:
+                return f"Error: Folder '{folder_name}' not found."
+        targets, problems = resolve_targets(names, query, folder_id, trashed=True, drive=service)
+        if not targets:
+            return "No matching files in the trash." + "".join(f"\n- {p}" for p in problems)
+
+        results = run_batch(service, {
+            file_id: (lambda file_id=file_id: service.files().update(fileId=file_id, body={'trashed': False}, fields='id'))
+            for file_id in targets
+        })
+        return _bulk_report("Restored", targets, results, problems, {'trashed': False})
+    except Exception as e:
+        return f"Error restoring files: {e}"
+
+@tool
+def bulk_move_files(destination_folder: str, names: str = "", query: str = None, folder_name: str = None) -> str:
+    """
+    Moves MANY files into destination_folder in one call (use instead of repeated move_file).
+    names: file names or IDs, one per line. query: move every file whose name contains this text.
+    folder_name: only consider files directly inside this (source) folder.
+    """
+    if not (names or "").strip() and not query:
+        return "Error: Give names/IDs or a query."
+    try:
+        service = get_drive_service()
+        destination_id = _folder_id(destination_folder, service)
+        if not destination_id:
+            return f"Error: Folder '{destination_folder}' not found."
+        folder_id = None
+        if folder_name:
+            folder_id = _folder_id(folder_name, service)
+            if not folder_id:
+                return f"Error: Folder '{folder_name}' not found."
+        targets, problems = resolve_targets(names, query, folder_id, trashed=False, drive=service)
+        targets.pop(destination_id, None)
+        if not targets:
+            return "No matching files to move." + "".join(f"\n- {p}" for p in problems)
+
+        def move(file_id):
+            # Current parents come from the mirror (no files().get per file)
+            previous = ",".join(p for p in targets[file_id]['parents'] if p != destination_id)
+            return service.files().update(fileId=file_id, addParents=destination_id,
+                                          removeParents=previous or None, fields='id, parents')
+
+        results = run_batch(service, {file_id: (lambda file_id=file_id: move(file_id)) for file_id in targets})
+        return _bulk_report(f"Moved into '{destination_folder}':", targets, results, problems,
+                            {'parents': [destination_id]})
+    except Exception as e:
+        return f"Error moving files: {e}"
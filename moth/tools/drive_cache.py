@@ -0,0 +1,127 @@
+"""
+Shared name -> id resolution cache for Drive files and folders.
+
+Tools resolve names through `resolve()` / `resolve_path()` instead of issuing
+their own `files().list` name queries. Entries map (name, mimeType, parent)
+to the file's id and parents, expire after CACHE_TTL seconds, and are updated
+or dropped by our own mutating tools (create, move, trash, restore).
+
+Folder arguments may be paths ("Projects/2025/Reports"); each segment of the
+walk is cached, so siblings of a resolved path cost nothing. Names that contain
+a slash themselves still resolve: the literal name is tried when the walk fails.
+
+Hits are counted per thread, i.e. per agent turn: `start_turn()` resets the
+counters and `turn_stats()` reports the API calls saved.
+"""
+
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from moth.tools.utils import get_drive_service
+
+load_dotenv()
+
+CACHE_TTL = int(os.getenv("MOTH_DRIVE_CACHE_TTL", "300"))
+
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+DOC_MIME = 'application/vnd.google-apps.document'
+
+_entries = {}   # (name, mime_type, parent_id) -> (expires_at, {'id', 'name', 'mimeType', 'parents'})
+_lock = threading.Lock()
+_turn = threading.local()
+
+def start_turn():
+    """Resets this thread's hit/miss counters (called at the start of an agent turn)."""
+    _turn.hits = 0
+    _turn.api_calls = 0
+
+def turn_stats() -> dict:
+    """{'hits': lookups answered from cache (= API calls saved), 'api_calls': lookups that queried Drive}."""
+    return {'hits': getattr(_turn, 'hits', 0), 'api_calls': getattr(_turn, 'api_calls', 0)}
+
+def _count(hit: bool):
+    if hit:
+        _turn.hits = getattr(_turn, 'hits', 0) + 1
+    else:
+        _turn.api_calls = getattr(_turn, 'api_calls', 0) + 1
+
+def _escape(name: str) -> str:
+    return name.replace("\\", "\\\\").replace("'", "\\'")
+
+def remember(file: dict, mime_type: str = None):
+    """Caches a file dict ({'id', 'name', 'mimeType'?, 'parents'?}) we just created or looked up."""
+    mime_type = mime_type or file.get('mimeType')
+    entry = {'id': file['id'], 'name': file['name'], 'mimeType': mime_type, 'parents': file.get('parents', [])}
+    expires = time.time() + CACHE_TTL
+    with _lock:
+        _entries[(file['name'], mime_type, None)] = (expires, entry)
+        for parent in entry['parents']:
+            _entries[(file['name'], mime_type, parent)] = (expires, entry)
+
+def invalidate(file_id: str = None, name: str = None):
+    """Drops every entry for the file id and/or name (after a move, trash or restore)."""
+    with _lock:
+        for key, (_, entry) in list(_entries.items()):
+            if (file_id and entry['id'] == file_id) or (name and key[0] == name):
+                del _entries[key]
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+def resolve(name: str, mime_type: str = None, parent_id: str = None, drive=None):
+    """
+    Returns {'id', 'name', 'mimeType', 'parents'} of the first non-trashed file called
+    `name` (optionally of `mime_type`, optionally inside `parent_id`), or None.
+    """
+    key = (name, mime_type, parent_id)
+    with _lock:
+        cached = _entries.get(key)
+        if cached and cached[0] > time.time():
+            _count(hit=True)
+            return cached[1]
+
+    q_parts = [f"name = '{_escape(name)}'", "trashed = false"]
+    if mime_type:
+        q_parts.append(f"mimeType = '{mime_type}'")
+    if parent_id:
+        q_parts.append(f"'{parent_id}' in parents")
+
+    _count(hit=False)
+    drive = drive or get_drive_service()
+    results = drive.files().list(
+        q=" and ".join(q_parts), spaces='drive', fields='files(id, name, mimeType, parents)', pageSize=1
+    ).execute()
+    files = results.get('files', [])
+    if not files:
+        return None
+
+    entry = {'id': files[0]['id'], 'name': files[0]['name'], 'mimeType': files[0].get('mimeType', mime_type),
+             'parents': files[0].get('parents', [])}
+    with _lock:
+        _entries[key] = (time.time() + CACHE_TTL, entry)
+    return entry
+
+def resolve_path(path: str, mime_type: str = FOLDER_MIME, drive=None):
+    """
+    Resolves "Projects/2025/Reports": every segment but the last must be a folder
+    inside the previous one; the last must be of `mime_type`. A single name
+    behaves like resolve(). If the walk fails, the whole string is tried as a
+    literal name, since "Q3/Q4 Plan" is a valid file name.
+    Returns the entry of the last segment (or the literal match) or None.
+    """
+    segments = [segment for segment in path.strip('/').split('/') if segment]
+    if not segments:
+        return None
+
+    drive = drive or (get_drive_service() if len(segments) > 1 else None)
+    parent_id = None
+    for segment in segments[:-1]:
+        folder = resolve(segment, FOLDER_MIME, parent_id, drive)
+        if not folder:
+            return resolve(path, mime_type, None, drive)
+        parent_id = folder['id']
+    return resolve(segments[-1], mime_type, parent_id, drive) or (
+        resolve(path, mime_type, None, drive) if len(segments) > 1 else None
+    )
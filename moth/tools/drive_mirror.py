@@ -0,0 +1,230 @@
+"""
+Local mirror of the user's Drive metadata (no file contents).
+
+The first use lists every file once, 1000 per page, into SQLite. After that
+the Drive changes API is the cursor. The page token is persisted, and a sync
+fetches only what changed since the last one. Syncs run at most every
+SYNC_INTERVAL seconds, or right after `mark_stale()` (our own mutating tools
+call it). Listing and search tools then answer from SQLite: results are
+complete and paginated instead of one 10-item page, and name lookups go
+through an index.
+
+    files, total = search(name="report", mime_type="application/pdf", limit=10, offset=10)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+from googleapiclient.errors import HttpError
+from moth.tools.utils import get_drive_service
+
+load_dotenv()
+
+MIRROR_DB = "drive_mirror.db"
+SYNC_INTERVAL = int(os.getenv("MOTH_DRIVE_MIRROR_SYNC", "30"))
+LIST_PAGE_SIZE = 1000
+
+FILE_FIELDS = "id, name, mimeType, parents, modifiedTime, owners(displayName, emailAddress), ownedByMe, sharedWithMeTime, trashed"
+
+_sync_lock = threading.Lock()
+_last_sync = 0.0
+
+def init_db():
+    conn = sqlite3.connect(MIRROR_DB)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS files (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            name_lower TEXT NOT NULL,
+            mime_type TEXT,
+            parents TEXT NOT NULL,
+            modified_time TEXT,
+            owners TEXT NOT NULL,
+            owned_by_me INTEGER NOT NULL,
+            shared_with_me INTEGER NOT NULL,
+            trashed INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_files_name ON files (name_lower)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_files_modified ON files (modified_time)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sync_state (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+def _row(file: dict) -> tuple:
+    return (
+        file['id'], file['name'], file['name'].lower(), file.get('mimeType'),
+        json.dumps(file.get('parents', [])), file.get('modifiedTime'),
+        json.dumps(file.get('owners', [])), int(bool(file.get('ownedByMe'))),
+        int('sharedWithMeTime' in file), int(bool(file.get('trashed')))
+    )
+
+def _file(row: tuple) -> dict:
+    return {
+        'id': row[0], 'name': row[1], 'mimeType': row[3], 'parents': json.loads(row[4]),
+        'modifiedTime': row[5], 'owners': json.loads(row[6]), 'ownedByMe': bool(row[7]),
+        'sharedWithMe': bool(row[8]), 'trashed': bool(row[9])
+    }
+
+_COLUMNS = "id, name, name_lower, mime_type, parents, modified_time, owners, owned_by_me, shared_with_me, trashed"
+
+def _upsert(conn, files: list):
+    conn.executemany(f"INSERT OR REPLACE INTO files ({_COLUMNS}) VALUES ({','.join('?' * 10)})",
+                     [_row(f) for f in files])
+
+def _get_token(conn):
+    row = conn.execute("SELECT value FROM sync_state WHERE key = 'page_token'").fetchone()
+    return row[0] if row else None
+
+def _set_token(conn, token: str):
+    conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('page_token', ?)", (token,))
+
+def _populate(conn, drive) -> int:
+    """Full listing. The start token is taken first, so changes made during the listing are replayed."""
+    token = drive.changes().getStartPageToken().execute()['startPageToken']
+    conn.execute("DELETE FROM files")
+    count = 0
+    page_token = None
+    while True:
+        response = drive.files().list(
+            pageSize=LIST_PAGE_SIZE, pageToken=page_token, spaces='drive',
+            fields=f"nextPageToken, files({FILE_FIELDS})"
+        ).execute()
+        files = response.get('files', [])
+        _upsert(conn, files)
+        count += len(files)
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            break
+    _set_token(conn, token)
+    print(f"DEBUG: Drive mirror populated with {count} files.")
+    return count
+
+def _apply_changes(conn, drive, token: str) -> int:
+    """Applies all changes since `token` and stores the new start token; returns the number applied."""
+    applied = 0
+    while True:
+        response = drive.changes().list(
+            pageToken=token, pageSize=LIST_PAGE_SIZE, spaces='drive', includeRemoved=True,
+            fields=f"nextPageToken, newStartPageToken, changes(removed, fileId, file({FILE_FIELDS}))"
+        ).execute()
+        for change in response.get('changes', []):
+            if change.get('removed') or not change.get('file'):
+                conn.execute("DELETE FROM files WHERE id = ?", (change['fileId'],))
+            else:
+                _upsert(conn, [change['file']])
+            applied += 1
+        if 'newStartPageToken' in response:
+            _set_token(conn, response['newStartPageToken'])
+            return applied
+        token = response['nextPageToken']
+
+def sync(drive=None, force: bool = False) -> int:
+    """Brings the mirror up to date (at most every SYNC_INTERVAL seconds unless forced); returns changes applied."""
+    global _last_sync
+    with _sync_lock:
+        if not force and time.time() - _last_sync < SYNC_INTERVAL:
+            return 0
+        init_db()
+        drive = drive or get_drive_service()
+        conn = sqlite3.connect(MIRROR_DB)
+        try:
+            token = _get_token(conn)
+            if token is None:
+                applied = _populate(conn, drive)
+            else:
+                try:
+                    applied = _apply_changes(conn, drive, token)
+                except HttpError as e:
+                    # An invalid or expired page token: list everything again
+                    if e.resp.status not in (400, 404, 410):
+                        raise
+                    print("DEBUG: Drive changes token rejected; repopulating the mirror.")
+                    applied = _populate(conn, drive)
+                if applied:
+                    print(f"DEBUG: Drive mirror applied {applied} changes.")
+            conn.commit()
+        finally:
+            conn.close()
+        _last_sync = time.time()
+        return applied
+
+def apply_local(files: list):
+    """Writes our own edits (already applied in Drive) into the mirror right away; the next sync confirms them."""
+    if not files:
+        return
+    init_db()
+    conn = sqlite3.connect(MIRROR_DB)
+    _upsert(conn, [{**f, **({'sharedWithMeTime': ''} if f.get('sharedWithMe') else {})} for f in files])
+    conn.commit()
+    conn.close()
+
+def mark_stale():
+    """Makes the next query sync first (after our own creates, moves, trashes and restores)."""
+    global _last_sync
+    with _sync_lock:
+        _last_sync = 0.0
+
+def search(name: str = None, exact: bool = False, mime_type: str = None, shared_with_me: bool = None,
+           trashed: bool = False, parent_id: str = None, limit: int = 10, offset: int = 0, drive=None):
+    """
+    Files matching all given filters, newest first: (files, total matches).
+    `name` matches case-insensitively, as a substring unless `exact`.
+    """
+    sync(drive)
+    where, params = ["trashed = ?"], [int(trashed)]
+    if name:
+        if exact:
+            where.append("name_lower = ?")
+            params.append(name.lower())
+        else:
+            where.append("instr(name_lower, ?) > 0")
+            params.append(name.lower())
+    if mime_type:
+        where.append("mime_type = ?")
+        params.append(mime_type)
+    if shared_with_me is not None:
+        where.append("shared_with_me = ?")
+        params.append(int(shared_with_me))
+    if parent_id:
+        where.append("instr(parents, ?) > 0")
+        params.append(json.dumps(parent_id))
+
+    conn = sqlite3.connect(MIRROR_DB)
+    clause = " AND ".join(where)
+    total = conn.execute(f"SELECT COUNT(*) FROM files WHERE {clause}", params).fetchone()[0]
+    rows = conn.execute(
+        f"SELECT {_COLUMNS} FROM files WHERE {clause} ORDER BY modified_time DESC, id LIMIT ? OFFSET ?",
+        [*params, limit, offset]
+    ).fetchall()
+    conn.close()
+    return [_file(row) for row in rows], total
+
+def get_files(file_ids: list, drive=None) -> dict:
+    """{id: file} for the ids present in the mirror."""
+    if not file_ids:
+        return {}
+    sync(drive)
+    conn = sqlite3.connect(MIRROR_DB)
+    rows = conn.execute(
+        f"SELECT {_COLUMNS} FROM files WHERE id IN ({','.join('?' for _ in file_ids)})", list(file_ids)
+    ).fetchall()
+    conn.close()
+    return {row[0]: _file(row) for row in rows}
+
+def page_footer(total: int, page: int, limit: int) -> str:
+    """'Showing 11-20 of 57. Use page=3 for more.' style footer for paginated tool output."""
+    first = (page - 1) * limit + 1
+    last = min(total, page * limit)
+    footer = f"Showing {first}-{last} of {total}."
+    if last < total:
+        footer += f" Use page={page + 1} for more."
+    return footer
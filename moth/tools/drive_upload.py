@@ -0,0 +1,203 @@
+"""
+Parallel, resumable uploads of local files to Drive.
+
+Every file goes up in a resumable session, UPLOAD_CHUNK bytes per request.
+The session URI is stored in SQLite as soon as Drive hands it out, keyed by
+the file's path and target folder (and checked against its size and mtime),
+so an upload cut off by a dropped connection or a restart continues from the
+last byte Drive confirmed instead of starting over. Drive keeps sessions for
+about a week.
+
+Files upload concurrently, at most UPLOAD_WORKERS at a time.
+"""
+
+import glob
+import json
+import mimetypes
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httplib2
+from dotenv import load_dotenv
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload
+from moth.tools.utils import get_drive_service
+
+load_dotenv()
+
+UPLOAD_WORKERS = int(os.getenv("MOTH_DRIVE_UPLOAD_WORKERS", "4"))
+# Fewer, larger PUTs; must be a multiple of 256 KiB
+UPLOAD_CHUNK = int(os.getenv("MOTH_DRIVE_UPLOAD_CHUNK_MB", "8")) * 1024 * 1024
+UPLOAD_MAX_ATTEMPTS = 3
+SESSION_MAX_AGE = 6 * 24 * 3600
+
+SESSIONS_DB = "upload_sessions.db"
+
+# --- Session Store ---
+
+def init_sessions():
+    conn = sqlite3.connect(SESSIONS_DB)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS upload_sessions (
+            path TEXT NOT NULL,
+            folder_id TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            session_uri TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (path, folder_id)
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+def load_session(path: str, folder_id: str, size: int, mtime: float):
+    """The stored session URI for this file version and folder, or None (stale rows are dropped)."""
+    init_sessions()
+    conn = sqlite3.connect(SESSIONS_DB)
+    row = conn.execute(
+        "SELECT size, mtime, session_uri, created_at FROM upload_sessions WHERE path = ? AND folder_id = ?",
+        (os.path.abspath(path), folder_id or '')
+    ).fetchone()
+    conn.close()
+    if not row:
+        return None
+    if row[0] != size or row[1] != mtime or time.time() - row[3] > SESSION_MAX_AGE:
+        drop_session(path, folder_id)
+        return None
+    return row[2]
+
+def save_session(path: str, folder_id: str, size: int, mtime: float, session_uri: str):
+    init_sessions()
+    conn = sqlite3.connect(SESSIONS_DB)
+    conn.execute("""
+        INSERT OR REPLACE INTO upload_sessions (path, folder_id, size, mtime, session_uri, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (os.path.abspath(path), folder_id or '', size, mtime, session_uri, time.time()))
+    conn.commit()
+    conn.close()
+
+def drop_session(path: str, folder_id: str):
+    init_sessions()
+    conn = sqlite3.connect(SESSIONS_DB)
+    conn.execute("DELETE FROM upload_sessions WHERE path = ? AND folder_id = ?", (os.path.abspath(path), folder_id or ''))
+    conn.commit()
+    conn.close()
+
+# --- Uploads ---
+
+def expand_paths(spec: str) -> list:
+    """Files named by `spec`: one entry per line, each a file, a directory (its files) or a glob pattern."""
+    files = []
+    for entry in spec.splitlines():
+        entry = os.path.expanduser(entry.strip())
+        if not entry:
+            continue
+        if os.path.isdir(entry):
+            matches = sorted(p for p in (os.path.join(entry, n) for n in os.listdir(entry)) if os.path.isfile(p))
+        elif any(c in entry for c in '*?['):
+            matches = sorted(p for p in glob.glob(entry, recursive=True) if os.path.isfile(p))
+        else:
+            matches = [entry]  # missing files are reported per file
+        for path in matches:
+            if path not in files:
+                files.append(path)
+    return files
+
+def _query_progress(request, size: int):
+    """Asks Drive how much of the session it has: (bytes received, final response or None)."""
+    resp, content = request.http.request(
+        request.resumable_uri, method='PUT', headers={'Content-Range': f"bytes */{size}", 'Content-Length': '0'}
+    )
+    if resp.status in (200, 201):
+        return size, json.loads(content)
+    if resp.status == 308:
+        received = resp.get('range')
+        return (int(received.rsplit('-', 1)[1]) + 1 if received else 0), None
+    raise HttpError(resp, content, uri=request.resumable_uri)
+
+def upload_file(path: str, folder_id: str = None) -> dict:
+    """
+    Uploads one file, resuming a stored session when there is one.
+    Returns {'path', 'name', 'size', 'file' (Drive file dict) or 'error', 'resumed_from', 'seconds'}.
+    """
+    name = os.path.basename(path)
+    result = {'path': path, 'name': name, 'size': 0, 'resumed_from': 0, 'seconds': 0.0}
+    try:
+        size, mtime = os.path.getsize(path), os.path.getmtime(path)
+    except OSError:
+        result['error'] = "file not found"
+        return result
+    result['size'] = size
+
+    meta = {'name': name}
+    if folder_id:
+        meta['parents'] = [folder_id]
+    fields = 'id, name, mimeType, parents'
+    started = time.time()
+
+    # Own service per call: the API client's HTTP transport isn't thread-safe
+    drive = get_drive_service()
+    if size == 0:
+        result['file'] = drive.files().create(body=meta, fields=fields).execute()
+        return result
+
+    mime_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    media = MediaFileUpload(path, mimetype=mime_type, chunksize=UPLOAD_CHUNK, resumable=True)
+    request = drive.files().create(body=meta, media_body=media, fields=fields)
+
+    response = None
+    stored_uri = load_session(path, folder_id, size, mtime)
+    if stored_uri:
+        request.resumable_uri = stored_uri
+        try:
+            request.resumable_progress, response = _query_progress(request, size)
+            result['resumed_from'] = request.resumable_progress
+            print(f"DEBUG: Resuming upload of {name} at {request.resumable_progress}/{size} bytes.")
+        except HttpError as e:
+            if e.resp.status not in (404, 410):
+                raise
+            print(f"DEBUG: Upload session for {name} expired; starting over.")
+            drop_session(path, folder_id)
+            request.resumable_uri = stored_uri = None
+            request.resumable_progress = 0
+
+    failures = 0
+    while response is None:
+        try:
+            status, response = request.next_chunk(num_retries=2)
+            if status:
+                print(f"DEBUG: Uploading {name}: {int(status.progress() * 100)}%")
+        except (HttpError, httplib2.HttpLib2Error, OSError) as e:
+            if isinstance(e, HttpError) and e.resp.status < 500 and e.resp.status != 429:
+                raise
+            failures += 1
+            if failures >= UPLOAD_MAX_ATTEMPTS:
+                raise
+            # The client re-queries the session's progress before the next chunk
+            print(f"DEBUG: Upload of {name} interrupted ({e}); resuming (attempt {failures + 1}).")
+        finally:
+            if request.resumable_uri and request.resumable_uri != stored_uri:
+                save_session(path, folder_id, size, mtime, request.resumable_uri)
+                stored_uri = request.resumable_uri
+
+    drop_session(path, folder_id)
+    result['file'] = response
+    result['seconds'] = time.time() - started
+    return result
+
+def _safe_upload(path: str, folder_id: str) -> dict:
+    try:
+        return upload_file(path, folder_id)
+    except Exception as e:
+        return {'path': path, 'name': os.path.basename(path), 'size': 0, 'resumed_from': 0, 'seconds': 0.0,
+                'error': str(e)}
+
+def upload_files(paths: list, folder_id: str = None, workers: int = None) -> list:
+    """Uploads the files concurrently (at most `workers`); results in input order, one per file."""
+    workers = max(1, min(workers or UPLOAD_WORKERS, len(paths)))
+    if workers == 1:
+        return [_safe_upload(path, folder_id) for path in paths]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda path: _safe_upload(path, folder_id), paths))
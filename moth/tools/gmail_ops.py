@@ -4,10 +4,22 @@ import email
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from googleapiclient.http import MediaIoBaseUpload
-from moth.tools.utils import get_gmail_service, get_drive_service
+from moth.tools.utils import get_gmail_service, get_drive_service, get_credentials
+from moth.tools import drive_cache, drive_mirror
+from concurrent.futures import ThreadPoolExecutor
 import io
+import os
+import csv
 import re
 import html
+import json
+import time
+import zlib
+import hashlib
+import sqlite3
+import tempfile
+import threading
+import mimetypes
 import binascii
 
 # --- Robust Helper Functions ---
@@ -33,38 +45,275 @@ def safe_clean_decode(data_str: str) -> str:
     except Exception:
         return ""
 
+# Body extraction limits: parts are decoded up to MAX_PART_BYTES, and a plain-text
+# part of at least MIN_PLAIN_TEXT characters is taken as the body right away.
+MAX_PART_BYTES = 512 * 1024
+MIN_PLAIN_TEXT = 200
+
+# A block left open (e.g. cut off by MAX_PART_BYTES) runs to the end of the text
+_INVISIBLE_RE = re.compile(r'<(style|script|head|title)\b[^>]*>.*?(?:</\1\s*>|\Z)|<!--.*?(?:-->|\Z)', re.DOTALL | re.IGNORECASE)
+_TAG_RE = re.compile(r'<[^>]*>')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def decode_part(data_str: str, max_bytes: int = MAX_PART_BYTES) -> str:
+    """safe_clean_decode limited to the first max_bytes of decoded data."""
+    if not data_str: return ""
+    # 4 base64 characters carry 3 bytes
+    return safe_clean_decode(data_str[:max_bytes // 3 * 4])
+
 def clean_html_content(text: str) -> str:
     """Removes HTML tags to reveal the actual text."""
     if not text: return ""
+    text = _INVISIBLE_RE.sub(' ', text)
+    text = _TAG_RE.sub(' ', text)
+    # Unescape after stripping tags, so escaped "&lt;b&gt;" survives as text
     text = html.unescape(text)
-    text = re.sub(r'<style.*?>.*?</style>', '', text, flags=re.DOTALL)
-    text = re.sub(r'<script.*?>.*?</script>', '', text, flags=re.DOTALL)
-    text = re.sub(r'<[^<]+?>', ' ', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+    return _WHITESPACE_RE.sub(' ', text).strip()
 
-def extract_all_text(payload):
+def extract_body_text(payload: dict):
     """
-    Recursively finds ALL text in an email (plain and html).
+    Finds the body text of an email: the first plain-text part of at least
+    MIN_PLAIN_TEXT characters, otherwise the longest text found in any
+    text/plain or text/html part. Attachment parts are skipped.
+    Returns None if the email has no text.
     """
-    text_candidates = []
-    
-    parts = payload.get('parts', [])
-    body_data = payload.get('body', {}).get('data')
-    mime_type = payload.get('mimeType', '')
+    best = ""
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        mime_type = part.get('mimeType', '')
+        body_data = part.get('body', {}).get('data')
 
-    if body_data and mime_type in ['text/plain', 'text/html']:
-        decoded = safe_clean_decode(body_data)
-        if decoded:
+        if body_data and mime_type in ('text/plain', 'text/html') and not part.get('filename'):
+            text = decode_part(body_data)
             if mime_type == 'text/html':
-                decoded = clean_html_content(decoded)
-            if len(decoded.strip()) > 5: 
-                text_candidates.append(decoded)
+                text = clean_html_content(text)
+            text = text.strip()
+            if mime_type == 'text/plain' and len(text) >= MIN_PLAIN_TEXT:
+                return text
+            if len(text) > 5 and len(text) > len(best):
+                best = text
 
-    for part in parts:
-        text_candidates.extend(extract_all_text(part))
-        
-    return text_candidates
+        # Depth-first, in document order
+        stack.extend(reversed(part.get('parts', [])))
+
+    # Fallback for flat emails
+    if not best:
+        best = decode_part(payload.get('body', {}).get('data')).strip()
+    return best or None
+
+# --- Batched Fetch Helpers ---
+
+METADATA_HEADERS = ['From', 'Subject', 'Date']
+
+# Gmail accepts up to 100 calls per batch but recommends at most 50
+BATCH_SIZE = 50
+
+def list_message_ids(service, limit: int, query: str = None, label_ids: list = None, user_id: str = 'me') -> list:
+    """Lists up to `limit` message ids (newest first), following page tokens."""
+    ids = []
+    page_token = None
+    while len(ids) < limit:
+        results = service.users().messages().list(
+            userId=user_id, q=query, labelIds=label_ids,
+            maxResults=min(limit - len(ids), 500), pageToken=page_token
+        ).execute()
+        ids.extend(m['id'] for m in results.get('messages', []))
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+    return ids[:limit]
+
+def batch_get_messages(service, message_ids: list, user_id: str = 'me', format: str = 'metadata',
+                       headers: list = METADATA_HEADERS) -> dict:
+    """
+    Fetches messages with batch HTTP requests, BATCH_SIZE per round trip.
+    Returns {message_id: message}; messages that failed are logged and left out.
+    """
+    messages = {}
+
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            print(f"DEBUG: Batch fetch failed for message {request_id}: {exception}")
+        else:
+            messages[request_id] = response
+
+    message_ids = list(dict.fromkeys(message_ids))
+    extra = {'metadataHeaders': headers} if format == 'metadata' else {}
+    for start in range(0, len(message_ids), BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=on_response)
+        for message_id in message_ids[start:start + BATCH_SIZE]:
+            batch.add(
+                service.users().messages().get(userId=user_id, id=message_id, format=format, **extra),
+                request_id=message_id
+            )
+        batch.execute()
+    return messages
+
+def get_header(message: dict, name: str, default: str = None) -> str:
+    headers = message.get('payload', {}).get('headers', [])
+    return next((h['value'] for h in headers if h['name'].lower() == name.lower()), default)
+
+# --- Local Message Cache ---
+# A delivered message never changes (labels aside), so headers, the extracted
+# body text and the attachment index are cached per message id: zlib-compressed
+# JSON blobs in SQLite, evicted least-recently-used past CACHE_MAX_BYTES.
+# Labels are stored as of the first fetch.
+
+CACHE_DB = "gmail_cache.db"
+CACHE_MAX_BYTES = int(os.getenv("MOTH_GMAIL_CACHE_MB", "50")) * 1024 * 1024
+
+CACHE_STATS = {'hits': 0, 'misses': 0, 'bytes_saved': 0, 'evictions': 0}
+_cache_stats_lock = threading.Lock()
+
+def init_cache():
+    conn = sqlite3.connect(CACHE_DB)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS message_cache (
+            user_id TEXT NOT NULL,
+            message_id TEXT NOT NULL,
+            entry BLOB NOT NULL,
+            has_text INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            api_bytes INTEGER NOT NULL,
+            last_access REAL NOT NULL,
+            PRIMARY KEY (user_id, message_id)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_message_cache_access ON message_cache (last_access)")
+    conn.commit()
+    conn.close()
+
+def _count_cache(hits: int = 0, misses: int = 0, bytes_saved: int = 0, evictions: int = 0):
+    with _cache_stats_lock:
+        CACHE_STATS['hits'] += hits
+        CACHE_STATS['misses'] += misses
+        CACHE_STATS['bytes_saved'] += bytes_saved
+        CACHE_STATS['evictions'] += evictions
+
+def cache_get(message_ids: list, user_id: str = 'me', need_text: bool = False) -> dict:
+    """Cached entries for the ids ({id: entry}); with need_text, only entries holding the body text."""
+    if not message_ids:
+        return {}
+    init_cache()
+    conn = sqlite3.connect(CACHE_DB)
+    query = f"""
+        SELECT message_id, entry, api_bytes FROM message_cache
+        WHERE user_id = ? AND message_id IN ({','.join('?' for _ in message_ids)})
+    """
+    if need_text:
+        query += " AND has_text = 1"
+    rows = conn.execute(query, [user_id, *message_ids]).fetchall()
+    if rows:
+        conn.executemany(
+            "UPDATE message_cache SET last_access = ? WHERE user_id = ? AND message_id = ?",
+            [(time.time(), user_id, row[0]) for row in rows]
+        )
+        conn.commit()
+    conn.close()
+
+    entries = {message_id: json.loads(zlib.decompress(blob)) for message_id, blob, _ in rows}
+    _count_cache(hits=len(rows), misses=len(set(message_ids)) - len(rows),
+                 bytes_saved=sum(row[2] for row in rows))
+    return entries
+
+def cache_put(entries: list, user_id: str = 'me'):
+    """Stores (entry, api_bytes) pairs, then evicts LRU entries past CACHE_MAX_BYTES."""
+    if not entries:
+        return
+    init_cache()
+    now = time.time()
+    rows = []
+    for entry, api_bytes in entries:
+        blob = zlib.compress(json.dumps(entry).encode(), 6)
+        rows.append((user_id, entry['id'], blob, int(entry.get('text') is not None), len(blob), api_bytes, now))
+
+    conn = sqlite3.connect(CACHE_DB)
+    conn.executemany("""
+        INSERT OR REPLACE INTO message_cache (user_id, message_id, entry, has_text, size, api_bytes, last_access)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM message_cache").fetchone()[0]
+    evicted = 0
+    if total > CACHE_MAX_BYTES:
+        # Trim to 90% so eviction doesn't run on every insert
+        excess = total - int(CACHE_MAX_BYTES * 0.9)
+        for user, message_id, size in conn.execute(
+            "SELECT user_id, message_id, size FROM message_cache ORDER BY last_access"
+        ).fetchall():
+            if excess <= 0:
+                break
+            conn.execute("DELETE FROM message_cache WHERE user_id = ? AND message_id = ?", (user, message_id))
+            excess -= size
+            evicted += 1
+    conn.commit()
+    conn.close()
+    _count_cache(evictions=evicted)
+
+def get_cache_stats() -> dict:
+    """Hits, misses, hit rate, API bytes saved by hits, evictions, and the cache's current size."""
+    with _cache_stats_lock:
+        stats = dict(CACHE_STATS)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else None
+    init_cache()
+    conn = sqlite3.connect(CACHE_DB)
+    stats['entries'], stats['size'] = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM message_cache"
+    ).fetchone()
+    conn.close()
+    return stats
+
+def _find_attachments(parts: list, found: dict = None) -> dict:
+    """{filename: attachmentId} for all attachment parts."""
+    found = {} if found is None else found
+    for p in parts:
+        if p.get('filename') and p.get('body', {}).get('attachmentId'):
+            found.setdefault(p['filename'], p['body']['attachmentId'])
+        if 'parts' in p:
+            _find_attachments(p['parts'], found)
+    return found
+
+def to_cache_entry(message: dict, full: bool) -> dict:
+    """Reduces a messages.get response (format='metadata' or 'full') to what the cache keeps."""
+    payload = message.get('payload', {})
+    return {
+        'id': message['id'],
+        'thread_id': message.get('threadId'),
+        'labels': message.get('labelIds', []),
+        'headers': {h['name']: h['value'] for h in payload.get('headers', [])},
+        'snippet': message.get('snippet', ''),
+        'internal_date': int(message.get('internalDate', 0)),
+        'text': (extract_body_text(payload) or "") if full else None,
+        'attachments': _find_attachments(payload.get('parts', [])) if full else None,
+    }
+
+def fetch_message(service, message_id: str, user_id: str = 'me') -> dict:
+    """Full cache entry (headers, body text, attachments) for one message; API call only on a miss."""
+    cached = cache_get([message_id], user_id, need_text=True)
+    if message_id in cached:
+        return cached[message_id]
+    message = service.users().messages().get(userId=user_id, id=message_id, format='full').execute()
+    entry = to_cache_entry(message, full=True)
+    cache_put([(entry, len(json.dumps(message)))], user_id)
+    return entry
+
+def fetch_metadata(service, message_ids: list, user_id: str = 'me') -> tuple:
+    """
+    Header entries for the messages, cached ones locally and the rest in batched calls.
+    Returns ({message_id: entry}, number of API round trips made).
+    """
+    entries = cache_get(message_ids, user_id)
+    missing = [message_id for message_id in dict.fromkeys(message_ids) if message_id not in entries]
+    if not missing:
+        return entries, 0
+
+    fetched = batch_get_messages(service, missing, user_id=user_id)
+    new_entries = [(to_cache_entry(m, full=False), len(json.dumps(m))) for m in fetched.values()]
+    cache_put(new_entries, user_id)
+    entries.update({entry['id']: entry for entry, _ in new_entries})
+    return entries, -(-len(missing) // BATCH_SIZE)
 
 # --- SMART TOOLS ---
 
@@ -105,27 +354,28 @@ def read_recent_emails(limit: int = 5) -> str:
         service = get_gmail_service()
         # Changed from labelIds=['INBOX'] to q='category:primary' for better coverage
         print(f"DEBUG: Fetching top {limit} emails from category:primary...")
-        results = service.users().messages().list(userId='me', q='category:primary', maxResults=limit).execute()
+        message_ids = list_message_ids(service, limit, query='category:primary')
         
-        messages = results.get('messages', [])
-        if not messages: 
+        if not message_ids: 
             print("DEBUG: No messages found in API response.")
             return "No recent emails found in Primary inbox."
 
+        # Headers only: cached ones locally, the rest batched (BATCH_SIZE per round trip)
+        fetched, _ = fetch_metadata(service, message_ids)
+
         summary = []
-        for msg in messages:
-            # We need to fetch the payload to get headers
-            m = service.users().messages().get(userId='me', id=msg['id'], format='full').execute()
-            headers = m.get('payload', {}).get('headers', [])
-            
-            subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '(No Subject)')
-            sender = next((h['value'] for h in headers if h['name'] == 'From'), '(Unknown)')
+        for message_id in message_ids:
+            m = fetched.get(message_id)
+            if m is None:
+                continue
+            subject = m['headers'].get('Subject', '(No Subject)')
+            sender = m['headers'].get('From', '(Unknown)')
             
             # Helper to clean up "Sender Name <email@example.com>" to just "Sender Name" if long
             if '<' in sender:
                 sender = sender.split('<')[0].strip().replace('"', '')
                 
-            summary.append(f"ID: {msg['id']} | From: {sender} | Subj: {subject}")
+            summary.append(f"ID: {message_id} | From: {sender} | Subj: {subject}")
             
         print(f"DEBUG: Found {len(summary)} emails.")
         return "\n".join(summary)
@@ -155,32 +405,143 @@ def read_email_content(query_or_id: str) -> str:
         msg_id = messages[0]['id']
         print(f"DEBUG: Found ID {msg_id}")
 
-    # 2. Read the email
+    # 2. Read the email (a cached message costs no API call)
     try:
-        message = service.users().messages().get(userId='me', id=msg_id, format='full').execute()
-        payload = message.get('payload', {})
-        candidates = extract_all_text(payload)
-        
-        # Fallback for flat emails
-        if not candidates:
-            data = payload.get('body', {}).get('data')
-            if data:
-                decoded = safe_clean_decode(data)
-                if decoded: candidates.append(decoded)
-
-        if not candidates:
+        text = fetch_message(service, msg_id)['text']
+        if not text:
             return "Email content is empty or only contains images."
-            
-        # Return the longest text block found
-        candidates.sort(key=len, reverse=True)
-        return candidates[0]
+        return text
 
     except Exception as e:
         return f"Error reading email (ID: {msg_id}): {e}"
 
+# --- Streaming Attachment Transfer ---
+# Attachments stream Gmail -> Drive without ever being held whole in memory:
+# the base64 JSON response is decoded chunk by chunk into a spooled temp file
+# (hashed on the way), then uploaded resumably in UPLOAD_CHUNK pieces.
+
+GMAIL_API_ROOT = "https://gmail.googleapis.com"
+DOWNLOAD_CHUNK = 1024 * 1024
+UPLOAD_CHUNK = 4 * 1024 * 1024  # must be a multiple of 256 KiB
+SPOOL_MAX = 4 * 1024 * 1024     # smaller attachments never touch the disk
+ATTACHMENT_WORKERS = 4
+
+_DATA_FIELD_RE = re.compile(rb'"data"\s*:\s*"')
+
+def stream_attachment(session, message_id: str, attachment_id: str, out, user_id: str = 'me') -> tuple:
+    """
+    Downloads an attachment into the file object `out`, decoding the base64
+    "data" field incrementally. Returns (size in bytes, md5 hex digest).
+    `session` is an authorised requests session.
+    """
+    url = f"{GMAIL_API_ROOT}/gmail/v1/users/{user_id}/messages/{message_id}/attachments/{attachment_id}"
+    md5 = hashlib.md5()
+    size = 0
+    head = b""
+    pending = b""
+    in_data = False
+
+    with session.get(url, stream=True, timeout=60) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(DOWNLOAD_CHUNK):
+            if not in_data:
+                head += chunk
+                match = _DATA_FIELD_RE.search(head)
+                if not match:
+                    head = head[-64:]
+                    continue
+                in_data = True
+                chunk = head[match.end():]
+
+            # base64url never contains a quote, so the first one ends the field
+            end = chunk.find(b'"')
+            done = end != -1
+            pending += chunk[:end] if done else chunk
+
+            usable = len(pending) if done else len(pending) - len(pending) % 4
+            if usable:
+                block = pending[:usable]
+                pending = pending[usable:]
+                decoded = base64.urlsafe_b64decode(block + b'=' * (-len(block) % 4))
+                out.write(decoded)
+                md5.update(decoded)
+                size += len(decoded)
+            if done:
+                break
+
+    if not in_data:
+        raise ValueError(f"No attachment data returned for {attachment_id}")
+    return size, md5.hexdigest()
+
+_folder_checksums = {}  # folder id -> (expires_at, {md5Checksum: file})
+_folder_checksums_lock = threading.Lock()
+
+def _existing_checksums(drive, folder_id: str) -> dict:
+    """
+    {md5Checksum: file} for the files already in the folder. One listing is reused
+    for drive_cache.CACHE_TTL seconds (saves within a turn share it, and uploads
+    are added to it), instead of listing the folder on every save.
+    """
+    with _folder_checksums_lock:
+        cached = _folder_checksums.get(folder_id)
+        if cached and cached[0] > time.time():
+            return cached[1]
+
+    existing = {}
+    page_token = None
+    while True:
+        results = drive.files().list(
+            q=f"'{folder_id}' in parents and trashed = false",
+            fields="nextPageToken, files(id, name, md5Checksum)", pageSize=1000, pageToken=page_token
+        ).execute()
+        for f in results.get('files', []):
+            if f.get('md5Checksum'):
+                existing.setdefault(f['md5Checksum'], f)
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+    with _folder_checksums_lock:
+        _folder_checksums[folder_id] = (time.time() + drive_cache.CACHE_TTL, existing)
+    return existing
+
+def transfer_attachment(message_id: str, filename: str, attachment_id: str, folder_id: str = None,
+                        existing: dict = None) -> str:
+    """Streams one attachment into Drive; skips the upload when `existing` already holds the same content."""
+    from google.auth.transport.requests import AuthorizedSession
+
+    session = AuthorizedSession(get_credentials())
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX) as spool:
+        size, md5 = stream_attachment(session, message_id, attachment_id, spool)
+        session.close()
+
+        duplicate = (existing or {}).get(md5)
+        if duplicate:
+            return f"{filename}: already in Drive as '{duplicate['name']}' (ID: {duplicate['id']})"
+
+        spool.seek(0)
+        meta = {'name': filename}
+        if folder_id:
+            meta['parents'] = [folder_id]
+        mime_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        media = MediaIoBaseUpload(spool, mimetype=mime_type, chunksize=UPLOAD_CHUNK, resumable=True)
+
+        # Own service per call: the API client's HTTP transport isn't thread-safe
+        request = get_drive_service().files().create(body=meta, media_body=media, fields='id')
+        response = None
+        while response is None:
+            _, response = request.next_chunk()
+
+    if existing is not None:
+        existing[md5] = {'id': response['id'], 'name': filename}
+    return f"{filename}: saved to Drive (ID: {response['id']}, {size / 1024:.0f} KB)"
+
 @tool
 def save_email_attachment(email_query: str, attachment_name: str, drive_folder_name: str = None) -> str:
-    """Saves an email attachment to Google Drive."""
+    """
+    Saves an email attachment to Google Drive.
+    Use attachment_name="*" to save ALL attachments of the email.
+    With a drive_folder_name, files whose content is already in that folder are not uploaded again.
+    """
     try:
         service = get_gmail_service()
         drive = get_drive_service()
@@ -190,32 +551,38 @@ def save_email_attachment(email_query: str, attachment_name: str, drive_folder_n
         if not msgs: return f"No email found for '{email_query}'"
         
         msg_id = msgs[0]['id']
-        message = service.users().messages().get(userId='me', id=msg_id).execute()
-        
-        att_id = None
-        def find_att(parts):
-            for p in parts:
-                if p.get('filename') == attachment_name: return p['body'].get('attachmentId')
-                if 'parts' in p: 
-                    found = find_att(p['parts'])
-                    if found: return found
-            return None
-
-        att_id = find_att(message.get('payload', {}).get('parts', []))
-        if not att_id: return f"Attachment '{attachment_name}' not found."
-            
-        att = service.users().messages().attachments().get(userId='me', messageId=msg_id, id=att_id).execute()
-        data = base64.urlsafe_b64decode(att['data'])
-        
-        meta = {'name': attachment_name}
+        attachments = fetch_message(service, msg_id)['attachments']
+        if attachment_name in ('*', 'all'):
+            selected = attachments
+        elif attachment_name in attachments:
+            selected = {attachment_name: attachments[attachment_name]}
+        else:
+            return f"Attachment '{attachment_name}' not found."
+        if not selected:
+            return "This email has no attachments."
+
+        # Dedup only inside an explicit folder: listing My Drive's root on every save costs O(files)
+        folder_id, existing = None, None
         if drive_folder_name:
-            q = f"name = '{drive_folder_name}' and mimeType = 'application/vnd.google-apps.folder'"
-            folders = drive.files().list(q=q).execute().get('files', [])
-            if folders: meta['parents'] = [folders[0]['id']]
-        
-        media = MediaIoBaseUpload(io.BytesIO(data), mimetype='application/octet-stream')
-        f = drive.files().create(body=meta, media_body=media).execute()
-        return f"Saved to Drive (ID: {f.get('id')})"
+            folder = drive_cache.resolve_path(drive_folder_name, drive_cache.FOLDER_MIME, drive)
+            if not folder:
+                return f"Error: Folder '{drive_folder_name}' not found."
+            folder_id = folder['id']
+            existing = _existing_checksums(drive, folder_id)
+
+        with ThreadPoolExecutor(max_workers=min(ATTACHMENT_WORKERS, len(selected))) as pool:
+            futures = [
+                pool.submit(transfer_attachment, msg_id, name, att_id, folder_id, existing)
+                for name, att_id in selected.items()
+            ]
+            results = []
+            for name, future in zip(selected, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append(f"{name}: Error: {e}")
+        drive_mirror.mark_stale()
+        return "\n".join(results)
     except Exception as e:
         return f"Error: {e}"
 
@@ -264,3 +631,135 @@ def send_gmail_message(to_recipients: str, subject: str, body: str) -> str:
         return f"Email sent successfully! ID: {sent_message['id']}"
     except Exception as e:
         return f"Error sending email: {e}"
+
+# --- Bulk Mail (mail-merge) ---
+# Messages are rendered locally and submitted in Gmail batch requests, paced to
+# the per-user quota (messages.send costs 100 units, drafts.create 10). A batch's
+# calls run concurrently on Gmail's side, so each batch holds at most one second
+# of quota. Rate-limited calls are retried in a later batch; server errors only
+# for drafts, since a send that failed with a 5xx may still have gone out.
+
+BULK_BATCH_SIZE = 10
+GMAIL_QUOTA_UNITS = int(os.getenv("MOTH_GMAIL_QUOTA_UNITS", "250"))  # per second; 0 disables pacing
+BULK_MAX_ATTEMPTS = 3
+_QUOTA_COST = {'send': 100, 'draft': 10}
+_EMAIL_SPLIT_RE = re.compile(r'[\s,;]+')
+
+class _TemplateFields(dict):
+    def __missing__(self, key):
+        raise KeyError(f"missing field '{key}'")
+
+def parse_recipients(recipients: str) -> list:
+    """
+    CSV with a header row containing an 'email' column (other columns become
+    template fields), or a plain list of addresses separated by commas/newlines.
+    """
+    text = recipients.strip()
+    first_line = text.splitlines()[0] if text else ""
+    if 'email' in [c.strip().lower() for c in first_line.split(',')]:
+        rows = []
+        for row in csv.DictReader(io.StringIO(text)):
+            fields = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+            if fields.get('email'):
+                rows.append(fields)
+        return rows
+    return [{'email': address, 'name': address.split('@')[0]}
+            for address in _EMAIL_SPLIT_RE.split(text) if '@' in address]
+
+def render_bulk_messages(subject_template: str, body_template: str, rows: list) -> list:
+    """[(row, message or None, error or None)] with {field} placeholders filled per recipient."""
+    rendered = []
+    for row in rows:
+        fields = _TemplateFields(row)
+        try:
+            subject = subject_template.format_map(fields)
+            body = body_template.format_map(fields)
+            rendered.append((row, create_message('me', row['email'], subject, body), None))
+        except (KeyError, ValueError, IndexError) as e:
+            rendered.append((row, None, f"template error: {e}"))
+    return rendered
+
+def submit_bulk(service, messages: list, mode: str = 'send') -> dict:
+    """
+    Submits {index: raw message} as sends or drafts in paced batch requests.
+    Returns {index: ('ok', id) | ('error', reason)}.
+    """
+    results = {}
+    pending = list(messages.items())
+    attempt = 0
+    batch_size = BULK_BATCH_SIZE
+    if GMAIL_QUOTA_UNITS:
+        batch_size = max(1, min(BULK_BATCH_SIZE, GMAIL_QUOTA_UNITS // _QUOTA_COST[mode]))
+    while pending and attempt < BULK_MAX_ATTEMPTS:
+        attempt += 1
+        retry = []
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            started = time.time()
+
+            def on_response(request_id, response, exception):
+                index = int(request_id)
+                if exception is None:
+                    results[index] = ('ok', response.get('id'))
+                    return
+                status = getattr(getattr(exception, 'resp', None), 'status', None)
+                rate_limited = status == 429 or (status == 403 and 'ateLimitExceeded' in str(exception))
+                if rate_limited or (status in (500, 503) and mode == 'draft'):
+                    retry.append((index, messages[index]))
+                    results[index] = ('error', str(exception).splitlines()[0][:120])
+                elif status and status >= 500:
+                    results[index] = ('error', f"server error {status}, may have been sent (not retried)")
+                else:
+                    results[index] = ('error', str(exception).splitlines()[0][:120])
+
+            batch = service.new_batch_http_request(callback=on_response)
+            for index, message in chunk:
+                if mode == 'draft':
+                    request = service.users().drafts().create(userId='me', body={'message': message})
+                else:
+                    request = service.users().messages().send(userId='me', body=message)
+                batch.add(request, request_id=str(index))
+            batch.execute()
+
+            # Stay under the per-second quota
+            if GMAIL_QUOTA_UNITS:
+                budget = len(chunk) * _QUOTA_COST[mode] / GMAIL_QUOTA_UNITS
+                time.sleep(max(0.0, budget - (time.time() - started)))
+
+        if retry:
+            print(f"DEBUG: {len(retry)} bulk messages rate limited; retrying (attempt {attempt + 1})...")
+            time.sleep(2 ** attempt)
+        pending = retry
+    return results
+
+@tool
+def send_bulk_emails(subject_template: str, body_template: str, recipients: str, mode: str = "send") -> str:
+    """
+    MAIL-MERGE: sends (mode="send") or drafts (mode="draft") one personalised email per recipient in ONE call.
+    Use this instead of calling send_gmail_message/create_gmail_draft repeatedly.
+    recipients: CSV text with a header row including an 'email' column (e.g. "email,name,company"),
+    or a comma/newline separated list of addresses (fields: {email}, {name}).
+    Templates use {column} placeholders, e.g. "Hi {name}, ...".
+    Returns a per-recipient status table.
+    """
+    if mode not in _QUOTA_COST:
+        return "Error: mode must be 'send' or 'draft'."
+    rows = parse_recipients(recipients)
+    if not rows:
+        return "Error: no recipients found."
+    try:
+        service = get_gmail_service()
+        rendered = render_bulk_messages(subject_template, body_template, rows)
+        print(f"DEBUG: Bulk {mode} to {len(rows)} recipients...")
+        results = submit_bulk(service, {i: m for i, (_, m, err) in enumerate(rendered) if m is not None}, mode)
+
+        lines = ["#  | Recipient | Status"]
+        ok = 0
+        for i, (row, _, error) in enumerate(rendered):
+            status, detail = ('error', error) if error else results.get(i, ('error', 'not submitted'))
+            ok += status == 'ok'
+            lines.append(f"{i + 1} | {row['email']} | {'✅ ' + ('sent' if mode == 'send' else 'drafted') if status == 'ok' else '❌ ' + detail}")
+        lines.insert(0, f"Bulk {mode}: {ok}/{len(rendered)} succeeded.")
+        return "\n".join(lines)
+    except Exception as e:
+        return f"Error: {e}"
@@ -0,0 +1,215 @@
+"""
+Text extraction for PDFs stored in Drive.
+
+The file is downloaded in chunks (MediaIoBaseDownload) into a temporary file,
+so memory is bounded by the chunk size instead of the PDF size. Only the
+requested pages are extracted; large page sets are split into contiguous
+ranges and extracted in a process pool, which keeps the CPU-bound pypdf work
+off the calling thread (and its GIL).
+
+Page texts are cached in SQLite by the file's md5Checksum, so re-reading an
+unchanged PDF (or a range overlapping an earlier read) skips the download.
+"""
+
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+import pypdf
+from dotenv import load_dotenv
+from googleapiclient.http import MediaIoBaseDownload
+from moth.tools.utils import get_drive_service
+
+load_dotenv()
+
+DOWNLOAD_CHUNK = int(os.getenv("MOTH_PDF_CHUNK_MB", "8")) * 1024 * 1024
+PDF_WORKERS = int(os.getenv("MOTH_PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PARALLEL_MIN_PAGES = 32  # below this, pool start-up and PDF re-parsing per worker cost more than they save
+
+PDF_CACHE_DB = "pdf_cache.db"
+PDF_CACHE_MAX_BYTES = int(os.getenv("MOTH_PDF_CACHE_MB", "50")) * 1024 * 1024
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# --- Page Text Cache ---
+
+def init_cache():
+    conn = sqlite3.connect(PDF_CACHE_DB)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pdf_files (
+            md5 TEXT PRIMARY KEY,
+            page_count INTEGER NOT NULL,
+            last_access REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pdf_pages (
+            md5 TEXT NOT NULL,
+            page INTEGER NOT NULL,
+            text BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            PRIMARY KEY (md5, page)
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+def cache_get(md5: str, pages: list = None):
+    """(page_count or None, {page: text}) for the cached pages of the file (all cached pages if `pages` is None)."""
+    init_cache()
+    conn = sqlite3.connect(PDF_CACHE_DB)
+    row = conn.execute("SELECT page_count FROM pdf_files WHERE md5 = ?", (md5,)).fetchone()
+    if not row:
+        conn.close()
+        return None, {}
+    if pages is None:
+        rows = conn.execute("SELECT page, text FROM pdf_pages WHERE md5 = ?", (md5,)).fetchall()
+    else:
+        rows = conn.execute(
+            f"SELECT page, text FROM pdf_pages WHERE md5 = ? AND page IN ({','.join('?' for _ in pages)})",
+            [md5, *pages]
+        ).fetchall() if pages else []
+    conn.execute("UPDATE pdf_files SET last_access = ? WHERE md5 = ?", (time.time(), md5))
+    conn.commit()
+    conn.close()
+    return row[0], {page: zlib.decompress(blob).decode() for page, blob in rows}
+
+def cache_put(md5: str, page_count: int, texts: dict):
+    """Stores {page: text} for the file, then evicts least-recently-read files past PDF_CACHE_MAX_BYTES."""
+    init_cache()
+    conn = sqlite3.connect(PDF_CACHE_DB)
+    conn.execute("INSERT OR REPLACE INTO pdf_files (md5, page_count, last_access) VALUES (?, ?, ?)",
+                 (md5, page_count, time.time()))
+    rows = []
+    for page, text in texts.items():
+        blob = zlib.compress(text.encode(), 6)
+        rows.append((md5, page, blob, len(blob)))
+    conn.executemany("INSERT OR REPLACE INTO pdf_pages (md5, page, text, size) VALUES (?, ?, ?, ?)", rows)
+
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pdf_pages").fetchone()[0]
+    if total > PDF_CACHE_MAX_BYTES:
+        # Trim to 90% so eviction doesn't run on every insert
+        excess = total - int(PDF_CACHE_MAX_BYTES * 0.9)
+        for old_md5, size in conn.execute("""
+            SELECT f.md5, COALESCE(SUM(p.size), 0) FROM pdf_files f LEFT JOIN pdf_pages p ON p.md5 = f.md5
+            WHERE f.md5 != ? GROUP BY f.md5 ORDER BY f.last_access
+        """, (md5,)).fetchall():
+            if excess <= 0:
+                break
+            conn.execute("DELETE FROM pdf_pages WHERE md5 = ?", (old_md5,))
+            conn.execute("DELETE FROM pdf_files WHERE md5 = ?", (old_md5,))
+            excess -= size
+    conn.commit()
+    conn.close()
+
+# --- Download & Extraction ---
+
+def download_to_file(drive, file_id: str, out) -> int:
+    """Streams the file's content into `out` in DOWNLOAD_CHUNK pieces; returns the byte count."""
+    downloader = MediaIoBaseDownload(out, drive.files().get_media(fileId=file_id), chunksize=DOWNLOAD_CHUNK)
+    done = False
+    while not done:
+        _, done = downloader.next_chunk()
+    out.flush()
+    return out.tell()
+
+def extract_range(path: str, start: int, end: int) -> list:
+    """Texts of pages start..end-1 (0-based). Runs in pool workers, so it reopens the file itself."""
+    # A file object (not the path) keeps pypdf reading objects on demand instead of loading the whole file
+    texts = []
+    with open(path, 'rb') as f:
+        reader = pypdf.PdfReader(f)
+        for i in range(start, end):
+            texts.append(reader.pages[i].extract_text() or "")
+            # Drop resolved objects (image streams included) so memory doesn't grow with the page count
+            reader.resolved_objects.clear()
+    return texts
+
+def _contiguous_ranges(pages: list, parts: int) -> list:
+    """Splits sorted page numbers into about `parts` runs of consecutive pages, as (start, end) pairs."""
+    runs = []
+    for page in pages:
+        if runs and runs[-1][1] == page:
+            runs[-1][1] = page + 1
+        else:
+            runs.append([page, page + 1])
+    target = max(1, -(-len(pages) // parts))
+    ranges = []
+    for start, end in runs:
+        while end - start > target:
+            ranges.append((start, start + target))
+            start += target
+        ranges.append((start, end))
+    return ranges
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Not fork: the pool is created lazily inside multi-threaded processes (the Telegram
+            # server runs outbox, dispatcher and supervisor threads), and a forked child can
+            # inherit locks held by those threads and deadlock
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+def extract_pages(path: str, pages: list) -> dict:
+    """{page: text} for the given 0-based pages, in a process pool when there are many."""
+    pages = sorted(set(pages))
+    texts = {}
+    if len(pages) < PARALLEL_MIN_PAGES or PDF_WORKERS < 2:
+        for start, end in _contiguous_ranges(pages, 1):
+            for offset, text in enumerate(extract_range(path, start, end)):
+                texts[start + offset] = text
+        return texts
+
+    ranges = _contiguous_ranges(pages, PDF_WORKERS)
+    print(f"DEBUG: Extracting {len(pages)} PDF pages in {len(ranges)} ranges on {PDF_WORKERS} processes.")
+    pool = _get_pool()
+    futures = [(start, pool.submit(extract_range, path, start, end)) for start, end in ranges]
+    for start, future in futures:
+        for offset, text in enumerate(future.result()):
+            texts[start + offset] = text
+    return texts
+
+def read_pdf_pages(file_id: str, start_page: int = None, end_page: int = None, drive=None):
+    """
+    Text of a Drive PDF's pages start_page..end_page (1-based, inclusive; open ends mean first/last page).
+    Returns (page_count, [(page_number, text), ...]).
+    """
+    drive = drive or get_drive_service()
+    meta = drive.files().get(fileId=file_id, fields='md5Checksum, size').execute()
+    md5 = meta.get('md5Checksum')
+
+    def wanted(page_count):
+        first = max(1, start_page or 1)
+        last = min(page_count, end_page or page_count)
+        return list(range(first - 1, last))
+
+    page_count, cached = (None, {})
+    if md5:
+        page_count, cached = cache_get(md5)
+        if page_count is not None and all(i in cached for i in wanted(page_count)):
+            print(f"DEBUG: PDF {file_id} served from text cache (md5 {md5}).")
+            return page_count, [(i + 1, cached[i]) for i in wanted(page_count)]
+
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+        path = tmp.name
+        size = download_to_file(drive, file_id, tmp)
+    try:
+        print(f"DEBUG: Downloaded PDF {file_id} ({size} bytes) in {DOWNLOAD_CHUNK // (1024 * 1024)} MB chunks.")
+        with open(path, 'rb') as f:
+            page_count = len(pypdf.PdfReader(f).pages)
+        pages = wanted(page_count)
+        texts = extract_pages(path, [i for i in pages if i not in cached])
+    finally:
+        os.remove(path)
+
+    if md5:
+        cache_put(md5, page_count, texts)
+    texts.update(cached)
+    return page_count, [(i + 1, texts[i]) for i in pages]
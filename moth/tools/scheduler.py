@@ -1,6 +1,5 @@
-from datetime import datetime
 from langchain.tools import tool
-from moth.scheduler_engine import get_scheduler, execute_scheduled_task
+from moth import scheduler_client
 
 @tool
 def list_scheduled_tasks() -> str:
@@ -8,20 +7,36 @@ def list_scheduled_tasks() -> str:
     Lists all currently scheduled background tasks.
     Returns a formatted string of tasks with their IDs and next run times.
     """
-    scheduler = get_scheduler()
-    jobs = scheduler.get_jobs()
+    try:
+        jobs = scheduler_client.list_jobs()
+    except Exception as e:
+        return f"Error listing scheduled tasks: {e}"
     
     if not jobs:
         return "No tasks are currently scheduled."
         
     output = ["Current Scheduled Tasks:"]
     for job in jobs:
-        output.append(f"- ID: {job.id} | Task: {job.name} | Next Run: {job.next_run_time}")
+        line = f"- ID: {job['id']} | Task: {job['name']} | Next Run: {job['next_run_time']}"
+        line += f" | {scheduler_client.format_run_stats(job.get('stats'))}"
+        metrics = job.get('last_run')
+        if metrics and 'queue_delay' in metrics:
+            line += f" (queued {metrics['queue_delay']:.1f}s)"
+        output.append(line)
         
     return "\n".join(output)
 
 @tool
-def schedule_task(task_description: str, trigger_type: str, time_value: str) -> str:
+def schedule_task(task_description: str, trigger_type: str, time_value: str,
+                  max_instances: int = 1,
+                  coalesce: bool = True,
+                  misfire_grace_time: int = 300,
+                  delivery: str = 'email',
+                  digest: bool = False,
+                  notify_on_change: bool = False,
+                  on_no_change: str = 'suppress',
+                  precheck: str = None,
+                  jitter: int = None) -> str:
     """
     Schedules a task to run in the background.
     
@@ -32,60 +47,41 @@ def schedule_task(task_description: str, trigger_type: str, time_value: str) ->
             - For 'date': "YYYY-MM-DD HH:MM:SS"
             - For 'interval': "hours=X" or "minutes=X" (e.g. "hours=2")
             - For 'cron': "hour=X, minute=X" (e.g. "hour=8, minute=30")
+        max_instances: How many runs of this task may overlap (default 1).
+        coalesce: If several runs were missed, run only once instead of catching up (default True).
+        misfire_grace_time: Seconds a late run is still allowed to start before it is skipped (default 300).
+        delivery: Where to send the result: 'email' (default) or 'telegram'.
+        digest: If True, tasks firing at the same time are batched and their results sent as ONE message.
+            Use for routine briefings (e.g. morning email summary + calendar + weather).
+        notify_on_change: For recurring checks ("did the price change?", "any urgent emails?"):
+            only send the result when it differs from the previous run.
+        on_no_change: When nothing changed: 'suppress' (send nothing, default) or 'heartbeat' (short "no change" note).
+        precheck: Optional cheap input check that skips the whole run when nothing changed:
+            'gmail' (new mail activity) or 'drive' (Drive changes).
+        jitter: Random +/- seconds applied to each recurring run to avoid everything firing at once
+            (default from MOTH_SCHEDULER_JITTER, 60s). Use 0 for exact timing.
     """
-    scheduler = get_scheduler()
-    
-    # Use task description as the job name for readability
-    job_name = task_description
-    
     try:
-        if trigger_type == 'date':
-            run_date = datetime.strptime(time_value, "%Y-%m-%d %H:%M:%S")
-            job = scheduler.add_job(
-                execute_scheduled_task, 
-                'date', 
-                run_date=run_date, 
-                args=[task_description],
-                name=job_name
-            )
-            return f"Scheduled task '{task_description}' for {run_date} (Job ID: {job.id})."
+        job = scheduler_client.add_job(
+            task_description, trigger_type, time_value,
+            max_instances=max_instances,
+            coalesce=coalesce,
+            misfire_grace_time=misfire_grace_time,
+            delivery=delivery,
+            digest=digest,
+            notify_on_change=notify_on_change,
+            on_no_change=on_no_change,
+            precheck=precheck,
+            jitter=jitter
+        )
 
+        mode = " (digest)" if digest else ""
+        if trigger_type == 'date':
+            return f"Scheduled task '{task_description}' for {job['next_run_time']} (Job ID: {job['id']}){mode}."
         elif trigger_type == 'interval':
-            # rudimentary parsing for "hours=X" or "minutes=X"
-            kwargs = {}
-            parts = time_value.split(',')
-            for part in parts:
-                unit, val = part.strip().split('=')
-                kwargs[unit] = int(val)
-            
-            job = scheduler.add_job(
-                execute_scheduled_task, 
-                'interval', 
-                args=[task_description], 
-                name=job_name,
-                **kwargs
-            )
-            return f"Scheduled recurring task '{task_description}' every {time_value} (Job ID: {job.id})."
-
-        elif trigger_type == 'cron':
-            # rudimentary parsing for "hour=X, minute=X"
-            kwargs = {}
-            parts = time_value.split(',')
-            for part in parts:
-                unit, val = part.strip().split('=')
-                kwargs[unit] = int(val)
-                
-            job = scheduler.add_job(
-                execute_scheduled_task, 
-                'cron', 
-                args=[task_description], 
-                name=job_name,
-                **kwargs
-            )
-            return f"Scheduled daily task '{task_description}' at {time_value} (Job ID: {job.id})."
-            
+            return f"Scheduled recurring task '{task_description}' every {time_value} (Job ID: {job['id']}){mode}."
         else:
-            return f"Unknown trigger_type: {trigger_type}. Use 'date', 'interval', or 'cron'."
+            return f"Scheduled daily task '{task_description}' at {time_value} (Job ID: {job['id']}){mode}."
 
     except Exception as e:
         return f"Error scheduling task: {e}"
@@ -1,7 +1,7 @@
 import os
-import requests
 from langchain.tools import tool
 from dotenv import load_dotenv
+from moth.telegram_outbox import get_outbox
 
 load_dotenv()
 
@@ -17,18 +17,9 @@ def send_telegram_alert(message: str) -> str:
     if not token or not chat_id:
         return "Error: Telegram credentials missing in .env"
 
-    # Fixed the URL string which had markdown syntax in the user request
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    payload = {
-        "chat_id": chat_id,
-        "text": message
-    }
-    
+    # Goes through the shared outbox (pooled session, rate limits, long-message splitting)
     try:
-        response = requests.post(url, json=payload, timeout=10)
-        if response.status_code == 200:
-            return "Notification sent successfully."
-        else:
-            return f"Failed to send Telegram: {response.text}"
+        get_outbox().send(chat_id, message).result(timeout=60)
+        return "Notification sent successfully."
     except Exception as e:
-        return f"Telegram Connection Error: {e}"
+        return f"Failed to send Telegram: {e}"
@@ -0,0 +1,150 @@
+"""
+Local urgency pre-filter for the email supervisor.
+
+Each message becomes a row of header features (sender allowlist, Gmail
+category/importance labels, keyword hits, reply-needed cues) and the whole
+batch is scored in one pass as feature-matrix x weight-vector. Only messages
+scoring at or above URGENCY_THRESHOLD are sent to the LLM; obvious noise
+(newsletters, receipts, promotions) never costs an LLM call. A human sender in
+Primary clears the threshold on its own, so urgent mail without keywords isn't
+dropped silently.
+
+Every RECALL_SAMPLE_EVERY-th filtered-out message is sent to the LLM anyway, as
+a recall sample: the share of samples it labels urgent estimates what the
+filter misses.
+"""
+
+import os
+import re
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+URGENCY_THRESHOLD = float(os.getenv("MOTH_URGENCY_THRESHOLD", "0.8"))
+# 0 disables the recall sample
+RECALL_SAMPLE_EVERY = int(os.getenv("MOTH_URGENCY_RECALL_SAMPLE_EVERY", "10"))
+
+# Comma-separated senders (addresses or @domains) whose mail is always worth a look
+SENDER_ALLOWLIST = [s.strip().lower() for s in os.getenv("MOTH_SUPERVISOR_VIP", "").split(",") if s.strip()]
+
+URGENT_KEYWORDS = {
+    'urgent': 1.5, 'asap': 1.5, 'immediately': 1.2, 'emergency': 2.0, 'action required': 1.2,
+    'deadline': 1.0, 'overdue': 1.0, 'today': 0.5, 'tomorrow': 0.3, 'eod': 0.8,
+    'security alert': 1.5, 'suspicious': 1.0, 'password': 0.6, 'payment failed': 1.2,
+    'interview': 0.8, 'outage': 1.5, 'down': 0.4, 'cancelled': 0.6, 'final notice': 1.2,
+}
+NOISE_KEYWORDS = {
+    'newsletter': -1.5, 'unsubscribe': -1.0, 'receipt': -1.0, 'order confirmation': -1.2,
+    'your order': -0.8, '% off': -1.5, 'sale': -0.8, 'webinar': -0.8, 'digest': -1.0,
+    'weekly': -0.6, 'promotion': -1.2, 'shipped': -0.6,
+}
+
+# One compiled alternation, longest phrases first, so each text is scanned once
+_KEYWORD_WEIGHTS = {**URGENT_KEYWORDS, **NOISE_KEYWORDS}
+_KEYWORD_RE = re.compile(
+    r'\b(' + '|'.join(re.escape(k) for k in sorted(_KEYWORD_WEIGHTS, key=len, reverse=True)) + r')(?=\W|$)'
+)
+_NOREPLY_RE = re.compile(r'no-?reply|notifications?@|mailer-daemon|newsletter@|news@|marketing@')
+_ASK_RE = re.compile(r'\?|\b(can you|could you|please|let me know|need you|waiting on)\b')
+
+FEATURES = [
+    'allowlisted', 'important', 'starred', 'primary', 'updates', 'forums',
+    'keyword_score', 'noreply', 'asks', 'reply_thread',
+]
+WEIGHTS = [2.5, 1.0, 1.0, 0.8, -0.7, -1.0, 1.0, -1.5, 0.6, 0.4]
+
+# Pre-filter effectiveness, compared against the LLM's verdicts on the candidates
+FILTER_STATS = {
+    'checks': 0,            # supervisor checks with new mail
+    'messages': 0,          # new messages scored
+    'candidates': 0,        # messages sent to the LLM
+    'llm_calls': 0,
+    'llm_calls_avoided': 0, # checks where no message cleared the threshold
+    'llm_urgent': 0,        # candidates the LLM labelled urgent
+    'sampled': 0,           # filtered-out messages sent to the LLM as a recall sample
+    'sampled_urgent': 0,    # samples the LLM labelled urgent (filter misses)
+}
+_stats_lock = threading.Lock()
+_filtered_seen = 0  # filtered-out messages so far, for picking recall samples
+
+def _sender_address(sender: str) -> str:
+    match = re.search(r'<([^>]+)>', sender)
+    return (match.group(1) if match else sender).strip().lower()
+
+def _allowlisted(address: str) -> bool:
+    return any(address == entry or (entry.startswith('@') and address.endswith(entry)) for entry in SENDER_ALLOWLIST)
+
+def extract_features(message: dict) -> list:
+    """Feature row (ordered as FEATURES) for one message dict from GmailSync."""
+    labels = set(message.get('labels', []))
+    subject = message.get('subject', '')
+    text = f"{subject} {message.get('snippet', '')}".lower()
+    address = _sender_address(message.get('from', ''))
+    return [
+        float(_allowlisted(address)),
+        float('IMPORTANT' in labels),
+        float('STARRED' in labels),
+        float(not any(label.startswith('CATEGORY_') for label in labels) or 'CATEGORY_PERSONAL' in labels),
+        float('CATEGORY_UPDATES' in labels),
+        float('CATEGORY_FORUMS' in labels),
+        sum(_KEYWORD_WEIGHTS[k] for k in set(_KEYWORD_RE.findall(text))),
+        float(bool(_NOREPLY_RE.search(address))),
+        float(bool(_ASK_RE.search(text))),
+        float(subject.lower().startswith('re:')),
+    ]
+
+def score_messages(messages: list) -> list:
+    """Scores a batch in one pass: rows of features dotted with WEIGHTS."""
+    matrix = [extract_features(m) for m in messages]
+    return [sum(f * w for f, w in zip(row, WEIGHTS)) for row in matrix]
+
+def select_candidates(messages: list, threshold: float = None) -> tuple:
+    """Returns (candidates, scores); candidates are the messages scoring >= threshold."""
+    threshold = URGENCY_THRESHOLD if threshold is None else threshold
+    scores = score_messages(messages)
+    candidates = [m for m, score in zip(messages, scores) if score >= threshold]
+    return candidates, scores
+
+def select_recall_sample(messages: list, candidates: list) -> list:
+    """Every RECALL_SAMPLE_EVERY-th filtered-out message (counted across checks)."""
+    global _filtered_seen
+    if RECALL_SAMPLE_EVERY <= 0:
+        return []
+    candidate_ids = {m['id'] for m in candidates}
+    sample = []
+    with _stats_lock:
+        for message in messages:
+            if message['id'] in candidate_ids:
+                continue
+            _filtered_seen += 1
+            if _filtered_seen % RECALL_SAMPLE_EVERY == 0:
+                sample.append(message)
+    return sample
+
+def record_check(scored: int, candidates: int, llm_urgent: int = 0, sampled: int = 0, sampled_urgent: int = 0):
+    """Updates FILTER_STATS after one supervisor check."""
+    with _stats_lock:
+        FILTER_STATS['checks'] += 1
+        FILTER_STATS['messages'] += scored
+        FILTER_STATS['candidates'] += candidates
+        FILTER_STATS['sampled'] += sampled
+        FILTER_STATS['sampled_urgent'] += sampled_urgent
+        if candidates or sampled:
+            FILTER_STATS['llm_calls'] += 1
+            FILTER_STATS['llm_urgent'] += llm_urgent
+        else:
+            FILTER_STATS['llm_calls_avoided'] += 1
+
+def get_filter_stats() -> dict:
+    """
+    FILTER_STATS plus precision (share of candidates the LLM agreed were urgent)
+    and miss_rate (share of recall samples it found urgent, i.e. estimated misses
+    among filtered-out mail).
+    """
+    with _stats_lock:
+        stats = dict(FILTER_STATS)
+    stats['precision'] = stats['llm_urgent'] / stats['candidates'] if stats['candidates'] else None
+    stats['filtered_out'] = stats['messages'] - stats['candidates']
+    stats['miss_rate'] = stats['sampled_urgent'] / stats['sampled'] if stats['sampled'] else None
+    return stats
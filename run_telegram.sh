@@ -1,4 +1,4 @@
 #!/bin/bash
 echo "Starting Moth AI Telegram Server..."
 source venv/bin/activate
-exec python -m moth.telegram_server
+exec python -m moth.telegram_server "$@"
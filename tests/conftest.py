@@ -0,0 +1,7 @@
+import pytest
+
+@pytest.fixture(autouse=True)
+def isolated_cwd(tmp_path, monkeypatch):
+    """The modules keep their SQLite files in the working directory; give each test its own."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
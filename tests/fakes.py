@@ -0,0 +1,32 @@
+"""Minimal stand-ins for the googleapiclient resources the sync code calls."""
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+class FakeRequest:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+def http_error(status: int) -> HttpError:
+    return HttpError(httplib2.Response({'status': status}), b'{}')
+
+class FakeResource:
+    """`resource.method(**kwargs).execute()` returns the next queued response for that method."""
+
+    def __init__(self, **responses):
+        self.responses = {name: list(queue) for name, queue in responses.items()}
+        self.calls = []
+
+    def __getattr__(self, name):
+        if name not in self.responses:
+            raise AttributeError(name)
+
+        def method(**kwargs):
+            self.calls.append((name, kwargs))
+            return FakeRequest(self.responses[name].pop(0))
+        return method
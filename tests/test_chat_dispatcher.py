@@ -0,0 +1,61 @@
+import threading
+import time
+
+from moth.chat_dispatcher import ChatDispatcher
+
+def wait_idle(dispatcher, timeout=5.0):
+    """Lanes re-submit themselves item by item, so wait on the stats rather than the pool."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        stats = dispatcher.get_stats()
+        if not stats['queued'] and not stats['lane_depths']:
+            return stats
+        time.sleep(0.01)
+    raise AssertionError("dispatcher did not drain")
+
+def test_one_chat_runs_in_order():
+    dispatcher = ChatDispatcher(max_workers=4, max_queue=50)
+    done = []
+
+    def work(item):
+        time.sleep(0.01 if item % 2 else 0)
+        done.append(item)
+
+    for item in range(10):
+        assert dispatcher.submit(1, work, item)
+    wait_idle(dispatcher)
+
+    assert done == list(range(10))
+
+def test_chats_run_concurrently():
+    dispatcher = ChatDispatcher(max_workers=2, max_queue=50)
+    both_running = threading.Barrier(2, timeout=5)
+
+    dispatcher.submit(1, both_running.wait)
+    dispatcher.submit(2, both_running.wait)
+
+    assert wait_idle(dispatcher)['failed'] == 0
+
+def test_full_queue_sheds():
+    dispatcher = ChatDispatcher(max_workers=1, max_queue=2)
+    release = threading.Event()
+
+    assert dispatcher.submit(1, release.wait)
+    assert dispatcher.submit(1, release.wait)
+    assert not dispatcher.submit(2, release.wait)
+    release.set()
+
+    assert wait_idle(dispatcher)['shed'] == 1
+
+def test_failures_are_counted():
+    dispatcher = ChatDispatcher(max_workers=1)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    dispatcher.submit(1, fail)
+    dispatcher.submit(1, lambda: None)
+
+    stats = wait_idle(dispatcher)
+    assert stats['processed'] == 2
+    assert stats['failed'] == 1
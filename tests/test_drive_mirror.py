@@ -0,0 +1,82 @@
+import sqlite3
+
+import pytest
+
+from moth.tools import drive_mirror
+from tests.fakes import FakeResource, http_error
+
+class FakeDrive:
+    def __init__(self, files=(), changes=(), start_tokens=('start-1',)):
+        self.files_api = FakeResource(list=list(files))
+        self.changes_api = FakeResource(list=list(changes), getStartPageToken=[
+            {'startPageToken': token} for token in start_tokens
+        ])
+
+    def files(self):
+        return self.files_api
+
+    def changes(self):
+        return self.changes_api
+
+def drive_file(file_id, name=None, **extra):
+    return {'id': file_id, 'name': name or f"{file_id}.txt", 'mimeType': 'text/plain',
+            'modifiedTime': '2026-01-01T00:00:00Z', 'parents': ['root'], **extra}
+
+@pytest.fixture
+def conn():
+    drive_mirror.init_db()
+    conn = sqlite3.connect(drive_mirror.MIRROR_DB)
+    yield conn
+    conn.close()
+
+def stored_ids(conn):
+    return {row[0] for row in conn.execute("SELECT id FROM files")}
+
+def test_apply_changes_upserts_and_removes(conn):
+    drive_mirror._upsert(conn, [drive_file('a'), drive_file('b')])
+    drive = FakeDrive(changes=[
+        {'changes': [{'fileId': 'a', 'removed': True}], 'nextPageToken': 'page-2'},
+        {'changes': [{'fileId': 'c', 'file': drive_file('c')}, {'fileId': 'b', 'file': None}],
+         'newStartPageToken': 'token-2'},
+    ])
+
+    applied = drive_mirror._apply_changes(conn, drive, 'token-1')
+
+    assert applied == 3
+    assert stored_ids(conn) == {'c'}
+    assert drive_mirror._get_token(conn) == 'token-2'
+    assert [kwargs['pageToken'] for _, kwargs in drive.changes_api.calls] == ['token-1', 'page-2']
+
+def test_apply_changes_updates_existing_file(conn):
+    drive_mirror._upsert(conn, [drive_file('a', name='old.txt')])
+    drive = FakeDrive(changes=[
+        {'changes': [{'fileId': 'a', 'file': drive_file('a', name='new.txt')}], 'newStartPageToken': 't2'},
+    ])
+
+    drive_mirror._apply_changes(conn, drive, 't1')
+
+    assert conn.execute("SELECT name FROM files WHERE id = 'a'").fetchone() == ('new.txt',)
+
+def test_sync_repopulates_on_expired_token(conn, monkeypatch):
+    drive_mirror._upsert(conn, [drive_file('stale')])
+    drive_mirror._set_token(conn, 'expired')
+    conn.commit()
+    drive = FakeDrive(
+        changes=[http_error(410)],
+        files=[{'files': [drive_file('fresh')]}],
+        start_tokens=['start-2'],
+    )
+
+    drive_mirror.sync(drive, force=True)
+
+    check = sqlite3.connect(drive_mirror.MIRROR_DB)
+    assert stored_ids(check) == {'fresh'}
+    assert drive_mirror._get_token(check) == 'start-2'
+    check.close()
+
+def test_sync_raises_other_errors(conn):
+    drive_mirror._set_token(conn, 'token-1')
+    conn.commit()
+
+    with pytest.raises(Exception):
+        drive_mirror.sync(FakeDrive(changes=[http_error(500)]), force=True)
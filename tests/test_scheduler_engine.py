@@ -0,0 +1,30 @@
+from moth.scheduler_engine import _cron_period, spread_cron_fields
+
+def test_spread_daily_job_pins_minute_and_second():
+    spread = spread_cron_fields({'hour': 8}, 125)
+
+    assert spread == {'hour': 8, 'minute': 2, 'second': 5}
+    assert _cron_period(spread) == _cron_period({'hour': 8})
+
+def test_spread_keeps_user_minute():
+    assert spread_cron_fields({'hour': 8, 'minute': 30}, 125) == {'hour': 8, 'minute': 30, 'second': 5}
+
+def test_spread_leaves_explicit_second_alone():
+    fields = {'minute': 15, 'second': 0}
+    assert spread_cron_fields(fields, 125) is fields
+
+def test_spread_weekly_job_stays_weekly():
+    fields = {'day_of_week': 'mon'}
+    spread = spread_cron_fields(fields, 61)
+
+    assert spread['hour'] == 0
+    assert spread['minute'] == 1
+    assert spread['second'] == 1
+    assert _cron_period(spread) == _cron_period(fields)
+
+def test_spread_does_not_change_cadence_of_step_minutes():
+    fields = {'minute': '*/5'}
+    spread = spread_cron_fields(fields, 125)
+
+    assert spread == {'minute': '*/5', 'second': 5}
+    assert _cron_period(spread) == _cron_period(fields)
@@ -0,0 +1,86 @@
+import pytest
+
+from moth import supervisor
+from tests.fakes import FakeResource, http_error
+
+class FakeGmail:
+    def __init__(self, history=(), messages=(), profile=()):
+        self.history_api = FakeResource(list=list(history))
+        self.messages_api = FakeResource(list=list(messages))
+        self.users_api = FakeResource(getProfile=list(profile))
+        self.users_api.history = lambda: self.history_api
+        self.users_api.messages = lambda: self.messages_api
+
+    def users(self):
+        return self.users_api
+
+def added(message_id, labels=('INBOX',)):
+    return {'messagesAdded': [{'message': {'id': message_id, 'labelIds': list(labels)}}]}
+
+@pytest.fixture(autouse=True)
+def fake_metadata(monkeypatch):
+    """Header lookups return a stub entry per id instead of calling the batch API."""
+    def fetch_metadata(service, message_ids, user_id='me'):
+        return {message_id: {
+            'id': message_id, 'thread_id': message_id, 'labels': ['INBOX'],
+            'headers': {'From': 'a@example.com', 'Subject': f"Subject {message_id}"},
+            'snippet': '', 'internal_date': 0,
+        } for message_id in message_ids}, 1
+    monkeypatch.setattr(supervisor, 'fetch_metadata', fetch_metadata)
+
+def test_first_check_bootstraps_from_profile():
+    service = FakeGmail(profile=[{'historyId': '100'}], messages=[{'messages': [{'id': 'm1'}, {'id': 'm2'}]}])
+    sync = supervisor.GmailSync(service=service)
+
+    messages, checkpoint = sync.fetch_new()
+
+    assert sync.bootstrapped
+    assert [m['id'] for m in messages] == ['m1', 'm2']
+    assert checkpoint == '100'
+
+def test_incremental_check_filters_and_dedups():
+    service = FakeGmail(history=[
+        {'history': [added('m1'), added('m1'), added('s1', ('INBOX', 'SENT'))], 'nextPageToken': 'p2'},
+        {'history': [added('m2'), added('promo', ('INBOX', 'CATEGORY_PROMOTIONS'))], 'historyId': '120'},
+    ])
+    sync = supervisor.GmailSync(service=service)
+    sync.commit('100', [])
+
+    messages, checkpoint = sync.fetch_new()
+
+    assert [m['id'] for m in messages] == ['m1', 'm2']
+    assert checkpoint == '120'
+    assert service.history_api.calls[0][1]['startHistoryId'] == '100'
+    assert service.history_api.calls[1][1]['pageToken'] == 'p2'
+
+def test_committed_messages_are_not_returned_again():
+    service = FakeGmail(history=[{'history': [added('m1'), added('m2')], 'historyId': '130'}])
+    sync = supervisor.GmailSync(service=service)
+    sync.commit('100', ['m1'])
+
+    messages, _ = sync.fetch_new()
+
+    assert [m['id'] for m in messages] == ['m2']
+
+def test_expired_history_id_rebootstraps():
+    service = FakeGmail(
+        history=[http_error(404)],
+        profile=[{'historyId': '500'}],
+        messages=[{'messages': [{'id': 'm9'}]}],
+    )
+    sync = supervisor.GmailSync(service=service)
+    sync.commit('1', [])
+
+    messages, checkpoint = sync.fetch_new()
+
+    assert sync.bootstrapped
+    assert [m['id'] for m in messages] == ['m9']
+    assert checkpoint == '500'
+
+def test_commit_advances_cursor():
+    sync = supervisor.GmailSync(service=FakeGmail())
+    assert sync.get_history_id() is None
+
+    sync.commit('42', ['m1'])
+
+    assert sync.get_history_id() == '42'
@@ -0,0 +1,36 @@
+from moth.telegram_outbox import MAX_MESSAGE_LENGTH, split_message
+
+def test_split_message_empty():
+    assert split_message("") == []
+
+def test_split_message_short_text_is_one_chunk():
+    assert split_message("hello") == ["hello"]
+
+def test_split_message_exactly_at_limit():
+    text = "a" * MAX_MESSAGE_LENGTH
+    assert split_message(text) == [text]
+
+def test_split_message_over_limit_splits_on_paragraphs():
+    paragraphs = [f"paragraph {i} " + "x" * 900 for i in range(10)]
+    chunks = split_message("\n\n".join(paragraphs))
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= MAX_MESSAGE_LENGTH for chunk in chunks)
+    # Cuts land between paragraphs, so nothing is lost or broken mid-paragraph
+    assert "\n\n".join(chunks).split("\n\n") == paragraphs
+
+def test_split_message_without_boundaries_hard_cuts():
+    text = "x" * (MAX_MESSAGE_LENGTH * 2 + 10)
+    chunks = split_message(text)
+
+    assert all(len(chunk) <= MAX_MESSAGE_LENGTH for chunk in chunks)
+    assert "".join(chunks) == text
+
+def test_split_message_reopens_code_fence():
+    code = "\n".join(f"print({i})" for i in range(1000))
+    chunks = split_message(f"Here you go:\n```python\n{code}\n```")
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= MAX_MESSAGE_LENGTH for chunk in chunks)
+    assert chunks[0].endswith("\n```")
+    assert all(chunk.startswith("```python\n") for chunk in chunks[1:])
@@ -0,0 +1,38 @@
+import pytest
+
+from moth import urgency
+
+def message(message_id, subject="Hello", sender="Alice <alice@example.com>", labels=('INBOX',), snippet=""):
+    return {'id': message_id, 'subject': subject, 'from': sender, 'labels': list(labels), 'snippet': snippet}
+
+@pytest.fixture(autouse=True)
+def reset_sampling(monkeypatch):
+    monkeypatch.setattr(urgency, '_filtered_seen', 0)
+    monkeypatch.setattr(urgency, 'RECALL_SAMPLE_EVERY', 3)
+
+def test_select_candidates_keeps_urgent_mail():
+    urgent = message('u', subject="URGENT: server down, can you check?", labels=('INBOX', 'IMPORTANT'))
+    newsletter = message('n', subject="Weekly newsletter", sender="news@shop.example",
+                         labels=('INBOX', 'CATEGORY_UPDATES'))
+
+    candidates, scores = urgency.select_candidates([urgent, newsletter])
+
+    assert candidates == [urgent]
+    assert scores[0] > scores[1]
+
+def test_select_candidates_threshold_override():
+    messages = [message('a'), message('b')]
+    candidates, _ = urgency.select_candidates(messages, threshold=float('-inf'))
+    assert candidates == messages
+
+def test_recall_sample_skips_candidates_and_counts_across_checks():
+    first = [message(f"a{i}") for i in range(4)]
+    second = [message(f"b{i}") for i in range(4)]
+
+    assert urgency.select_recall_sample(first, candidates=[first[0]]) == [first[3]]
+    # Counting continues from the previous check
+    assert urgency.select_recall_sample(second, candidates=[]) == [second[2]]
+
+def test_recall_sample_disabled(monkeypatch):
+    monkeypatch.setattr(urgency, 'RECALL_SAMPLE_EVERY', 0)
+    assert urgency.select_recall_sample([message('a')] * 5, candidates=[]) == []